@@ -1,5 +1,7 @@
 import os
+import tempfile
 import django
+import pytest
 from django.conf import settings
 
 # Set the Django settings module
@@ -18,3 +20,26 @@ def pytest_configure():
             "NAME": ":memory:",
         }
     }
+    settings.SHARED_LINK_TABLE_PATH = os.path.join(tempfile.mkdtemp(), "links")
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """
+    Tests roll back their database rows, so process-level caches holding row ids must not leak between them.
+    """
+    from django.core.cache import cache
+    from shorten import counters, dedup, live, sampling, sharedtable, sketches
+    from users import revocation, tokens
+
+    cache.clear()
+    counters.buffer.clear()
+    sketches.buffer.clear()
+    dedup.reset()
+    live.reset()
+    sampling.sampler.clear()
+    sharedtable.table().clear()
+    tokens.buffer.clear()
+    revocation.revoked.clear()
+    yield
+    tokens.buffer.clear()  # Rows queued by the test would otherwise be written at exit
@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration, used with ``gunicorn -c gunicorn.conf.py url_shortener.wsgi:application``.
+"""
+
+
+def on_starting(server):
+    """
+    Refuse to start when the deploy checks fail, e.g. without a shared cache (see shorten.checks).
+    """
+    import os
+
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "url_shortener.settings")
+    django.setup()
+    call_command("check", deploy=True, fail_level="ERROR")
+
+
+def post_worker_init(worker):
+    """
+    Preload the hottest short links before the worker accepts requests, so deploys
+    and worker restarts do not send every first redirect to the database, and start
+    the periodic flush of the buffered click counters.
+    """
+    from django.db import connections
+    from shorten import counters, resolver
+
+    counters.start_flusher()
+
+    try:
+        loaded = resolver.warm()
+    except Exception:
+        worker.log.exception("Short link warm-up failed")
+    else:
+        worker.log.info("Preloaded %d short links", loaded)
+    finally:
+        connections.close_all()
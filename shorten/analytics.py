@@ -0,0 +1,265 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+from . import dimensions, recent, sketches
+from .models import URL, AccountClicks, AccountDailyClicks, ClickArchive, ClickEvent
+
+
+def merge_archived_distribution(click_distribution, url, start=None, end=None):
+    """
+    Add the daily counts of archived (cold-storage) clicks to the distribution buckets.
+    """
+    archives = ClickArchive.objects.filter(url=url)
+    if start:
+        archives = archives.filter(month__gte=start.date().replace(day=1))
+    if end:
+        archives = archives.filter(month__lte=end.date())
+    for daily in archives.values_list("daily", flat=True):
+        for day, count in daily.items():
+            date = datetime.strptime(day, "%Y-%m-%d")
+            if (start and date.date() < start.date()) or (end and date.date() > end.date()):
+                continue
+            week = date - timedelta(days=date.weekday())  # TruncWeek starts weeks on Monday
+            buckets = (("daily", day), ("weekly", week.strftime("%Y-%U")), ("monthly", date.strftime("%Y-%m")))
+            for period, key in buckets:
+                click_distribution[period][key] = click_distribution[period].get(key, 0) + count
+    for period, counts in click_distribution.items():
+        click_distribution[period] = dict(sorted(counts.items()))
+    return click_distribution
+
+
+def device_analytics(url, start=None, end=None):
+    """
+    Browser, operating system and device class breakdowns. These dimensions have a
+    handful of values, so they are grouped exactly by their integer dimension keys.
+    """
+    click_events = ClickEvent.objects.filter(url=url)
+    archives = ClickArchive.objects.filter(url=url)
+    if start:
+        click_events = click_events.filter(clicked_at__gte=start)
+        archives = archives.filter(month__gte=start.date().replace(day=1))
+    if end:
+        click_events = click_events.filter(clicked_at__lte=end)
+        archives = archives.filter(month__lte=end.date())
+    archived = list(archives.values_list("devices", flat=True))
+
+    sections = {}
+    for name, section in (("browser", "browsers"), ("operating_system", "operating_systems"), ("device_type", "devices")):
+        field = dimensions.dimension_field(name)
+        rows = list(click_events.exclude(**{f"{field}__isnull": True}).values(field).annotate(count=Sum("weight")))
+        values = dimensions.lookup(row[field] for row in rows)
+        counts = Counter({values[row[field]]: row["count"] for row in rows})
+        for devices in archived:
+            counts.update(devices.get(name, {}))
+        sections[section] = [{name: value, "count": count} for value, count in counts.most_common()]
+    return sections
+
+
+def top_values_in_range(url, start=None, end=None):
+    """
+    Exact top countries, cities and referrers of the clicks in a time range, for
+    ranged requests the all-time sketches cannot answer. Archived clicks count for
+    every month the range touches, as in device_analytics.
+    """
+    click_events = ClickEvent.objects.filter(url=url)
+    archives = ClickArchive.objects.filter(url=url)
+    if start:
+        click_events = click_events.filter(clicked_at__gte=start)
+        archives = archives.filter(month__gte=start.date().replace(day=1))
+    if end:
+        click_events = click_events.filter(clicked_at__lte=end)
+        archives = archives.filter(month__lte=end.date())
+    archived = list(archives.values("countries", "cities", "referrers"))
+
+    top = {}
+    for name in sketches.SKETCH_DIMENSIONS:
+        field = dimensions.dimension_field(name)
+        rows = list(click_events.exclude(**{f"{field}__isnull": True}).values(field).annotate(count=Sum("weight")))
+        values = dimensions.lookup(row[field] for row in rows)
+        counts = Counter({values[row[field]]: row["count"] for row in rows})
+        for archive in archived:
+            counts.update(archive[sketches.ARCHIVE_FIELDS[name]])
+        top[name] = [{name: value, "count": count} for value, count in counts.most_common(settings.ANALYTICS_TOP_K)]
+    return top
+
+
+def bucket_daily_counts(daily):
+    """
+    Group ``{date: count}`` into the daily / weekly / monthly buckets of the click distribution.
+    """
+    click_distribution = {"daily": {}, "weekly": {}, "monthly": {}}
+    for day, count in sorted(daily.items()):
+        week = day - timedelta(days=day.weekday())  # Weeks start on Monday, like TruncWeek
+        buckets = (("daily", day.strftime("%Y-%m-%d")), ("weekly", week.strftime("%Y-%U")), ("monthly", day.strftime("%Y-%m")))
+        for period, key in buckets:
+            click_distribution[period][key] = click_distribution[period].get(key, 0) + count
+    return click_distribution
+
+
+def build_url_analytics(url, start=None, end=None):
+    """
+    Build the analytics payload for a single URL. ``start`` and ``end`` restrict
+    every section to a time range, which on PostgreSQL also limits the scan to the
+    matching monthly partitions.
+    """
+    # Get all click events for this URL
+    click_events = ClickEvent.objects.filter(url=url).order_by("-clicked_at")
+    if start:
+        click_events = click_events.filter(clicked_at__gte=start)
+    if end:
+        click_events = click_events.filter(clicked_at__lte=end)
+
+    # Aggregate clicks grouped by different time periods
+    daily_clicks = click_events.order_by().annotate(day=TruncDay("clicked_at")).values("day").annotate(count=Sum("weight"))
+
+    weekly_clicks = click_events.order_by().annotate(week=TruncWeek("clicked_at")).values("week").annotate(count=Sum("weight"))
+
+    monthly_clicks = click_events.order_by().annotate(month=TruncMonth("clicked_at")).values("month").annotate(count=Sum("weight"))
+
+    # All-time top locations and referrers are served from the heavy-hitter sketches
+    if start or end:
+        top = top_values_in_range(url, start, end)
+        country_stats, city_stats, referrer_stats = top["country"], top["city"], top["referrer"]
+    else:
+        country_stats = sketches.top(url, "country")
+        city_stats = sketches.top(url, "city")
+        referrer_stats = sketches.top(url, "referrer")
+
+    # Get recent clicks with detailed information; the latest ones are served from the ring buffer
+    if start or end:
+        recent_rows = click_events[:10].values_list(*(dimensions.dimension_field(column) if column in dimensions.DIMENSION_KINDS else column for column in recent.COLUMNS))
+        recent_clicks = [dict(zip(recent.COLUMNS, row)) for row in dimensions.decode_rows(recent_rows, recent.COLUMNS)]
+    else:
+        recent_clicks = recent.latest(url.pk, 10)
+
+    # Convert queryset results to dictionary format
+    click_distribution = {
+        "daily": {entry["day"].strftime("%Y-%m-%d"): entry["count"] for entry in daily_clicks},
+        "weekly": {entry["week"].strftime("%Y-%U"): entry["count"] for entry in weekly_clicks},
+        "monthly": {entry["month"].strftime("%Y-%m"): entry["count"] for entry in monthly_clicks},
+    }
+    merge_archived_distribution(click_distribution, url, start, end)
+
+    return {
+        "short_code": url.short_code,
+        "long_url": url.long_url,
+        "created_at": url.created_at,
+        "total_clicks": url.clicks,
+        "raw_hits": url.raw_hits,
+        "bot_clicks": url.bot_clicks,
+        "click_distribution": click_distribution,
+        "location_analytics": {
+            "countries": country_stats,
+            "cities": city_stats,
+        },
+        "referrer_analytics": referrer_stats,
+        "device_analytics": device_analytics(url, start, end),
+        "recent_clicks": recent_clicks,
+    }
+
+
+def build_account_analytics(user, start=None, end=None):
+    """
+    Build the dashboard payload across all URLs of a user from the account counters
+    maintained at ingest, so the cost does not depend on the number of links or clicks.
+    Without ``start`` the time series covers the last ACCOUNT_ANALYTICS_DAYS days.
+    """
+    today = timezone.now().date()
+    first = start.date() if start else today - timedelta(days=settings.ACCOUNT_ANALYTICS_DAYS - 1)
+    last = end.date() if end else today
+
+    daily = dict(AccountDailyClicks.objects.filter(user=user, day__range=(first, last)).order_by("day").values_list("day", "clicks"))
+
+    click_distribution = bucket_daily_counts(daily)
+
+    totals = AccountClicks.objects.filter(user=user).values_list("clicks", flat=True).first() or 0
+    urls = URL.objects.filter(user=user)
+    top_links = urls.order_by("-clicks").values("short_code", "name", "long_url", "clicks")[: settings.ACCOUNT_TOP_LINKS]
+
+    return {
+        "total_clicks": totals,
+        "total_links": urls.count(),
+        "top_links": list(top_links),
+        "click_distribution": click_distribution,
+    }
+
+
+# Dimension -> (ClickArchive field, key inside it) for the batch breakdowns
+BATCH_DIMENSIONS = {
+    "country": ("countries", None),
+    "city": ("cities", None),
+    "referrer": ("referrers", None),
+    "browser": ("devices", "browser"),
+    "operating_system": ("devices", "operating_system"),
+    "device_type": ("devices", "device_type"),
+}
+
+
+def build_batch_analytics(urls, start=None, end=None):
+    """
+    Build analytics for many URLs with set-based queries: one GROUP BY over
+    ``url_id IN (...)`` for the click distribution and one per dimension, plus one
+    read of the archived aggregates. The number of queries does not depend on the
+    number of URLs.
+    """
+    urls = {url.pk: url for url in urls}
+    click_events = ClickEvent.objects.filter(url_id__in=urls).order_by()
+    archives = ClickArchive.objects.filter(url_id__in=urls)
+    if start:
+        click_events = click_events.filter(clicked_at__gte=start)
+        archives = archives.filter(month__gte=start.date().replace(day=1))
+    if end:
+        click_events = click_events.filter(clicked_at__lte=end)
+        archives = archives.filter(month__lte=end.date())
+
+    daily = {url_id: Counter() for url_id in urls}
+    for url_id, day, count in click_events.annotate(day=TruncDay("clicked_at")).values_list("url_id", "day").annotate(count=Sum("weight")):
+        daily[url_id][day.date()] += count
+
+    breakdowns = {url_id: {name: Counter() for name in BATCH_DIMENSIONS} for url_id in urls}
+    for archive in archives.values("url_id", "daily", "countries", "cities", "referrers", "devices"):
+        for day, count in archive["daily"].items():
+            day = datetime.strptime(day, "%Y-%m-%d").date()
+            if (start and day < start.date()) or (end and day > end.date()):
+                continue
+            daily[archive["url_id"]][day] += count
+        for name, (field, key) in BATCH_DIMENSIONS.items():
+            breakdowns[archive["url_id"]][name].update(archive[field].get(key, {}) if key else archive[field])
+
+    rows = []
+    for name in BATCH_DIMENSIONS:
+        field = dimensions.dimension_field(name)
+        grouped = click_events.exclude(**{f"{field}__isnull": True}).values_list("url_id", field).annotate(count=Sum("weight"))
+        rows.extend((name, url_id, dimension_id, count) for url_id, dimension_id, count in grouped)
+    values = dimensions.lookup(dimension_id for _, _, dimension_id, _ in rows)
+    for name, url_id, dimension_id, count in rows:
+        breakdowns[url_id][name][values[dimension_id]] += count
+
+    top_k = settings.ANALYTICS_TOP_K
+
+    def top(url_id, name):
+        return [{name: value, "count": count} for value, count in breakdowns[url_id][name].most_common(top_k)]
+
+    return {
+        url.short_code: {
+            "short_code": url.short_code,
+            "long_url": url.long_url,
+            "created_at": url.created_at,
+            "total_clicks": url.clicks,
+            "click_distribution": bucket_daily_counts(daily[url_id]),
+            "location_analytics": {
+                "countries": top(url_id, "country"),
+                "cities": top(url_id, "city"),
+            },
+            "referrer_analytics": top(url_id, "referrer"),
+            "device_analytics": {
+                "browsers": top(url_id, "browser"),
+                "operating_systems": top(url_id, "operating_system"),
+                "devices": top(url_id, "device_type"),
+            },
+        }
+        for url_id, url in urls.items()
+    }
@@ -0,0 +1,234 @@
+"""
+Cold-storage archival of old click events.
+
+Events older than the retention horizon are moved out of ``tb_url_analytics``
+into immutable per-month columnar part files and deleted from the table in
+chunks. Every chunk also folds its counts into ``ClickArchive`` rows, so the
+analytics endpoint keeps reporting the full history without touching the files.
+
+Part file layout (little-endian, every column block 8-byte aligned)::
+
+    b"CLKARCH1" | u32 header length | JSON header | column blocks
+
+Integer columns (``url_id``, ``clicked_at`` in epoch microseconds, ``weight``) are stored as
+int64 arrays. String columns are dictionary-encoded: the header carries the
+dictionary and the block holds int32 codes, with -1 standing for NULL. Blocks
+can be read in place through ``mmap`` without decoding the whole file.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import dimensions, partitions
+from .models import ClickArchive, ClickEvent
+
+MAGIC = b"CLKARCH1"
+INT_COLUMNS = ("url_id", "clicked_at", "weight")
+STRING_COLUMNS = ("ip_address", "country", "city", "region", "user_agent", "referrer", "browser", "operating_system", "device_type")
+DEVICE_COLUMNS = ("browser", "operating_system", "device_type")
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def write_part(path, rows):
+    """
+    Write ``rows`` (dicts keyed by column name) into a columnar part file.
+    """
+    blocks, columns = [], {}
+    offset = 0
+
+    def add_block(name, values, **meta):
+        nonlocal offset
+        data = _little_endian(values).tobytes()
+        padding = -len(data) % 8
+        columns[name] = {"offset": offset, "length": len(values), "typecode": values.typecode, **meta}
+        blocks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    add_block("url_id", array("q", (row["url_id"] for row in rows)))
+    add_block("clicked_at", array("q", (_to_micros(row["clicked_at"]) for row in rows)))
+    add_block("weight", array("q", (row.get("weight") or 1 for row in rows)))
+    for name in STRING_COLUMNS:
+        dictionary, codes = {}, array("i")
+        for row in rows:
+            value = row[name]
+            codes.append(-1 if value is None else dictionary.setdefault(value, len(dictionary)))
+        add_block(name, codes, dictionary=list(dictionary))
+
+    header = json.dumps({"rows": len(rows), "columns": columns}).encode()
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for block in blocks:
+            handle.write(block)
+    os.replace(tmp_path, path)
+
+
+class ArchivePart:
+    """
+    Memory-mapped reader for a part file written by ``write_part``.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a click archive part")
+        (header_length,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        data_start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._mmap[data_start : data_start + header_length]))
+        self._data_start = data_start + header_length
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def codes(self, name):
+        """
+        Raw column values as a zero-copy memoryview (int64 for integer columns,
+        int32 dictionary codes for string columns).
+        """
+        meta = self.header["columns"][name]
+        start = self._data_start + meta["offset"]
+        size = array(meta["typecode"]).itemsize * meta["length"]
+        view = memoryview(self._mmap)[start : start + size]
+        if sys.byteorder != "little":
+            return _little_endian(array(meta["typecode"], view))
+        return view.cast(meta["typecode"])
+
+    def column(self, name):
+        if name not in self.header["columns"]:
+            # Parts written before the column existed
+            return [None] * len(self)
+        values = self.codes(name)
+        if name == "clicked_at":
+            return [_from_micros(value) for value in values]
+        if name in STRING_COLUMNS:
+            dictionary = self.header["columns"][name]["dictionary"]
+            return [None if code < 0 else dictionary[code] for code in values]
+        return list(values)
+
+    def rows(self):
+        names = INT_COLUMNS + STRING_COLUMNS
+        return (dict(zip(names, values)) for values in zip(*(self.column(name) for name in names)))
+
+    def close(self):
+        self._mmap.close()
+
+
+def _fold_aggregates(rows):
+    """
+    Group archived rows by (url, month) into the counters kept on ClickArchive.
+    """
+    aggregates = defaultdict(lambda: {"clicks": 0, "daily": Counter(), "countries": Counter(), "cities": Counter(), "referrers": Counter(), "devices": defaultdict(Counter)})
+    for row in rows:
+        clicked_at = row["clicked_at"]
+        entry = aggregates[(row["url_id"], clicked_at.date().replace(day=1))]
+        weight = row["weight"] or 1  # Parts written before sampling have no weight column
+        entry["clicks"] += weight
+        entry["daily"][clicked_at.strftime("%Y-%m-%d")] += weight
+        for field, key in (("country", "countries"), ("city", "cities"), ("referrer", "referrers")):
+            if row[field] is not None:
+                entry[key][row[field]] += weight
+        for field in DEVICE_COLUMNS:
+            if row[field] is not None:
+                entry["devices"][field][row[field]] += weight
+    return aggregates
+
+
+def _merge_counts(stored, counts, limit=None):
+    merged = Counter(stored)
+    merged.update(counts)
+    return dict(merged.most_common(limit))
+
+
+def archived_counts(url, field):
+    """
+    Archived counts of a ClickArchive counter field, summed over every month.
+    """
+    counts = Counter()
+    for stored in ClickArchive.objects.filter(url=url).values_list(field, flat=True):
+        counts.update(stored)
+    return counts
+
+
+def archive_chunk(cutoff, chunk_size):
+    """
+    Archive and delete up to ``chunk_size`` of the oldest events recorded before
+    ``cutoff``. Returns the number of archived events.
+    """
+    columns = ["id", *INT_COLUMNS, *STRING_COLUMNS]
+    lookups = [dimensions.dimension_field(column) if column in dimensions.DIMENSION_KINDS else column for column in columns]
+    with transaction.atomic():
+        events = ClickEvent.objects.filter(clicked_at__lt=cutoff).order_by("id").values_list(*lookups)[:chunk_size]
+        rows = [dict(zip(columns, row)) for row in dimensions.decode_rows(events, columns, chunk_size)]
+        if not rows:
+            return 0
+        for row in rows:
+            row["clicked_at"] = row["clicked_at"].astimezone(dt_timezone.utc)
+
+        for (url_id, month), counts in _fold_aggregates(rows).items():
+            archive, _ = ClickArchive.objects.select_for_update().get_or_create(url_id=url_id, month=month)
+            archive.clicks += counts["clicks"]
+            archive.daily = _merge_counts(archive.daily, counts["daily"])
+            # Dimension counters only keep as many values as a sketch can hold
+            limit = settings.ANALYTICS_SKETCH_CAPACITY
+            archive.countries = _merge_counts(archive.countries, counts["countries"], limit)
+            archive.cities = _merge_counts(archive.cities, counts["cities"], limit)
+            archive.referrers = _merge_counts(archive.referrers, counts["referrers"], limit)
+            archive.devices = {field: _merge_counts(archive.devices.get(field, {}), counts["devices"][field]) for field in DEVICE_COLUMNS}
+            archive.save()
+
+        ClickEvent.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row["clicked_at"].strftime("%Y-%m")].append(row)
+        for month, month_rows in by_month.items():
+            part_name = f"part-{month_rows[0]['id']:020d}-{month_rows[-1]['id']:020d}.clk"
+            write_part(os.path.join(settings.CLICK_ARCHIVE_ROOT, month, part_name), month_rows)
+    return len(rows)
+
+
+def archive_clicks(retention_days=None, chunk_size=None):
+    """
+    Move every click older than the retention horizon to cold storage, one chunk at a time.
+    """
+    retention_days = settings.CLICK_RETENTION_DAYS if retention_days is None else retention_days
+    chunk_size = chunk_size or settings.CLICK_ARCHIVE_CHUNK_SIZE
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    total = 0
+    while True:
+        archived = archive_chunk(cutoff, chunk_size)
+        total += archived
+        if archived < chunk_size:
+            break
+
+    # Monthly partitions emptied by the archival are dropped instead of waiting for VACUUM
+    partitions.drop_partitions_before(cutoff)
+    return total
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Rate limits, duplicate suppression, the live feed, token revocations and click
+    limits keep their state in the default cache. With a per-process backend every
+    worker enforces them on its own share of the traffic.
+    """
+    if settings.DEBUG or not isinstance(caches["default"], (LocMemCache, DummyCache)):
+        return []
+    return [
+        Error(
+            "The default cache is not shared between processes.",
+            hint="Set REDIS_URL so every worker counts throttles, clicks and revocations in the same place.",
+            id="shorten.E001",
+        )
+    ]
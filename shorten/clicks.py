@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from . import counters, dedup, expiry, live, recent, sampling, sketches
+from .bots import classify as classify_bot
+from .useragents import parse_user_agent
+from .models import URL, AccountClicks, AccountDailyClicks, ClickEvent
+import requests
+
+
+def get_client_ip(request):
+    """
+    Resolve the client IP, preferring the first hop of X-Forwarded-For.
+    """
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        return x_forwarded_for.split(",")[0]
+    return request.META.get("REMOTE_ADDR")
+
+
+def get_ip_geolocation(ip):
+    """
+    Get geolocation data for an IP address using ipapi.co
+    """
+    try:
+        response = requests.get(f"{settings.GEOLOCATION_BASE_URL}/{ip}/json/")
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "country": data.get("country_name"),
+                "city": data.get("city"),
+                "region": data.get("region"),
+            }
+    except Exception:
+        pass
+    return {"country": None, "city": None, "region": None}
+
+
+def admit_click(url, ip, user_agent, method="GET", clicked_at=None):
+    """
+    Front half of the click pipeline: filter out bots and duplicate clicks, bump the
+    buffered counters and apply sampling. Returns the weight to persist the click
+    with, or 0 when no event is to be written. ``clicked_at`` replays a past click
+    (access log ingestion); dedup and sampling then run on the click times.
+    """
+    # Bots are only counted, in a buffered counter, before anything else touches the database
+    if settings.BOT_FILTERING_ENABLED and classify_bot(user_agent, method, ip):
+        counters.add(URL, url.pk, "bot_clicks")
+        return 0
+
+    # Every human hit is counted; repeats within the dedup window stop here
+    now = clicked_at.timestamp() if clicked_at else None
+    counters.add(URL, url.pk, "raw_hits")
+    if dedup.is_duplicate(url.pk, ip, user_agent, now=now):
+        return 0
+
+    # Only clicks that get this far use up the click limit of the link
+    expiry.count_click(url)
+
+    # Account-wide counters feed the dashboard without scanning click events
+    counters.add(AccountClicks, {"user_id": url.user_id}, "clicks")
+    counters.add(AccountDailyClicks, {"user_id": url.user_id, "day": (clicked_at or timezone.now()).date()}, "clicks")
+
+    # Clicks skipped by sampling are still counted exactly, through the buffered counter
+    weight = sampling.sample(url.pk, url.sample_rate, now=now)
+    if not weight:
+        counters.add(URL, url.pk, "clicks")
+    return weight
+
+
+def build_event(url, ip, user_agent, referrer, geo_data, weight, clicked_at=None):
+    """
+    An unsaved ClickEvent with all the information about an admitted click.
+    """
+    # Classify the user agent (memoised, so repeated agents cost a dict lookup)
+    agent = parse_user_agent(user_agent)
+    return ClickEvent(
+        url=url,
+        clicked_at=clicked_at or timezone.now(),
+        ip_address=ip,
+        country=geo_data["country"],
+        city=geo_data["city"],
+        region=geo_data["region"],
+        user_agent=user_agent,
+        referrer=referrer,
+        browser=agent.browser,
+        operating_system=agent.operating_system,
+        device_type=agent.device_type,
+        weight=weight,
+    )
+
+
+def publish_clicks(url, events):
+    """
+    Back half of the click pipeline, once ``events`` of ``url`` are stored: bump the
+    URL counters and feed the sketches, the recent-clicks buffer and the live stream.
+    """
+    # Increment click count on access, without overwriting the buffered counters
+    latest = max(event.clicked_at for event in events)
+    url.clicks += len(events)
+    url.clicked_date = latest
+    URL.objects.filter(pk=url.pk).update(clicks=F("clicks") + len(events), clicked_date=Greatest(Coalesce("clicked_date", Value(latest)), Value(latest)))
+
+    for event in events:
+        sketches.record(url.pk, {"country": event.country, "city": event.city, "referrer": event.referrer}, event.weight)
+        recent.push(event)
+        live.publish(event, url)
+
+
+def record_click(url, request):
+    """
+    Click ingestion pipeline for a redirect: filter out bots and duplicate clicks,
+    persist the click event (or only a weighted sample of them for hot links), bump
+    the URL counters and fold the click into the analytics sketches. Returns the
+    event, or None when no event was written.
+    """
+    ip = get_client_ip(request)
+    user_agent = request.META.get("HTTP_USER_AGENT")
+    weight = admit_click(url, ip, user_agent, request.method)
+    if not weight:
+        return None
+
+    # Get geolocation data
+    geo_data = get_ip_geolocation(ip)
+
+    event = build_event(url, ip, user_agent, request.META.get("HTTP_REFERER"), geo_data, weight)
+    event.save()
+    publish_clicks(url, [event])
+    return event
@@ -0,0 +1,143 @@
+"""
+Write-behind counter aggregation.
+
+Hot counters (bot hits, and later click totals) are accumulated in process
+memory and written with one ``UPDATE ... SET field = field + n`` per row when
+the buffer is flushed, instead of one write per request. The buffer flushes
+itself once CLICK_COUNTER_FLUSH_SECONDS have passed since the last flush, and
+on interpreter exit. Server processes also run ``start_flusher`` (see
+gunicorn.conf.py), a daemon thread flushing every CLICK_COUNTER_FLUSH_SECONDS,
+so a worker that goes quiet does not keep increments that a timeout kill would
+lose. Readers only see flushed counts, which lag by at most that interval.
+
+Other write-behind buffers of the click pipeline ``register`` their flush to be
+run by the same thread and at exit.
+
+A counter row is addressed either by primary key, or by a dict of lookups on
+a unique constraint (e.g. ``{"user_id": 1, "day": date}``); rows addressed by
+lookups are created on first flush. Increments of a row whose write fails
+(database unavailable, deadlock) go back into the buffer for the next flush.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._increments = defaultdict(int)  # (model, pk, field) -> amount
+        self._last_flush = time.monotonic()
+
+    def add(self, model, pk, field, amount=1):
+        if isinstance(pk, dict):
+            pk = tuple(sorted(pk.items()))
+        with self._lock:
+            self._increments[(model, pk, field)] += amount
+            due = time.monotonic() - self._last_flush >= settings.CLICK_COUNTER_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def _take(self):
+        with self._lock:
+            increments, self._increments = self._increments, defaultdict(int)
+            self._last_flush = time.monotonic()
+        return increments
+
+    def _requeue(self, model, pk, fields):
+        with self._lock:
+            for field, amount in fields.items():
+                self._increments[(model, pk, field)] += amount
+
+    def _write(self, model, pk, fields):
+        lookups = dict(pk) if isinstance(pk, tuple) else {"pk": pk}
+        increments = {field: F(field) + amount for field, amount in fields.items()}
+        if model.objects.filter(**lookups).update(**increments) or not isinstance(pk, tuple):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookups, **fields)
+        except IntegrityError:
+            # Created concurrently by another process
+            model.objects.filter(**lookups).update(**increments)
+
+    def flush(self):
+        rows = defaultdict(dict)
+        for (model, pk, field), amount in self._take().items():
+            rows[(model, pk)][field] = amount
+        failed, error = 0, None
+        for (model, pk), fields in rows.items():
+            try:
+                with transaction.atomic():
+                    self._write(model, pk, fields)
+            except Exception as e:
+                self._requeue(model, pk, fields)
+                failed, error = failed + 1, error or e
+        if failed:
+            logger.error("Writing %d of %d counter rows failed, their increments are kept for the next flush", failed, len(rows), exc_info=error)
+
+    def clear(self):
+        self._take()
+
+
+buffer = CounterBuffer()
+add = buffer.add
+flush = buffer.flush
+
+_flushes = [flush]
+_flusher = None
+_flusher_stop = threading.Event()
+_flusher_lock = threading.Lock()
+
+
+def register(buffer_flush):
+    """
+    Run ``buffer_flush`` with the counters: from the flusher thread and at exit.
+    """
+    _flushes.append(buffer_flush)
+
+
+def flush_all():
+    for buffer_flush in _flushes:
+        try:
+            buffer_flush()
+        except Exception:
+            logger.exception("Flushing %s failed", buffer_flush)
+
+
+def _run_flusher(interval, stop):
+    while not stop.wait(interval):
+        close_old_connections()  # Drop a connection the database closed since the last flush
+        flush_all()
+
+
+def start_flusher(interval=None):
+    """
+    Flush every registered buffer each ``interval`` seconds from a daemon thread of this process.
+    """
+    global _flusher, _flusher_stop
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            interval = interval or settings.CLICK_COUNTER_FLUSH_SECONDS
+            _flusher_stop = threading.Event()
+            _flusher = threading.Thread(target=_run_flusher, args=(interval, _flusher_stop), name="counter-flusher", daemon=True)
+            _flusher.start()
+
+
+def stop_flusher():
+    with _flusher_lock:
+        _flusher_stop.set()
+        if _flusher is not None:
+            _flusher.join()
+
+
+atexit.register(flush_all)
@@ -0,0 +1,112 @@
+"""
+Duplicate-click suppression.
+
+Double clicks and browser retries hit the same short link from the same client
+within a second or two. A click is identified by ``(url, ip_address, user_agent)``
+and remembered for CLICK_DEDUP_WINDOW_SECONDS; repeats inside the window are
+dropped before anything is written.
+
+Per process, the recent keys live in a time wheel: a ring of slots each holding
+the keys seen during one tick. Advancing the wheel clears the slots that fell
+out of the window, so expiry costs one ``set.clear()`` per tick instead of a
+per-key timestamp scan, and memory is capped at CLICK_DEDUP_MAX_ENTRIES. With
+CLICK_DEDUP_SHARED (the default when a Redis cache is configured) the window is
+kept in the cache backend with ``cache.add`` instead, so it holds across workers.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class TimeWheel:
+    def __init__(self, window, resolution, max_entries):
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self._slots = [set() for _ in range(max(1, math.ceil(window / resolution)) + 1)]
+        self._tick = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _advance(self, now):
+        tick = int(now // self.resolution)
+        if self._tick is None:
+            self._tick = tick
+        # Clear every slot the wheel moved past; after a full turn they are all stale
+        for _ in range(min(tick - self._tick, len(self._slots))):
+            self._tick += 1
+            self._evict(self._tick % len(self._slots))
+        self._tick = max(self._tick, tick)
+
+    def _evict(self, index):
+        self._size -= len(self._slots[index])
+        self._slots[index].clear()
+
+    def seen(self, key, now=None):
+        """
+        Return True if ``key`` was already seen within the window, otherwise remember it.
+        """
+        with self._lock:
+            self._advance(time.monotonic() if now is None else now)
+            if any(key in slot for slot in self._slots):
+                return True
+            current = self._tick % len(self._slots)
+            # Bounded memory: under a flood, expire the oldest slots early (the current one last)
+            offset = 1
+            while self._size >= self.max_entries and offset <= len(self._slots):
+                self._evict((current + offset) % len(self._slots))
+                offset += 1
+            self._slots[current].add(key)
+            self._size += 1
+            return False
+
+    def clear(self):
+        with self._lock:
+            for slot in self._slots:
+                slot.clear()
+            self._tick = None
+            self._size = 0
+
+
+_wheel = None
+_wheel_lock = threading.Lock()
+
+
+def local_wheel():
+    global _wheel
+    with _wheel_lock:
+        if _wheel is None:
+            window = settings.CLICK_DEDUP_WINDOW_SECONDS
+            _wheel = TimeWheel(window, min(window, settings.CLICK_DEDUP_RESOLUTION_SECONDS), settings.CLICK_DEDUP_MAX_ENTRIES)
+        return _wheel
+
+
+def reset():
+    global _wheel
+    with _wheel_lock:
+        _wheel = None
+
+
+def click_key(url_id, ip, user_agent):
+    raw = f"{url_id}\x00{ip or ''}\x00{user_agent or ''}"
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def is_duplicate(url_id, ip, user_agent, now=None):
+    """
+    True when the same client already clicked this URL within the dedup window.
+    ``now`` replays a past click (epoch seconds): replays always use this process's
+    time wheel, clocked by the click times instead of the wall clock.
+    """
+    window = settings.CLICK_DEDUP_WINDOW_SECONDS
+    if window <= 0:
+        return False
+    key = click_key(url_id, ip, user_agent)
+    if settings.CLICK_DEDUP_SHARED and now is None:
+        # cache.add is atomic and only succeeds for the first click in the window
+        return not cache.add(f"dedup:{key}", 1, timeout=math.ceil(window))
+    return local_wheel().seen(key, now)
@@ -0,0 +1,147 @@
+"""
+Interned click dimensions.
+
+Repeated click attributes (country, city, region, user agent, referrer) are
+stored once in ``tb_click_dimensions`` and click rows only keep their integer
+ids. Each process keeps a bounded LRU cache in both directions so hot values
+resolve without a query. Ids are only cached once the transaction that read or
+created them has committed, so a rollback cannot leave the cache pointing at a
+row that does not exist.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ClickDimension
+
+# Click attribute -> dimension kind. The ClickEvent foreign key is named ``<attribute>_dim``.
+DIMENSION_KINDS = {
+    "country": ClickDimension.Kind.COUNTRY,
+    "city": ClickDimension.Kind.CITY,
+    "region": ClickDimension.Kind.REGION,
+    "user_agent": ClickDimension.Kind.USER_AGENT,
+    "referrer": ClickDimension.Kind.REFERRER,
+    "browser": ClickDimension.Kind.BROWSER,
+    "operating_system": ClickDimension.Kind.OPERATING_SYSTEM,
+    "device_type": ClickDimension.Kind.DEVICE_TYPE,
+}
+
+
+def dimension_field(name):
+    return f"{name}_dim"
+
+
+def digest(value):
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+class _LRU:
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > settings.CLICK_DIMENSION_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_ids = _LRU()  # (kind, value) -> id
+_values = _LRU()  # id -> value
+
+
+def clear_cache():
+    _ids.clear()
+    _values.clear()
+
+
+def _remember(kind, value, dimension_id):
+    def remember():
+        _ids.put((kind, value), dimension_id)
+        _values.put(dimension_id, value)
+
+    transaction.on_commit(remember)  # Runs at once outside a transaction
+
+
+def intern(kind, value):
+    """
+    Return the id of ``value`` for ``kind``, creating the dimension row on first use.
+    """
+    if value is None:
+        return None
+    dimension_id = _ids.get((kind, value))
+    if dimension_id is None:
+        dimension, _ = ClickDimension.objects.get_or_create(kind=kind, digest=digest(value), defaults={"value": value})
+        dimension_id = dimension.pk
+        _remember(kind, value, dimension_id)
+    return dimension_id
+
+
+def lookup(ids):
+    """
+    Map dimension ids to their values, fetching the uncached ones in one query.
+    """
+    values, missing = {}, set()
+    for dimension_id in ids:
+        if dimension_id is None:
+            continue
+        value = _values.get(dimension_id)
+        if value is None:
+            missing.add(dimension_id)
+        else:
+            values[dimension_id] = value
+    if missing:
+        for dimension_id, kind, value in ClickDimension.objects.filter(pk__in=missing).values_list("pk", "kind", "value"):
+            values[dimension_id] = value
+            _remember(kind, value, dimension_id)
+    return values
+
+
+def value_of(dimension_id):
+    if dimension_id is None:
+        return None
+    return lookup([dimension_id]).get(dimension_id)
+
+
+def decode_rows(rows, columns, chunk_size=None):
+    """
+    Replace dimension ids with their values in an iterable of row tuples.
+    ``columns`` names each position; positions named after a dimension are decoded.
+    Rows are processed in chunks so ids are resolved in bulk.
+    """
+    chunk_size = chunk_size or settings.CLICK_EXPORT_CHUNK_SIZE
+    positions = [index for index, column in enumerate(columns) if column in DIMENSION_KINDS]
+    chunk = []
+
+    def flush():
+        values = lookup({row[index] for row in chunk for index in positions})
+        for row in chunk:
+            row = list(row)
+            for index in positions:
+                row[index] = values.get(row[index])
+            yield tuple(row)
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from flush()
+            chunk = []
+    if chunk:
+        yield from flush()
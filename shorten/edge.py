@@ -0,0 +1,219 @@
+"""
+Serving the hottest links from nginx.
+
+``export_redirect_map`` writes the ``short_code -> long_url`` pairs of the most
+clicked URLs into a file included by the ``map $uri $hot_redirect`` block of
+nginx.conf, replaces it atomically and reloads nginx. nginx then answers those
+redirects itself and logs them to a dedicated access log in the ``hot_clicks``
+format::
+
+    $msec \\t $request_method \\t $remote_addr \\t $http_x_forwarded_for \\t $uri \\t $http_user_agent \\t $http_referer
+
+``ingest_click_log`` reads that log incrementally and feeds the lines through
+the regular click pipeline in batches, so analytics stay complete.
+
+Both run on a schedule (``--every``, see docker-compose.yml). Editing or deleting
+a link calls ``request_export`` (see shorten.signals), and the exporter then
+writes a new map within NGINX_REDIRECT_MAP_CHECK_SECONDS, so nginx stops
+serving the old target.
+"""
+
+import json
+import os
+import re
+import subprocess
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import counters, resolver
+from .clicks import admit_click, build_event, get_ip_geolocation, publish_clicks
+from .models import URL, ClickEvent
+
+REDIRECT_PREFIX = "/api/redirect_url/"
+LOG_FIELDS = ("msec", "method", "remote_addr", "forwarded_for", "uri", "user_agent", "referrer")
+# Long URLs nginx could misread in a quoted map value are left to Django
+UNSAFE_URL = re.compile(r"[\s\"'\\$;{}]")
+ESCAPED = re.compile(rb"\\x([0-9A-Fa-f]{2})")
+NO_GEOLOCATION = {"country": None, "city": None, "region": None}
+EXPORT_REQUESTED_KEY = "edge:export_requested"
+
+
+def hot_redirects(limit):
+    """
+    ``(short_code, long_url)`` of the ``limit`` most clicked URLs, read through the clicks index.
+    Links that can expire are left to Django, which enforces the expiry.
+    """
+    rows = URL.objects.filter(is_active=True, expires_at__isnull=True, max_clicks__isnull=True).order_by("-clicks").values_list("short_code", "long_url")[:limit]
+    return [(short_code, long_url) for short_code, long_url in rows if not UNSAFE_URL.search(long_url)]
+
+
+def render_map(redirects):
+    lines = ["# Generated by manage.py export_redirect_map, do not edit"]
+    lines.extend(f'{REDIRECT_PREFIX}{short_code} "{long_url}";' for short_code, long_url in redirects)
+    return "\n".join(lines) + "\n"
+
+
+def write_atomically(path, content):
+    """
+    Replace ``path`` with ``content`` so readers only ever see the old or the new file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as handle:
+            handle.write(content)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def export_redirect_map(path, limit, reload_command=None):
+    """
+    Export the hottest redirects to ``path`` and reload nginx. If the reload fails
+    the previous map is restored. Returns the number of exported redirects.
+    """
+    redirects = hot_redirects(limit)
+    previous = None
+    if os.path.exists(path):
+        with open(path) as handle:
+            previous = handle.read()
+
+    write_atomically(path, render_map(redirects))
+    if reload_command:
+        try:
+            subprocess.run(reload_command, shell=True, check=True, capture_output=True)
+        except subprocess.CalledProcessError:
+            if previous is not None:
+                write_atomically(path, previous)
+            raise
+    return len(redirects)
+
+
+def request_export():
+    """
+    Ask the exporter for a new map ahead of its schedule.
+    """
+    cache.set(EXPORT_REQUESTED_KEY, 1, None)
+
+
+def export_requested():
+    """
+    Whether a new map was requested since the last call, clearing the request.
+    """
+    return bool(cache.delete(EXPORT_REQUESTED_KEY))
+
+
+def _unescape(value):
+    """
+    Undo nginx ``escape=default`` (``\\xHH``) and map ``-`` (empty variable) to None.
+    """
+    if value == "-":
+        return None
+    raw = ESCAPED.sub(lambda match: bytes([int(match.group(1), 16)]), value.encode())
+    return raw.decode("utf-8", errors="replace")
+
+
+def parse_line(line):
+    """
+    Parse a ``hot_clicks`` log line into a dict, or None for lines that are malformed
+    or not a short-link redirect.
+    """
+    parts = line.rstrip("\n").split("\t")
+    if len(parts) != len(LOG_FIELDS):
+        return None
+    entry = dict(zip(LOG_FIELDS, (_unescape(part) for part in parts)))
+    uri = entry["uri"] or ""
+    if not uri.startswith(REDIRECT_PREFIX):
+        return None
+    try:
+        entry["clicked_at"] = datetime.fromtimestamp(float(entry["msec"]), tz=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    entry["short_code"] = uri[len(REDIRECT_PREFIX) :].strip("/")
+    # Same client address as get_client_ip: the first X-Forwarded-For hop wins
+    entry["ip"] = (entry["forwarded_for"] or "").split(",")[0].strip() or entry["remote_addr"]
+    return entry
+
+
+def ingest_entries(entries):
+    """
+    Feed parsed log entries through the click pipeline and store the admitted clicks
+    with one bulk insert. Returns the number of stored events.
+    """
+    resolved = resolver.resolve_many({entry["short_code"] for entry in entries})
+    urls, events, locations = {}, defaultdict(list), {}
+    for entry in entries:
+        target = resolved.get(entry["short_code"])
+        if target is None:
+            continue
+        url = urls.setdefault(target.id, target.to_instance())
+        weight = admit_click(url, entry["ip"], entry["user_agent"], entry["method"], clicked_at=entry["clicked_at"])
+        if not weight:
+            continue
+        if entry["ip"] not in locations:
+            locations[entry["ip"]] = get_ip_geolocation(entry["ip"]) if settings.NGINX_INGEST_GEOLOCATE else NO_GEOLOCATION
+        events[url.pk].append(build_event(url, entry["ip"], entry["user_agent"], entry["referrer"], locations[entry["ip"]], weight, entry["clicked_at"]))
+
+    batch = [event for url_events in events.values() for event in url_events]
+    for event in batch:
+        event.resolve_dimensions()
+    with transaction.atomic():
+        ClickEvent.objects.bulk_create(batch)
+    for url_id, url_events in events.items():
+        publish_clicks(urls[url_id], url_events)
+    counters.flush_all()
+    return len(batch)
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {"inode": None, "offset": 0}
+
+
+def ingest_click_log(path, state_path, batch_size):
+    """
+    Ingest the lines appended to ``path`` since the offset stored in ``state_path``.
+    The offset is saved after every batch; a rotated log (new inode or smaller
+    file) is read from the start. Returns ``(lines read, events stored)``.
+    """
+    state = _load_state(state_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0  # nginx has not served a hot link yet
+    offset = state["offset"] if state["inode"] == stat.st_ino and state["offset"] <= stat.st_size else 0
+
+    lines_read = stored = 0
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        while True:
+            lines = []
+            while len(lines) < batch_size:
+                line = handle.readline()
+                if not line.endswith(b"\n"):
+                    break  # Nothing more, or a line nginx is still writing
+                lines.append(line)
+            if not lines:
+                break
+            entries = [entry for entry in (parse_line(line.decode("utf-8", errors="replace")) for line in lines) if entry]
+            if entries:
+                stored += ingest_entries(entries)
+            lines_read += len(lines)
+            offset += sum(len(line) for line in lines)
+            write_atomically(state_path, json.dumps({"inode": stat.st_ino, "offset": offset}))
+            if len(lines) < batch_size:
+                break
+    return lines_read, stored
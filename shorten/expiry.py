@@ -0,0 +1,85 @@
+"""
+Link expiration.
+
+A link stops redirecting at its ``expires_at`` or once it has recorded
+``max_clicks`` human clicks. Both are carried in the resolver entry, so checking
+them costs no query: the expiry is a comparison, and the clicks of capped links
+are counted in a shared cache counter (``expiry:served:{url_id}``), seeded from
+the stored click count of the link. Only clicks the pipeline keeps are counted
+(see ``count_click``), so bots and duplicate clicks do not use up the cap. The
+click that reaches the cap sets ``expires_at``, so exhausted links are swept
+like expired ones.
+
+``sweep_expired`` walks the partial ``expires_at`` index in batches of
+EXPIRY_SWEEP_BATCH_SIZE and marks each batch inactive, which takes it out of the
+resolver. The rows, their click history and their short codes are kept.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import resolver
+from .models import URL
+
+
+def _served_key(url_id):
+    return f"expiry:served:{url_id}"
+
+
+def is_expired(entry, now=None):
+    return entry.expires_at is not None and entry.expires_at <= (now or timezone.now())
+
+
+def admit(entry):
+    """
+    Whether a redirect may be served for the resolved ``entry``.
+    """
+    if is_expired(entry):
+        return False
+    return entry.max_clicks is None or cache.get(_served_key(entry.id), entry.clicks) < entry.max_clicks
+
+
+def count_click(url):
+    """
+    Count a human click of ``url`` against its ``max_clicks``, expiring the link once the cap is reached.
+    """
+    if url.max_clicks is None:
+        return
+    key = _served_key(url.pk)
+    try:
+        served = cache.incr(key)
+    except ValueError:
+        # Seeded from the database: the resolved entry may be stale
+        clicks = URL.objects.filter(pk=url.pk).values_list("clicks", flat=True).first() or 0
+        cache.add(key, clicks, timeout=None)
+        served = cache.incr(key)
+    if served >= url.max_clicks:
+        expire(url)  # The cap is reached: later redirects see the expiry
+
+
+def expire(entry):
+    """
+    Expire a link now, once, and drop its cached resolution.
+    """
+    URL.objects.filter(pk=entry.id).update(expires_at=timezone.now())
+    resolver.invalidate(entry.short_code)
+
+
+def sweep_expired(batch_size=None):
+    """
+    Deactivate links past their expiry, one batch per query. Returns the number of
+    swept links.
+    """
+    batch_size = batch_size or settings.EXPIRY_SWEEP_BATCH_SIZE
+    total = 0
+    while True:
+        now = timezone.now()
+        urls = list(URL.objects.filter(expires_at__lte=now, is_active=True).order_by("expires_at").values_list("pk", "short_code")[:batch_size])
+        URL.objects.filter(pk__in=[pk for pk, _ in urls]).update(is_active=False)
+        if urls:
+            resolver.invalidate(*(short_code for _, short_code in urls))
+            cache.delete_many([_served_key(pk) for pk, _ in urls])
+        total += len(urls)
+        if len(urls) < batch_size:
+            return total
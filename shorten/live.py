@@ -0,0 +1,199 @@
+"""
+Real-time click notifications for the live stream endpoint.
+
+The click pipeline appends every recorded click to a shared feed in the cache:
+a sequence counter (``live:head``) and LIVE_FEED_SIZE slots, the same layout as
+the recent-clicks ring buffer. Each server process runs a single poller task
+that reads new feed entries every LIVE_POLL_INTERVAL seconds and fans them out
+in memory to the streams subscribed in that process, so the cost does not grow
+with the number of open dashboards and clicks handled by any worker reach every
+stream.
+
+Publishing is skipped while no stream is open anywhere: pollers keep a
+``live:listening`` key alive for LIVE_LISTENER_TIMEOUT seconds, and the click
+pipeline reads it at most once a second per process, so redirects cost no cache
+round trip for the feed until someone watches. ``live:head`` is seeded when a
+poller starts; a head lower than what a poller has seen (cache flush or
+eviction) makes it resync from the new head.
+
+Subscriptions coalesce under load: at most LIVE_MAX_PENDING clicks wait per
+stream (older ones are dropped), while the per-second counters still count
+every click.
+
+Browsers cannot send headers with EventSource, so streams authenticate with a
+single-use ticket (``issue_ticket``) that expires after LIVE_TICKET_TIMEOUT
+seconds, keeping access tokens out of URLs and access logs.
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .recent import EPOCH
+
+HEAD_KEY = "live:head"
+LISTENING_KEY = "live:listening"
+LISTENER_CHECK_SECONDS = 1
+FIELDS = ("url_id", "user_id", "short_code", "clicked_at", "country", "city", "referrer", "browser", "device_type", "weight")
+
+
+def _slot_key(position):
+    return f"live:{position % settings.LIVE_FEED_SIZE}"
+
+
+def _ticket_key(ticket):
+    return f"live:ticket:{ticket}"
+
+
+_listening = [float("-inf"), False]  # When this process last read LISTENING_KEY, and its value
+
+
+def _has_listeners():
+    now = time.monotonic()
+    if now - _listening[0] >= LISTENER_CHECK_SECONDS:
+        _listening[:] = [now, cache.get(LISTENING_KEY) is not None]
+    return _listening[1]
+
+
+def reset():
+    _listening[:] = [float("-inf"), False]
+
+
+def publish(event, url):
+    """
+    Append a recorded click to the shared feed, unless no stream is open.
+    """
+    if not _has_listeners():
+        return
+    try:
+        position = cache.incr(HEAD_KEY)
+    except ValueError:
+        cache.add(HEAD_KEY, 0, timeout=None)  # Flushed or evicted: pollers resync on the lower head
+        position = cache.incr(HEAD_KEY)
+    clicked_at = (event.clicked_at - EPOCH) // timedelta(microseconds=1)
+    entry = (url.pk, url.user_id, url.short_code, clicked_at, event.country, event.city, event.referrer, event.browser, event.device_type, event.weight)
+    cache.set(_slot_key(position), (position, *entry), settings.LIVE_FEED_TIMEOUT)
+
+
+def issue_ticket(user_id):
+    """
+    A single-use ticket authenticating one live stream of ``user_id``.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user_id, settings.LIVE_TICKET_TIMEOUT)
+    return ticket
+
+
+async def redeem_ticket(ticket):
+    """
+    The user id a ticket was issued for, or None. A ticket is only redeemed once.
+    """
+    key = _ticket_key(ticket)
+    user_id = await cache.aget(key)
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
+
+
+class Subscription:
+    def __init__(self, user_id, url_ids=None):
+        self.user_id = user_id
+        self.url_ids = url_ids
+        self.pending = deque(maxlen=settings.LIVE_MAX_PENDING)
+        self.counts = Counter()  # short_code -> clicks in the current second
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def matches(self, click):
+        return click["user_id"] == self.user_id and (self.url_ids is None or click["url_id"] in self.url_ids)
+
+    def offer(self, click):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(click)
+        self.counts[click["short_code"]] += click["weight"]
+        self.ready.set()
+
+    def drain(self):
+        clicks, dropped = list(self.pending), self.dropped
+        self.pending.clear()
+        self.dropped = 0
+        self.ready.clear()
+        return clicks, dropped
+
+    def take_counts(self):
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+class Broker:
+    def __init__(self):
+        self.subscriptions = set()
+        self._task = None
+        self._lock = threading.Lock()
+        self._listened_at = float("-inf")
+
+    def _polling(self, loop):
+        return self._task is not None and not self._task.done() and self._task.get_loop() is loop
+
+    async def subscribe(self, user_id, url_ids=None):
+        subscription = Subscription(user_id, url_ids)
+        self.subscriptions.add(subscription)
+        loop = asyncio.get_running_loop()
+        if not self._polling(loop):
+            # Clicks published from here on reach the subscription
+            await self._listen()
+            await cache.aadd(HEAD_KEY, 0, timeout=None)
+            seen = await cache.aget(HEAD_KEY, 0)
+            with self._lock:
+                if not self._polling(loop):
+                    self._task = loop.create_task(self._poll(seen))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    async def _listen(self):
+        await cache.aset(LISTENING_KEY, 1, settings.LIVE_LISTENER_TIMEOUT)
+        self._listened_at = time.monotonic()
+        _listening[:] = [self._listened_at, True]
+
+    async def _poll(self, seen):
+        stalled = None
+        while self.subscriptions:
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+            if time.monotonic() - self._listened_at >= settings.LIVE_LISTENER_TIMEOUT / 2:
+                await self._listen()
+            head = await cache.aget(HEAD_KEY, 0)
+            if head < seen:
+                seen = 0  # The feed was reset: its positions start over
+            if head == seen:
+                continue
+            # A poller that fell more than a feed length behind skips the overwritten entries
+            first = max(seen + 1, head - settings.LIVE_FEED_SIZE + 1)
+            entries = await cache.aget_many([_slot_key(position) for position in range(first, head + 1)])
+            for position in range(first, head + 1):
+                entry = entries.get(_slot_key(position))
+                if entry is None or entry[0] != position:
+                    if position != stalled:
+                        # The publisher may sit between incr and set: retry this slot once on the next poll
+                        stalled = position
+                        break
+                else:
+                    self.dispatch(dict(zip(FIELDS, entry[1:])))
+                seen = position
+
+    def dispatch(self, click):
+        click["clicked_at"] = EPOCH + timedelta(microseconds=click["clicked_at"])
+        for subscription in list(self.subscriptions):
+            if subscription.matches(click):
+                subscription.offer(click)
+
+
+broker = Broker()
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shorten.archive import archive_clicks
+
+
+class Command(BaseCommand):
+    help = "Move click events older than the retention horizon into per-month columnar archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CLICK_RETENTION_DAYS, help="Retention horizon in days.")
+        parser.add_argument("--chunk-size", type=int, default=settings.CLICK_ARCHIVE_CHUNK_SIZE, help="Events archived per transaction.")
+
+    def handle(self, *args, **options):
+        archived = archive_clicks(retention_days=options["days"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} click events to {settings.CLICK_ARCHIVE_ROOT}"))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shorten.exports import EXPORT_FORMATS, export_queryset, parse_boundary, stream_export
+from shorten.models import URL
+from users.models import CustomUser as User
+
+
+class Command(BaseCommand):
+    help = "Stream raw click events of a URL or of a whole account to a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--short-code", help="Export the clicks of this short code.")
+        target.add_argument("--username", help="Export the clicks of every URL owned by this user.")
+        parser.add_argument("--start", help="Earliest click time (ISO date or datetime).")
+        parser.add_argument("--end", help="Latest click time (ISO date or datetime).")
+        parser.add_argument("--format", dest="export_format", choices=list(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip.")
+        parser.add_argument("--output", "-o", help="Output file (defaults to stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_boundary(options["start"])
+            end = parse_boundary(options["end"], end=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["short_code"]:
+            url = URL.objects.filter(short_code=options["short_code"]).first()
+            if url is None:
+                raise CommandError(f"Unknown short code: {options['short_code']}")
+            queryset = export_queryset(url=url, start=start, end=end)
+        else:
+            user = User.objects.filter(username=options["username"]).first()
+            if user is None:
+                raise CommandError(f"Unknown user: {options['username']}")
+            queryset = export_queryset(user=user, start=start, end=end)
+
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in stream_export(queryset, options["export_format"], options["gzip"]):
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shorten.edge import export_redirect_map, export_requested
+
+
+class Command(BaseCommand):
+    help = "Export the most clicked short links into the nginx redirect map and reload nginx."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=settings.NGINX_REDIRECT_MAP_SIZE, help="Number of links to export.")
+        parser.add_argument("--output", default=settings.NGINX_REDIRECT_MAP_PATH, help="Map file included by nginx.conf.")
+        parser.add_argument("--reload-command", default=settings.NGINX_RELOAD_COMMAND, help="Command that reloads nginx (empty to skip).")
+        parser.add_argument("--every", type=int, help="Keep running and export every this many seconds, or sooner when links are edited or deleted.")
+        parser.add_argument("--check-every", type=int, default=settings.NGINX_REDIRECT_MAP_CHECK_SECONDS, help="Seconds between checks for edited or deleted links.")
+
+    def handle(self, *args, **options):
+        while True:
+            exported = export_redirect_map(options["output"], options["limit"], options["reload_command"])
+            self.stdout.write(self.style.SUCCESS(f"Exported {exported} redirects to {options['output']}"))
+            if not options["every"]:
+                return
+            due = time.monotonic() + options["every"]
+            while time.monotonic() < due and not export_requested():
+                time.sleep(options["check_every"])
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shorten.edge import ingest_click_log
+
+
+class Command(BaseCommand):
+    help = "Record the redirects served by nginx from the hot_clicks access log as click events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.NGINX_CLICK_LOG, help="nginx hot_clicks access log.")
+        parser.add_argument("--state-file", help="File keeping the read offset (defaults to <log>.offset).")
+        parser.add_argument("--batch-size", type=int, default=settings.NGINX_INGEST_BATCH_SIZE, help="Log lines ingested per batch.")
+        parser.add_argument("--every", type=int, help="Keep running and ingest every this many seconds.")
+
+    def handle(self, *args, **options):
+        if not options["log"]:
+            raise CommandError("No access log given (--log or NGINX_CLICK_LOG).")
+        state_file = options["state_file"] or f"{options['log']}.offset"
+        while True:
+            lines, stored = ingest_click_log(options["log"], state_file, options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Read {lines} log lines and stored {stored} click events"))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
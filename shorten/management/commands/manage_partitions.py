@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shorten import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly click partitions and drop partitions past the retention horizon (PostgreSQL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=settings.CLICK_PARTITION_MONTHS_AHEAD, help="Months of partitions to create in advance.")
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            help="Detach and drop partitions whose rows are all older than this many days. Run archive_clicks first to keep their aggregates.",
+        )
+        parser.add_argument("--every", type=int, help="Keep running and manage partitions every this many seconds.")
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            self.stdout.write("Click partitioning is only available on PostgreSQL; nothing to do.")
+            return
+
+        while True:
+            created = partitions.ensure_partitions(months_ahead=options["ahead"])
+            self.stdout.write(self.style.SUCCESS(f"Partitions up to {created[-1]} are in place"))
+
+            if options["retention_days"] is not None:
+                cutoff = timezone.now() - timedelta(days=options["retention_days"])
+                for name in partitions.drop_partitions_before(cutoff):
+                    self.stdout.write(self.style.SUCCESS(f"Dropped {name}"))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shorten.purge import purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Remove deleted URLs and accounts together with their click history, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.PURGE_CHUNK_SIZE, help="Click events deleted per transaction.")
+        parser.add_argument("--every", type=int, help="Keep running and purge every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            urls, clicks, users = purge_deleted(chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Purged {urls} URLs, {clicks} clicks and {users} users"))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
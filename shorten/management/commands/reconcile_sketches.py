@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shorten import sketches
+from shorten.models import URL
+
+
+class Command(BaseCommand):
+    help = "Rebuild the top-K analytics sketches of recently clicked URLs from exact database counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=int,
+            default=settings.ANALYTICS_SKETCH_RECONCILE_SECONDS,
+            help="Only reconcile URLs clicked within this many seconds (default: the reconcile interval).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options["since"])
+        reconciled = 0
+        for url in URL.objects.filter(clicked_date__gte=cutoff).only("pk").iterator():
+            for dimension in sketches.SKETCH_DIMENSIONS:
+                sketches.reconcile(url, dimension)
+            reconciled += 1
+        self.stdout.write(self.style.SUCCESS(f"Reconciled sketches for {reconciled} URLs"))
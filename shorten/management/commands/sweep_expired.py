@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shorten.expiry import sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Deactivate links past their expiry date or click limit."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.EXPIRY_SWEEP_BATCH_SIZE, help="Links swept per query.")
+        parser.add_argument("--every", type=int, help="Keep running and sweep every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            swept = sweep_expired(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Swept {swept} expired links"))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0007_alter_url_short_code_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClickArchive",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField()),
+                ("clicks", models.PositiveIntegerField(default=0)),
+                ("daily", models.JSONField(default=dict)),
+                ("countries", models.JSONField(default=dict)),
+                ("cities", models.JSONField(default=dict)),
+                ("referrers", models.JSONField(default=dict)),
+                ("url", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="click_archives", to="shorten.url")),
+            ],
+            options={
+                "db_table": "tb_url_analytics_archive",
+                "default_permissions": (),
+                "unique_together": {("url", "month")},
+            },
+        ),
+    ]
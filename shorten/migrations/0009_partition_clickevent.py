@@ -0,0 +1,59 @@
+# Converts tb_url_analytics into a monthly range-partitioned table on PostgreSQL.
+# Other backends keep the plain table; the model definition is unchanged.
+
+from django.db import migrations
+
+from shorten import partitions
+
+TABLE = partitions.PARENT_TABLE
+OLD_TABLE = f"{TABLE}_unpartitioned"
+SEQUENCE = f"{TABLE}_id_seq"
+
+
+def partition_click_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s", [TABLE, f"{TABLE}_pkey"])
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT date_trunc('month', MIN(clicked_at))::date, COALESCE(MAX(id), 0) FROM " + TABLE)
+        first_month, max_id = cursor.fetchone()
+
+        # Move the existing table and its index names out of the way. Its identity
+        # sequence is dropped so the id sequence can be recreated for the new table.
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+        cursor.execute(f"ALTER INDEX {TABLE}_pkey RENAME TO {OLD_TABLE}_pkey")
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_old"')
+
+        # The partition key has to be part of the primary key
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (clicked_at)")
+        cursor.execute(f"CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute("SELECT setval(%s, %s, %s)", [SEQUENCE, max(max_id, 1), max_id > 0])
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, clicked_at)")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_url_id_fk_tb_urls_id FOREIGN KEY (url_id) REFERENCES tb_urls (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        # The definitions were read before the rename, so they target the new parent table
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        partitions.ensure_partitions(start=first_month, cursor=cursor)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {partitions.DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0008_clickarchive"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_click_table, migrations.RunPython.noop),
+    ]
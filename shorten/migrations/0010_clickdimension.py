@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0009_partition_clickevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClickDimension",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.PositiveSmallIntegerField(choices=[(1, "Country"), (2, "City"), (3, "Region"), (4, "User Agent"), (5, "Referrer")])),
+                ("value", models.TextField()),
+                ("digest", models.CharField(max_length=40)),
+            ],
+            options={
+                "db_table": "tb_click_dimensions",
+                "default_permissions": (),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name="clickdimension",
+            unique_together={("kind", "digest")},
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="city_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="country_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="referrer_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="region_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="user_agent_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddIndex(
+            model_name="clickevent",
+            index=models.Index(fields=["country_dim"], name="tb_url_anal_country_ebdc2c_idx"),
+        ),
+    ]
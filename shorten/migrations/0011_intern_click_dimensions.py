@@ -0,0 +1,57 @@
+# Moves the raw click attributes into tb_click_dimensions in batches. The migration is
+# not atomic so every batch commits on its own and large tables can be converted
+# without one long-running transaction.
+
+import hashlib
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+# Raw column -> (dimension kind, new foreign key)
+COLUMNS = {
+    "country": (1, "country_dim"),
+    "city": (2, "city_dim"),
+    "region": (3, "region_dim"),
+    "user_agent": (4, "user_agent_dim"),
+    "referrer": (5, "referrer_dim"),
+}
+
+
+def intern_click_dimensions(apps, schema_editor):
+    ClickEvent = apps.get_model("shorten", "ClickEvent")
+    ClickDimension = apps.get_model("shorten", "ClickDimension")
+    ids = {}
+
+    def intern(kind, value):
+        if value is None:
+            return None
+        if (kind, value) not in ids:
+            digest = hashlib.sha1(value.encode()).hexdigest()
+            dimension, _ = ClickDimension.objects.get_or_create(kind=kind, digest=digest, defaults={"value": value})
+            ids[(kind, value)] = dimension.pk
+        return ids[(kind, value)]
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            batch = list(ClickEvent.objects.filter(pk__gt=last_pk).order_by("pk").only("pk", *COLUMNS)[:BATCH_SIZE])
+            if not batch:
+                return
+            for event in batch:
+                for column, (kind, field) in COLUMNS.items():
+                    setattr(event, f"{field}_id", intern(kind, getattr(event, column)))
+            ClickEvent.objects.bulk_update(batch, [field for _, field in COLUMNS.values()], batch_size=1000)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("shorten", "0010_clickdimension"),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_click_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0011_intern_click_dimensions"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="clickevent",
+            name="tb_url_anal_country_879252_idx",
+        ),
+        migrations.RemoveField(
+            model_name="clickevent",
+            name="city",
+        ),
+        migrations.RemoveField(
+            model_name="clickevent",
+            name="country",
+        ),
+        migrations.RemoveField(
+            model_name="clickevent",
+            name="referrer",
+        ),
+        migrations.RemoveField(
+            model_name="clickevent",
+            name="region",
+        ),
+        migrations.RemoveField(
+            model_name="clickevent",
+            name="user_agent",
+        ),
+    ]
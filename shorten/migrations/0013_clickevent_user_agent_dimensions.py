@@ -0,0 +1,139 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:23
+
+import hashlib
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 10000
+
+# Dimension kinds as of this migration
+USER_AGENT, BROWSER, OPERATING_SYSTEM, DEVICE_TYPE = 4, 6, 7, 8
+
+# Frozen copy of the shorten.useragents pattern tables as of this migration
+UNKNOWN = "Other"
+
+BROWSER_PATTERNS = [
+    (re.compile(pattern), family)
+    for pattern, family in (
+        (r"Edg(?:e|A|iOS)?/", "Edge"),
+        (r"OPR/|Opera", "Opera"),
+        (r"SamsungBrowser/", "Samsung Internet"),
+        (r"YaBrowser/", "Yandex Browser"),
+        (r"UCBrowser/", "UC Browser"),
+        (r"FBAN|FBAV", "Facebook App"),
+        (r"Instagram", "Instagram App"),
+        (r"Firefox/|FxiOS/", "Firefox"),
+        (r"CriOS/|Chrome/|Chromium/", "Chrome"),
+        (r"MSIE |Trident/", "Internet Explorer"),
+        (r"Version/[\d.]+.*Safari/|Mobile/\w+ Safari", "Safari"),
+        (r"curl/|Wget/|python-requests|okhttp|Go-http-client", "HTTP Library"),
+    )
+]
+
+OS_PATTERNS = [
+    (re.compile(pattern), family)
+    for pattern, family in (
+        (r"Windows Phone", "Windows Phone"),
+        (r"Windows", "Windows"),
+        (r"iPhone|iPad|iPod", "iOS"),
+        (r"Android", "Android"),
+        (r"CrOS", "Chrome OS"),
+        (r"Mac OS X|Macintosh", "macOS"),
+        (r"Linux|X11", "Linux"),
+    )
+]
+
+DEVICE_PATTERNS = [
+    (re.compile(pattern), device)
+    for pattern, device in (
+        (r"iPad|Tablet|Kindle|Silk/|Android(?!.*Mobile)", "tablet"),
+        (r"Mobi|iPhone|iPod|Android.*Mobile|Windows Phone", "mobile"),
+        (r"SmartTV|SMART-TV|AppleTV|CrKey|Roku", "tv"),
+        (r"Windows|Macintosh|X11|CrOS", "desktop"),
+    )
+]
+
+
+def first_match(patterns, user_agent):
+    if user_agent:
+        for pattern, name in patterns:
+            if pattern.search(user_agent):
+                return name
+    return UNKNOWN
+
+
+def classify_existing_clicks(apps, schema_editor):
+    """
+    Classify the stored clicks in pk batches, parsing each distinct user agent once.
+    """
+    ClickEvent = apps.get_model("shorten", "ClickEvent")
+    ClickDimension = apps.get_model("shorten", "ClickDimension")
+    ids, classified = {}, {}
+
+    def intern(kind, value):
+        if (kind, value) not in ids:
+            digest = hashlib.sha1(value.encode()).hexdigest()
+            ids[(kind, value)] = ClickDimension.objects.get_or_create(kind=kind, digest=digest, defaults={"value": value})[0].pk
+        return ids[(kind, value)]
+
+    def classify(user_agent):
+        return (
+            intern(BROWSER, first_match(BROWSER_PATTERNS, user_agent)),
+            intern(OPERATING_SYSTEM, first_match(OS_PATTERNS, user_agent)),
+            intern(DEVICE_TYPE, first_match(DEVICE_PATTERNS, user_agent)),
+        )
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            batch = list(ClickEvent.objects.filter(pk__gt=last_pk).order_by("pk").only("pk", "user_agent_dim_id")[:BATCH_SIZE])
+            if not batch:
+                return
+            new = {event.user_agent_dim_id for event in batch} - classified.keys()
+            user_agents = dict(ClickDimension.objects.filter(pk__in=new - {None}).values_list("pk", "value"))
+            classified.update({dimension_id: classify(user_agents.get(dimension_id)) for dimension_id in new})
+            for event in batch:
+                event.browser_dim_id, event.operating_system_dim_id, event.device_type_dim_id = classified[event.user_agent_dim_id]
+            ClickEvent.objects.bulk_update(batch, ["browser_dim", "operating_system_dim", "device_type_dim"], batch_size=1000)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False  # every batch commits on its own
+
+    dependencies = [
+        ("shorten", "0012_remove_clickevent_raw_dimensions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clickarchive",
+            name="devices",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="browser_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="device_type_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AddField(
+            model_name="clickevent",
+            name="operating_system_dim",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="shorten.clickdimension"),
+        ),
+        migrations.AlterField(
+            model_name="clickdimension",
+            name="kind",
+            field=models.PositiveSmallIntegerField(
+                choices=[(1, "Country"), (2, "City"), (3, "Region"), (4, "User Agent"), (5, "Referrer"), (6, "Browser"), (7, "Operating System"), (8, "Device Type")]
+            ),
+        ),
+        migrations.RunPython(classify_existing_clicks, migrations.RunPython.noop),
+    ]
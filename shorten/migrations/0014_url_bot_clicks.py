@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0013_clickevent_user_agent_dimensions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="bot_clicks",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
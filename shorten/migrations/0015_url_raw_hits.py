@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0014_url_bot_clicks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="raw_hits",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
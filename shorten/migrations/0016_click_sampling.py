@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0015_url_raw_hits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clickevent",
+            name="weight",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="url",
+            name="sample_rate",
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:38
+
+from collections import Counter
+from datetime import date
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_account_clicks(apps, schema_editor):
+    """
+    Seed the account counters from the URL click totals and the stored and archived click events.
+    """
+    URL = apps.get_model("shorten", "URL")
+    ClickEvent = apps.get_model("shorten", "ClickEvent")
+    ClickArchive = apps.get_model("shorten", "ClickArchive")
+    AccountClicks = apps.get_model("shorten", "AccountClicks")
+    AccountDailyClicks = apps.get_model("shorten", "AccountDailyClicks")
+
+    totals = URL.objects.order_by().values("user_id").annotate(total=Sum("clicks"))
+    AccountClicks.objects.bulk_create((AccountClicks(user_id=row["user_id"], clicks=row["total"] or 0) for row in totals.iterator()), batch_size=1000)
+
+    daily = Counter()
+    events = ClickEvent.objects.order_by().annotate(day=TruncDate("clicked_at")).values("url__user_id", "day").annotate(total=Sum("weight"))
+    for row in events.iterator():
+        daily[(row["url__user_id"], row["day"])] += row["total"]
+    for user_id, days in ClickArchive.objects.values_list("url__user_id", "daily").iterator():
+        for day, clicks in days.items():
+            daily[(user_id, date.fromisoformat(day))] += clicks
+    AccountDailyClicks.objects.bulk_create((AccountDailyClicks(user_id=user_id, day=day, clicks=clicks) for (user_id, day), clicks in daily.items()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0016_click_sampling"),
+        ("users", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountClicks",
+            fields=[
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="click_totals", serialize=False, to=settings.AUTH_USER_MODEL)),
+                ("clicks", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "tb_account_clicks",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="AccountDailyClicks",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("clicks", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "tb_account_daily_clicks",
+                "default_permissions": (),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(fields=["user", "clicks"], name="tb_urls_user_id_e55dc3_idx"),
+        ),
+        migrations.AddField(
+            model_name="accountdailyclicks",
+            name="user",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="daily_clicks", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name="accountdailyclicks",
+            unique_together={("user", "day")},
+        ),
+        migrations.RunPython(backfill_account_clicks, migrations.RunPython.noop),
+    ]
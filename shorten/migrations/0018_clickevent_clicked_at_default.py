@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0017_account_clicks"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="clickevent",
+            name="clicked_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
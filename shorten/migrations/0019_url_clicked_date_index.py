@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0018_clickevent_clicked_at_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(fields=["clicked_date"], name="tb_urls_clicked_c741ae_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0019_url_clicked_date_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(fields=["deleted_at"], name="tb_urls_deleted_80a78f_idx"),
+        ),
+    ]
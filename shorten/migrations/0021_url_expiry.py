@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:23
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0020_url_deleted_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpiredURL",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("url_id", models.BigIntegerField()),
+                ("name", models.CharField(blank=True, max_length=255)),
+                ("short_code", models.TextField()),
+                ("long_url", models.TextField()),
+                ("created_at", models.DateTimeField()),
+                ("expires_at", models.DateTimeField()),
+                ("clicks", models.PositiveIntegerField(default=0)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "tb_expired_urls",
+                "default_permissions": (),
+            },
+        ),
+        migrations.AddField(
+            model_name="url",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="url",
+            name="max_clicks",
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(condition=models.Q(("expires_at__isnull", False)), fields=["expires_at"], name="tb_urls_expires_at_idx"),
+        ),
+        migrations.AddField(
+            model_name="expiredurl",
+            name="user",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="expired_urls", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name="expiredurl",
+            index=models.Index(fields=["user", "expires_at"], name="tb_expired__user_id_ddf110_idx"),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def restore_swept_links(apps, schema_editor):
+    # Links swept before is_active existed were marked deleted; keep them as inactive links instead
+    URL = apps.get_model("shorten", "URL")
+    ExpiredURL = apps.get_model("shorten", "ExpiredURL")
+    URL.objects.filter(pk__in=ExpiredURL.objects.values("url_id")).update(deleted_at=None, is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorten", "0021_url_expiry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="is_active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(restore_swept_links, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="expiredurl",
+            name="user",
+        ),
+        migrations.RemoveIndex(
+            model_name="url",
+            name="tb_urls_expires_at_idx",
+        ),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(condition=models.Q(("expires_at__isnull", False), ("is_active", True)), fields=["expires_at"], name="tb_urls_expires_at_idx"),
+        ),
+        migrations.DeleteModel(
+            name="ExpiredURL",
+        ),
+    ]
@@ -1,9 +1,20 @@
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 from users.models import CustomUser as User
 import random
 import string
 
 
+class LiveURLManager(models.Manager):
+    """
+    URLs that have not been deleted. Deleted rows stay until shorten.purge removes them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class URL(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="urls", db_index=True)
     name = models.CharField(max_length=255, blank=True)
@@ -11,13 +22,27 @@ class URL(models.Model):
     long_url = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     clicks = models.PositiveIntegerField(default=0)
+    bot_clicks = models.PositiveIntegerField(default=0)  # Redirects served to bots, not counted in clicks
+    raw_hits = models.PositiveIntegerField(default=0)  # Human redirects including suppressed duplicates
+    sample_rate = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])  # Record 1 in N clicks, adaptive when unset
     clicked_date = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # Redirects stop at this time, then the link is swept (see shorten.expiry)
+    max_clicks = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])  # Human clicks served before the link expires
+    is_active = models.BooleanField(default=True)  # Cleared when an expired link is swept, the row and its clicks are kept
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Set on deletion, the row and its clicks are purged later
+
+    objects = LiveURLManager()
+    all_objects = models.Manager()
 
     def save(self, *args, **kwargs):
         if not self.short_code:
             self.short_code = generate_short_code()
         super().save(*args, **kwargs)
 
+    def mark_deleted(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+
     class Meta:
         db_table = "tb_urls"
         default_permissions = ()
@@ -25,21 +50,102 @@ class URL(models.Model):
             models.Index(fields=["user", "short_code"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["clicks"]),
+            models.Index(fields=["user", "clicks"]),
+            models.Index(fields=["clicked_date"]),
+            models.Index(fields=["deleted_at"]),
+            # Only active links with an expiry are indexed, so the sweeper's scan stays small
+            models.Index(fields=["expires_at"], condition=models.Q(expires_at__isnull=False, is_active=True), name="tb_urls_expires_at_idx"),
         ]
 
     def __str__(self):
         return f"{self.short_code} -> {self.long_url}"
 
 
+class ClickDimension(models.Model):
+    """
+    Interned value of a repeated click attribute (see shorten.dimensions).
+    """
+
+    class Kind(models.IntegerChoices):
+        COUNTRY = 1
+        CITY = 2
+        REGION = 3
+        USER_AGENT = 4
+        REFERRER = 5
+        BROWSER = 6
+        OPERATING_SYSTEM = 7
+        DEVICE_TYPE = 8
+
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices)
+    value = models.TextField()
+    digest = models.CharField(max_length=40)  # sha1 of value, keeps the unique index small
+
+    class Meta:
+        db_table = "tb_click_dimensions"
+        default_permissions = ()
+        unique_together = ("kind", "digest")
+
+
+def _dimension_property(name):
+    """
+    Expose an interned dimension as a plain string attribute. Assigned values are
+    interned when the event is saved.
+    """
+
+    def getter(self):
+        pending = self.__dict__.get("_pending_dimensions", {})
+        if name in pending:
+            return pending[name]
+        from .dimensions import value_of
+
+        return value_of(getattr(self, f"{name}_dim_id"))
+
+    def setter(self, value):
+        self.__dict__.setdefault("_pending_dimensions", {})[name] = value
+
+    return property(getter, setter)
+
+
+def _dimension_field():
+    return models.ForeignKey(ClickDimension, on_delete=models.PROTECT, null=True, blank=True, related_name="+", db_index=False)
+
+
 class ClickEvent(models.Model):
     url = models.ForeignKey(URL, on_delete=models.CASCADE, related_name="clicks_data")
-    clicked_at = models.DateTimeField(auto_now_add=True)  # Stores exact click time
+    clicked_at = models.DateTimeField(default=timezone.now)  # Stores exact click time, settable for replayed clicks
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    country = models.CharField(max_length=100, null=True, blank=True)
-    city = models.CharField(max_length=100, null=True, blank=True)
-    region = models.CharField(max_length=100, null=True, blank=True)
-    user_agent = models.TextField(null=True, blank=True)
-    referrer = models.URLField(null=True, blank=True)
+    country_dim = _dimension_field()
+    city_dim = _dimension_field()
+    region_dim = _dimension_field()
+    user_agent_dim = _dimension_field()
+    referrer_dim = _dimension_field()
+    browser_dim = _dimension_field()
+    operating_system_dim = _dimension_field()
+    device_type_dim = _dimension_field()
+    weight = models.PositiveIntegerField(default=1)  # Clicks this event stands for when the URL is sampled
+
+    country = _dimension_property("country")
+    city = _dimension_property("city")
+    region = _dimension_property("region")
+    user_agent = _dimension_property("user_agent")
+    referrer = _dimension_property("referrer")
+    browser = _dimension_property("browser")
+    operating_system = _dimension_property("operating_system")
+    device_type = _dimension_property("device_type")
+
+    def resolve_dimensions(self):
+        """
+        Intern the dimension values assigned since the last save. Called by save();
+        bulk_create callers have to call it themselves.
+        """
+        from .dimensions import DIMENSION_KINDS, intern
+
+        for name, value in self.__dict__.pop("_pending_dimensions", {}).items():
+            setattr(self, f"{name}_dim_id", intern(DIMENSION_KINDS[name], value))
+
+    def save(self, *args, **kwargs):
+        self.resolve_dimensions()
+        super().save(*args, **kwargs)
 
     class Meta:
         db_table = "tb_url_analytics"
@@ -47,14 +153,62 @@ class ClickEvent(models.Model):
         indexes = [
             models.Index(fields=["url", "clicked_at"]),
             models.Index(fields=["ip_address"]),
-            models.Index(fields=["country"]),
+            models.Index(fields=["country_dim"]),
         ]
 
 
+class ClickArchive(models.Model):
+    """
+    Per-month aggregates of click events that were moved to cold storage.
+    """
+
+    url = models.ForeignKey(URL, on_delete=models.CASCADE, related_name="click_archives")
+    month = models.DateField()
+    clicks = models.PositiveIntegerField(default=0)
+    daily = models.JSONField(default=dict)
+    countries = models.JSONField(default=dict)
+    cities = models.JSONField(default=dict)
+    referrers = models.JSONField(default=dict)
+    devices = models.JSONField(default=dict)  # {"browser": {...}, "operating_system": {...}, "device_type": {...}}
+
+    class Meta:
+        db_table = "tb_url_analytics_archive"
+        default_permissions = ()
+        unique_together = ("url", "month")
+
+
+class AccountClicks(models.Model):
+    """
+    Click total across all URLs of a user, maintained at ingest.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="click_totals")
+    clicks = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "tb_account_clicks"
+        default_permissions = ()
+
+
+class AccountDailyClicks(models.Model):
+    """
+    Clicks per day across all URLs of a user, maintained at ingest.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_clicks")
+    day = models.DateField()
+    clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "tb_account_daily_clicks"
+        default_permissions = ()
+        unique_together = ("user", "day")
+
+
 def generate_short_code():
     length = 12
     characters = string.ascii_letters + string.digits
     while True:
         code = "".join(random.choices(characters, k=length))  # Generate a random code
-        if not URL.objects.filter(short_code=code).exists():
+        if not URL.all_objects.filter(short_code=code).exists():
             return code
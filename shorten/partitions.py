@@ -0,0 +1,118 @@
+"""
+Monthly range partitioning of ``tb_url_analytics`` on PostgreSQL.
+
+Migration 0009 turns the click table into a table partitioned by ``clicked_at``
+with one partition per month plus a DEFAULT partition that catches rows outside
+every range. The helpers below keep upcoming partitions created and turn
+retention into ``DETACH PARTITION`` + ``DROP TABLE``. On other database
+backends (SQLite in tests) the table stays a plain table and they do nothing.
+"""
+
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection
+
+PARENT_TABLE = "tb_url_analytics"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def month_ranges(start, months):
+    """
+    ``(name, lower, upper)`` for ``months`` consecutive monthly partitions from ``start``.
+    """
+    first = month_start(start)
+    return [(partition_name(add_months(first, offset)), add_months(first, offset), add_months(first, offset + 1)) for offset in range(months)]
+
+
+def create_partition_sql(name, lower, upper):
+    return f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM ('{lower.isoformat()} 00:00+00') TO ('{upper.isoformat()} 00:00+00')"
+
+
+def ensure_partitions(start=None, months_ahead=None, cursor=None):
+    """
+    Create the partitions from ``start``'s month up to ``months_ahead`` months in the future.
+    Returns the names of the partitions that are now guaranteed to exist.
+    """
+    if not is_supported():
+        return []
+    today = date.today()
+    months_ahead = settings.CLICK_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    start = month_start(start or today)
+    end = add_months(month_start(today), months_ahead + 1)
+    months = (end.year - start.year) * 12 + end.month - start.month
+    ranges = month_ranges(start, months)
+
+    def create(cursor):
+        for name, lower, upper in ranges:
+            cursor.execute(create_partition_sql(name, lower, upper))
+
+    if cursor is not None:
+        create(cursor)
+    else:
+        with connection.cursor() as cursor:
+            create(cursor)
+    return [name for name, _, _ in ranges]
+
+
+def list_partitions():
+    """
+    Monthly partitions currently attached to the click table, as ``(name, upper bound)``.
+    """
+    if not is_supported():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        if name == DEFAULT_PARTITION:
+            continue
+        year, month = name[len(PARENT_TABLE) + 1 :].split("_")
+        partitions.append((name, add_months(date(int(year), int(month), 1), 1)))
+    return partitions
+
+
+def drop_partitions_before(cutoff):
+    """
+    Detach and drop every monthly partition that only holds rows older than ``cutoff``.
+    """
+    if isinstance(cutoff, datetime):
+        cutoff = cutoff.date()
+    dropped = []
+    for name, upper in list_partitions():
+        if upper > cutoff:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
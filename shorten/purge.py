@@ -0,0 +1,56 @@
+"""
+Background removal of deleted URLs and accounts.
+
+Deleting a URL or an account through the API only marks it (``deleted_at``),
+which hides it and stops its redirects at once. ``purge_deleted`` then removes
+the click events of each deleted URL in chunks of PURGE_CHUNK_SIZE, one short
+transaction per chunk, so neither the request nor the purge holds locks on the
+click table for long; the URL row and its monthly archives go last. An account
+is removed once none of its URLs are left.
+
+Only rows deleted at least PURGE_DELAY_SECONDS ago are purged, which leaves time
+for clicks still buffered in workers to be written for them.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import URL, ClickEvent
+from users.models import CustomUser as User
+
+
+def purge_url(url_id, chunk_size):
+    """
+    Delete the clicks of a URL chunk by chunk, then the URL. Returns the number of deleted clicks.
+    """
+    total = 0
+    while True:
+        ids = list(ClickEvent.objects.filter(url_id=url_id).order_by().values_list("pk", flat=True)[:chunk_size])
+        if ids:
+            with transaction.atomic():
+                ClickEvent.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+        if len(ids) < chunk_size:
+            break
+    # Archives are one row per month: they go with the URL in a single cascading DELETE
+    URL.all_objects.filter(pk=url_id).delete()
+    return total
+
+
+def purge_deleted(chunk_size=None):
+    """
+    Remove URLs and accounts marked deleted. Returns ``(urls, clicks, users)`` counts.
+    """
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    cutoff = timezone.now() - timedelta(seconds=settings.PURGE_DELAY_SECONDS)
+    url_ids = list(URL.all_objects.filter(deleted_at__lte=cutoff).values_list("pk", flat=True))
+    clicks = sum(purge_url(url_id, chunk_size) for url_id in url_ids)
+
+    users = 0
+    for user in User.objects.filter(deleted_at__lte=cutoff).exclude(pk__in=URL.all_objects.values("user_id")):
+        user.delete()
+        users += 1
+    return len(url_ids), clicks, users
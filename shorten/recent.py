@@ -0,0 +1,94 @@
+"""
+Ring buffer of the latest clicks per URL, kept in the shared cache.
+
+The buffer is a head counter (``recent:{url_id}``, bumped with ``cache.incr``)
+and RECENT_CLICKS_SIZE slot keys (``recent:{url_id}:{n % size}``). Every click
+takes the next position and overwrites its slot, so concurrent workers never
+read-modify-write a shared list. Slots hold compact tuples rather than dicts.
+
+A buffer only exists once something has read it: the first read loads the
+latest events from the database and seeds the slots; the click pipeline then
+keeps it current. When the head or any slot was evicted the buffer is cold
+again and the next read falls back to the database.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import dimensions
+from .models import ClickEvent
+
+COLUMNS = ("clicked_at", "ip_address", "country", "city", "region", "user_agent", "referrer", "weight")
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _head_key(url_id):
+    return f"recent:{url_id}"
+
+
+def _slot_key(url_id, position):
+    return f"recent:{url_id}:{position % settings.RECENT_CLICKS_SIZE}"
+
+
+def encode(click):
+    """
+    Pack a click dict into a tuple, with ``clicked_at`` in epoch microseconds.
+    """
+    clicked_at = (click["clicked_at"] - EPOCH) // timedelta(microseconds=1)
+    return (clicked_at, *(click[column] for column in COLUMNS[1:]))
+
+
+def decode(entry):
+    click = dict(zip(COLUMNS, entry))
+    click["clicked_at"] = EPOCH + timedelta(microseconds=click["clicked_at"])
+    return click
+
+
+def push(event):
+    """
+    Append a freshly recorded event to the URL's buffer, if the buffer is warm.
+    """
+    try:
+        position = cache.incr(_head_key(event.url_id))
+    except ValueError:
+        return
+    timeout = settings.RECENT_CLICKS_TIMEOUT
+    cache.set(_slot_key(event.url_id, position), encode({column: getattr(event, column) for column in COLUMNS}), timeout)
+    cache.touch(_head_key(event.url_id), timeout)
+
+
+def _from_database(url_id):
+    lookups = [dimensions.dimension_field(column) if column in dimensions.DIMENSION_KINDS else column for column in COLUMNS]
+    rows = ClickEvent.objects.filter(url_id=url_id).order_by("-clicked_at").values_list(*lookups)[: settings.RECENT_CLICKS_SIZE]
+    return [dict(zip(COLUMNS, row)) for row in dimensions.decode_rows(rows, COLUMNS)]
+
+
+def _warm(url_id, clicks):
+    size, timeout = settings.RECENT_CLICKS_SIZE, settings.RECENT_CLICKS_TIMEOUT
+    # Oldest first, so the newest click ends up at the head position
+    head = size + len(clicks)
+    slots = {_slot_key(url_id, head - index): encode(click) for index, click in enumerate(clicks)}
+    cache.set_many(slots, timeout)
+    cache.set(_head_key(url_id), head, timeout)
+
+
+def latest(url_id, limit=None):
+    """
+    The latest ``limit`` clicks of a URL, newest first, from the buffer when it is
+    warm and from the database otherwise.
+    """
+    size = settings.RECENT_CLICKS_SIZE
+    limit = min(limit or size, size)
+    head = cache.get(_head_key(url_id))
+    if head is not None:
+        # Positions at or below ``size`` were never written (seeding starts above it)
+        positions = [position for position in range(head, head - limit, -1) if position > size]
+        slots = cache.get_many([_slot_key(url_id, position) for position in positions])
+        if len(slots) == len(positions):
+            return [decode(slots[_slot_key(url_id, position)]) for position in positions]
+
+    clicks = _from_database(url_id)
+    _warm(url_id, clicks)
+    return clicks[:limit]
@@ -0,0 +1,169 @@
+"""
+Cache-first resolution of short codes.
+
+Resolved codes are cached as small tuples under ``resolve:{short_code}`` for
+RESOLVER_CACHE_TIMEOUT seconds; unknown codes are cached as a miss for
+RESOLVER_NEGATIVE_TIMEOUT seconds so repeated lookups of dead links stay off the
+database. Entries are invalidated when a URL is saved or deleted (see
+shorten.signals).
+
+In front of the cache sits the host-wide shared table (shorten.sharedtable):
+codes found there are answered without a cache round trip, and codes resolved
+from the cache or the database are copied into it for the other workers.
+
+Database loads of a single code go through shorten.singleflight, so a burst of
+redirects to a link that is not cached yet costs one query.
+
+Entries carry the expiry fields of the link (``expires_at``, ``max_clicks`` and
+the click count the cap starts from), so shorten.expiry checks them without a
+query. Links swept inactive resolve as unknown codes.
+
+``warm`` preloads the hottest links when a worker starts (see gunicorn.conf.py),
+so a deploy does not send every first redirect to the database.
+"""
+
+import json
+import time
+
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import sharedtable, singleflight
+from .models import URL
+
+FIELDS = ("id", "user_id", "short_code", "long_url", "sample_rate", "expires_at", "max_clicks", "clicks")
+MISSING = 0  # Cached for codes that do not exist
+WARM_LOCK_KEY = "resolve:warming"
+# Most clicked, most recently clicked and newest links, each served by an index
+WARM_ORDERINGS = (("-clicks", {}), ("-clicked_date", {"clicked_date__isnull": False}), ("-created_at", {}))
+
+
+class ResolvedURL(namedtuple("ResolvedURL", FIELDS)):
+    __slots__ = ()
+
+    def to_instance(self):
+        """
+        An unsaved URL carrying the resolved fields, enough for the click pipeline.
+        """
+        return URL(**self._asdict())
+
+
+def _cache_key(short_code):
+    return f"resolve:{short_code}"
+
+
+def _encode(entry):
+    expires_at = entry.expires_at.timestamp() if entry.expires_at else None
+    return json.dumps([entry.id, str(entry.user_id), entry.long_url, entry.sample_rate, expires_at, entry.max_clicks, entry.clicks], separators=(",", ":")).encode()
+
+
+def _decode(short_code, value):
+    values = json.loads(value)
+    if len(values) != len(FIELDS) - 1:
+        return None  # Written by an older release
+    url_id, user_id, long_url, sample_rate, expires_at, max_clicks, clicks = values
+    user_id = URL._meta.get_field("user").target_field.to_python(user_id)
+    expires_at = datetime.fromtimestamp(expires_at, dt_timezone.utc) if expires_at is not None else None
+    return ResolvedURL(url_id, user_id, short_code, long_url, sample_rate, expires_at, max_clicks, clicks)
+
+
+def _from_database(short_codes):
+    return {row[2]: ResolvedURL(*row) for row in URL.objects.filter(short_code__in=short_codes, is_active=True).values_list(*FIELDS)}
+
+
+def _store(found):
+    cache.set_many({_cache_key(code): tuple(entry) for code, entry in found.items()}, settings.RESOLVER_CACHE_TIMEOUT)
+
+
+def _load(short_codes):
+    found = _from_database(short_codes)
+    _store(found)
+    cache.set_many({_cache_key(code): MISSING for code in short_codes if code not in found}, settings.RESOLVER_NEGATIVE_TIMEOUT)
+    return found
+
+
+def resolve_many(short_codes):
+    """
+    Resolve short codes to ResolvedURL entries: first from the shared table, then
+    with one cache read and at most one ``short_code IN (...)`` query for the codes
+    that were not cached. Unknown codes are left out of the result.
+    """
+    table = sharedtable.table()
+    resolved, missing = {}, []
+    if table is not None:
+        for code in set(short_codes):
+            value = table.get(code)
+            entry = _decode(code, value) if value is not None else None
+            if entry is not None:
+                resolved[code] = entry
+    keys = {_cache_key(code): code for code in short_codes if code not in resolved}
+    if not keys:
+        return resolved
+
+    cached = cache.get_many(list(keys))
+    shared = []
+    for key, code in keys.items():
+        if key not in cached or (cached[key] != MISSING and len(cached[key]) != len(FIELDS)):
+            missing.append(code)  # Not cached, or cached by an older release
+        elif cached[key] != MISSING:
+            resolved[code] = ResolvedURL(*cached[key])
+            shared.append(code)
+
+    if missing:
+        # A single cold code is what a burst of redirects to a new link looks like
+        found = singleflight.do(_cache_key(missing[0]), partial(_load, missing)) if len(missing) == 1 else _load(missing)
+        resolved.update(found)
+        shared.extend(found)
+    if table is not None and shared:
+        table.put_many({code: _encode(resolved[code]) for code in shared})
+    return resolved
+
+
+def resolve(short_code):
+    return resolve_many([short_code]).get(short_code)
+
+
+def warm(count=None, budget=None):
+    """
+    Preload up to ``count`` of the hottest links into the cache and the shared table,
+    reading them in batches through the ``clicks``, ``clicked_date`` and ``created_at``
+    indexes and stopping once ``budget`` seconds are spent. Only one process warms
+    a shared cache at a time. Returns the number of links loaded.
+    """
+    count = settings.RESOLVER_WARM_COUNT if count is None else count
+    budget = settings.RESOLVER_WARM_SECONDS if budget is None else budget
+    if count <= 0 or not cache.add(WARM_LOCK_KEY, 1, budget):
+        return 0
+
+    deadline = time.monotonic() + budget
+    table = sharedtable.table()
+    loaded = {}
+    for position, (ordering, filters) in enumerate(WARM_ORDERINGS):
+        # Each ordering gets an equal share, plus what the previous ones left unused
+        share = -(-count * (position + 1) // len(WARM_ORDERINGS))
+        queryset = URL.objects.filter(is_active=True, **filters).order_by(ordering, "pk").values_list(*FIELDS)
+        offset = 0
+        while len(loaded) < share and time.monotonic() < deadline:
+            size = min(settings.RESOLVER_WARM_BATCH, share - len(loaded))
+            rows = list(queryset[offset : offset + size])
+            found = {row[2]: ResolvedURL(*row) for row in rows if row[2] not in loaded}
+            _store(found)
+            if table is not None:
+                table.put_many({code: _encode(entry) for code, entry in found.items()})
+            loaded.update(found)
+            offset += len(rows)
+            if len(rows) < size:
+                break  # Ordering exhausted
+    return len(loaded)
+
+
+def invalidate(*short_codes):
+    cache.delete_many([_cache_key(code) for code in short_codes])
+    singleflight.forget(*(_cache_key(code) for code in short_codes))
+    table = sharedtable.table()
+    if table is not None:
+        table.delete_many(short_codes)
@@ -0,0 +1,82 @@
+"""
+Sampled click recording for very hot links.
+
+Only one in N clicks of a URL is persisted as a ClickEvent, carrying
+``weight = N`` (the clicks it stands for), so weighted aggregates stay unbiased
+while the number of rows written per link is capped. N is ``URL.sample_rate``
+when set, otherwise it adapts to the click rate this process observes for the
+URL so that about CLICK_SAMPLING_TARGET_PER_SECOND events per second are
+written. Links below the target keep N = 1 and record every click.
+
+Skipped clicks are never lost: they go to URL.clicks through the buffered
+counters and are folded into the weight of the next persisted event.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class _LinkState:
+    __slots__ = ("window_start", "window_hits", "rate", "skipped")
+
+    def __init__(self, now):
+        self.window_start = now
+        self.window_hits = 0
+        self.rate = 0.0
+        self.skipped = 0
+
+
+class Sampler:
+    def __init__(self):
+        self._states = OrderedDict()  # url_id -> _LinkState, least recently clicked first
+        self._lock = threading.Lock()
+
+    def _state(self, url_id, now):
+        state = self._states.get(url_id)
+        if state is None:
+            state = self._states[url_id] = _LinkState(now)
+            while len(self._states) > settings.CLICK_SAMPLING_MAX_LINKS:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(url_id)
+        return state
+
+    def every(self, state, sample_rate):
+        if sample_rate:
+            return sample_rate
+        target = settings.CLICK_SAMPLING_TARGET_PER_SECOND
+        if target <= 0 or state.rate <= target:
+            return 1
+        return math.ceil(state.rate / target)
+
+    def sample(self, url_id, sample_rate=None, now=None):
+        """
+        Count a click and return the weight to persist it with, or 0 to skip it.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._state(url_id, now)
+            # The rate is measured over (at least) one-second windows
+            elapsed = now - state.window_start
+            if elapsed >= 1:
+                state.rate = state.window_hits / elapsed
+                state.window_start, state.window_hits = now, 0
+            state.window_hits += 1
+
+            state.skipped += 1
+            if state.skipped < self.every(state, sample_rate):
+                return 0
+            weight, state.skipped = state.skipped, 0
+            return weight
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+sampler = Sampler()
+sample = sampler.sample
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import URL
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import re
 
 
@@ -41,6 +42,12 @@ class URLSerializer(serializers.ModelSerializer):
 
         return value
 
+    def validate_expires_at(self, value):
+        if value is not None and value <= timezone.now():
+            raise serializers.ValidationError("Expiry must be in the future")
+        return value
+
     class Meta:
         model = URL
         fields = "__all__"
+        read_only_fields = ["deleted_at", "is_active"]
@@ -0,0 +1,178 @@
+"""
+Host-wide shared hash table for hot short-code lookups.
+
+All worker processes of a host map the same file (``/dev/shm`` by default), so
+there is one warm copy of the hot links per host instead of one per worker, and
+the memory used does not depend on the number of workers.
+
+Layout: a 32-byte header followed by SHARED_LINK_TABLE_SLOTS fixed-width slots
+of SHARED_LINK_TABLE_SLOT_SIZE bytes. Keys are placed by open addressing with
+linear probing over at most MAX_PROBE slots. Each slot is::
+
+    u32 sequence | u8 state | u8 key length | u16 value length | u32 key hash | u32 stored at | key (32 bytes) | value
+
+Reads take no lock: the sequence is a seqlock counter that the writer makes odd
+while it rewrites the slot, so a reader that sees an odd or changed sequence
+retries. Writes are serialized across processes by ``flock`` on a side file,
+so there is a single writer at any time. Entries older than
+SHARED_LINK_TABLE_TTL seconds are treated as missing, which bounds how long a
+change made through another host (whose invalidation cannot reach this file)
+stays visible.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+
+MAGIC = b"LNKTBL01"
+HEADER = struct.Struct("<8sIIQ8x")  # magic, slot count, slot size, reserved
+SLOT = struct.Struct("<IBBHII32s")  # sequence, state, key length, value length, key hash, stored at, key
+MAX_KEY = 32
+MAX_PROBE = 16
+READ_RETRIES = 4
+EMPTY, USED, DELETED = 0, 1, 2
+
+
+def _hash(key):
+    return zlib.crc32(key)
+
+
+class SharedTable:
+    def __init__(self, path, slots, slot_size):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_value = slot_size - SLOT.size
+        size = HEADER.size + slots * slot_size
+        with self._write_lock():
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size != size or os.pread(fd, HEADER.size, 0) != HEADER.pack(MAGIC, slots, slot_size, 0):
+                    # New file, or one laid out with other settings: start empty
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, HEADER.pack(MAGIC, slots, slot_size, 0), 0)
+                self._mmap = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+    @contextmanager
+    def _write_lock(self):
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _offset(self, index):
+        return HEADER.size + index * self.slot_size
+
+    def _probe(self, key_hash):
+        start = key_hash % self.slots
+        return [(start + step) % self.slots for step in range(min(MAX_PROBE, self.slots))]
+
+    def get(self, key):
+        """
+        The value stored for ``key`` (bytes), or None.
+        """
+        key = key.encode()
+        if len(key) > MAX_KEY:
+            return None
+        key_hash = _hash(key)
+        oldest = time.time() - settings.SHARED_LINK_TABLE_TTL
+        for index in self._probe(key_hash):
+            offset = self._offset(index)
+            for _ in range(READ_RETRIES):
+                sequence, state, key_length, value_length, slot_hash, stored_at, slot_key = SLOT.unpack_from(self._mmap, offset)
+                if sequence & 1:
+                    continue  # Being written
+                found = state == USED and slot_hash == key_hash and slot_key[:key_length] == key
+                value = self._mmap[offset + SLOT.size : offset + SLOT.size + value_length] if found else None
+                if struct.unpack_from("<I", self._mmap, offset)[0] == sequence:
+                    break
+            else:
+                return None  # Contended slot: let the caller fall back
+            if state == EMPTY:
+                return None
+            if found:
+                return value if stored_at >= oldest else None
+        return None
+
+    def _write(self, offset, state, key, value):
+        (sequence,) = struct.unpack_from("<I", self._mmap, offset)
+        struct.pack_into("<I", self._mmap, offset, (sequence + 1) & 0xFFFFFFFF)
+        self._mmap[offset + SLOT.size : offset + SLOT.size + len(value)] = value
+        struct.pack_into("<BBHII32s", self._mmap, offset + 4, state, len(key), len(value), _hash(key), int(time.time()), key)
+        struct.pack_into("<I", self._mmap, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def put_many(self, items):
+        """
+        Store ``{key: value}``. Values larger than a slot are skipped; when every probed
+        slot is taken, the first one is overwritten.
+        """
+        items = [(key.encode(), value) for key, value in items.items()]
+        items = [(key, value) for key, value in items if len(key) <= MAX_KEY and len(value) <= self.max_value]
+        if not items:
+            return
+        with self._write_lock():
+            for key, value in items:
+                key_hash = _hash(key)
+                target = None
+                for index in self._probe(key_hash):
+                    offset = self._offset(index)
+                    _, state, key_length, _, slot_hash, _, slot_key = SLOT.unpack_from(self._mmap, offset)
+                    if state == USED and slot_hash == key_hash and slot_key[:key_length] == key:
+                        target = offset
+                        break
+                    if state != USED and target is None:
+                        target = offset
+                    if state == EMPTY:
+                        break
+                self._write(self._offset(self._probe(key_hash)[0]) if target is None else target, USED, key, value)
+
+    def delete_many(self, keys):
+        keys = [key.encode() for key in keys]
+        with self._write_lock():
+            for key in keys:
+                if len(key) > MAX_KEY:
+                    continue
+                key_hash = _hash(key)
+                for index in self._probe(key_hash):
+                    offset = self._offset(index)
+                    _, state, key_length, _, slot_hash, _, slot_key = SLOT.unpack_from(self._mmap, offset)
+                    if state == EMPTY:
+                        break
+                    if state == USED and slot_hash == key_hash and slot_key[:key_length] == key:
+                        self._write(offset, DELETED, b"", b"")
+
+    def clear(self):
+        with self._write_lock():
+            for index in range(self.slots):
+                offset = self._offset(index)
+                if SLOT.unpack_from(self._mmap, offset)[1] != EMPTY:
+                    self._write(offset, EMPTY, b"", b"")
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def table():
+    """
+    This process's mapping of the shared table, or None when SHARED_LINK_TABLE_PATH is unset.
+    """
+    global _table
+    if not settings.SHARED_LINK_TABLE_PATH:
+        return None
+    with _table_lock:
+        if _table is None or _table.path != settings.SHARED_LINK_TABLE_PATH:
+            _table = SharedTable(settings.SHARED_LINK_TABLE_PATH, settings.SHARED_LINK_TABLE_SLOTS, settings.SHARED_LINK_TABLE_SLOT_SIZE)
+        return _table
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import edge, resolver
+from .models import URL
+from users.models import CustomUser as User
+
+
+@receiver(post_save, sender=URL)
+@receiver(post_delete, sender=URL)
+def invalidate_resolved_url(sender, instance, **kwargs):
+    """
+    Drop the cached resolution of a URL whenever it changes or goes away, and have
+    the nginx redirect map rewritten in case the link is served from it.
+    """
+    resolver.invalidate(instance.short_code)
+    if not kwargs.get("created"):
+        edge.request_export()
+
+
+@receiver(post_save, sender=User)
+def delete_user_urls(sender, instance, **kwargs):
+    """
+    Mark the URLs of a deleted user deleted too, so they stop redirecting before the purge.
+    """
+    if instance.deleted_at is None:
+        return
+    urls = URL.objects.filter(user=instance)
+    short_codes = list(urls.values_list("short_code", flat=True))
+    if short_codes:
+        urls.update(deleted_at=instance.deleted_at)
+        resolver.invalidate(*short_codes)
+        edge.request_export()
@@ -0,0 +1,97 @@
+"""
+Request coalescing for cold cache keys.
+
+``do(key, load)`` makes sure only one caller at a time runs ``load`` for a key.
+Within a process, threads asking for a key that is already being loaded wait for
+that load and share its result (or its exception). Across processes, the loading
+process holds ``singleflight:{key}:lock`` in the cache and publishes the result
+under ``singleflight:{key}:result`` for SINGLEFLIGHT_RESULT_TIMEOUT seconds;
+the other processes poll for it instead of loading too. A waiter that sees the
+lock released without a result, or waits longer than SINGLEFLIGHT_LOCK_TIMEOUT,
+loads the value itself.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _lock_key(key):
+    return f"singleflight:{key}:lock"
+
+
+def _result_key(key):
+    return f"singleflight:{key}:result"
+
+
+def _load_shared(key, load):
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SINGLEFLIGHT_LOCK_TIMEOUT
+    while not cache.add(_lock_key(key), token, settings.SINGLEFLIGHT_LOCK_TIMEOUT):
+        # Another process is loading: wait for its result. If it releases the lock
+        # without one (its load failed), the next add succeeds and the load runs here.
+        shared = cache.get(_result_key(key))
+        if shared is not None:
+            return shared[0]
+        if time.monotonic() >= deadline:
+            return load()
+        time.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+
+    try:
+        cache.delete(_result_key(key))  # Waiters must not pick up an earlier load
+        result = load()
+        cache.set(_result_key(key), (result,), settings.SINGLEFLIGHT_RESULT_TIMEOUT)
+        return result
+    finally:
+        if cache.get(_lock_key(key)) == token:
+            cache.delete(_lock_key(key))
+
+
+def forget(*keys):
+    """
+    Drop published results, for callers that invalidate what ``load`` returned.
+    """
+    cache.delete_many([_result_key(key) for key in keys])
+
+
+def do(key, load):
+    """
+    Return ``load()``, running it at most once at a time for ``key`` across threads
+    and processes. The result must be picklable.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _load_shared(key, load)
+        return call.result
+    except BaseException as error:
+        call.error = error
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
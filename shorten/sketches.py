@@ -0,0 +1,179 @@
+"""
+Bounded-memory heavy-hitter sketches for the top-K analytics sections.
+
+Each URL keeps one Space-Saving summary per dimension (country, city, referrer)
+in the cache, and the analytics view reads the top entries straight from them
+instead of running a GROUP BY over every event. Summaries are periodically
+rebuilt from the database so the approximation never drifts far from the exact
+counts.
+
+Clicks are not folded in one by one: ``record`` adds them to a per-process
+buffer, which is folded into the cached summaries with the counter flushes
+(see shorten.counters), one read and one write per URL for all its buffered
+clicks. A fold holds ``sketch:{url_id}:lock`` so folds of different processes
+do not overwrite each other; a URL whose lock is taken stays buffered until
+the next flush.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from . import counters, dimensions
+from .archive import archived_counts
+
+SKETCH_DIMENSIONS = ("country", "city", "referrer")
+LOCK_TIMEOUT = 5  # Seconds a fold may hold a URL's sketches
+
+# Dimension -> ClickArchive counter field holding its archived counts
+ARCHIVE_FIELDS = {"country": "countries", "city": "cities", "referrer": "referrers"}
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary (Metwally et al.) with a fixed number of counters.
+
+    Every tracked item carries an estimated count and the maximum over-estimation
+    error inherited from the counter it replaced. Any item whose true frequency is
+    above ``total / capacity`` is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity, counters=None, reconciled_at=0.0):
+        self.capacity = capacity
+        self.counters = counters if counters is not None else {}
+        self.reconciled_at = reconciled_at
+
+    def add(self, item, count=1):
+        if item in self.counters:
+            self.counters[item][0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            # Evict the smallest counter and let the new item inherit its count as error
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + count, floor]
+
+    def top(self, k):
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, value[0]) for item, value in ranked[:k]]
+
+    def to_cache(self):
+        return {"c": self.counters, "r": self.reconciled_at}
+
+    @classmethod
+    def from_cache(cls, capacity, payload):
+        return cls(capacity, counters=payload["c"], reconciled_at=payload["r"])
+
+
+def _cache_key(url_id, dimension):
+    return f"sketch:{url_id}:{dimension}"
+
+
+def _lock_key(url_id):
+    return f"sketch:{url_id}:lock"
+
+
+class SketchBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(Counter)  # (url_id, dimension) -> {value: weight}
+        self._last_flush = time.monotonic()
+
+    def add(self, url_id, values, weight=1):
+        with self._lock:
+            for dimension, value in values.items():
+                if dimension in SKETCH_DIMENSIONS and value:
+                    self._pending[(url_id, dimension)][value] += weight
+            due = time.monotonic() - self._last_flush >= settings.CLICK_COUNTER_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _requeue(self, pending):
+        with self._lock:
+            for key, counts in pending.items():
+                self._pending[key].update(counts)
+
+    def flush(self):
+        by_url = defaultdict(dict)
+        for (url_id, dimension), counts in self._take().items():
+            by_url[url_id][dimension] = counts
+
+        capacity = settings.ANALYTICS_SKETCH_CAPACITY
+        for url_id, folds in by_url.items():
+            token = uuid.uuid4().hex
+            if not cache.add(_lock_key(url_id), token, LOCK_TIMEOUT):
+                self._requeue({(url_id, dimension): counts for dimension, counts in folds.items()})
+                continue
+            try:
+                # Sketches that have not been built yet are left alone; they are created from the database on first read
+                payloads = cache.get_many([_cache_key(url_id, dimension) for dimension in folds])
+                updated = {}
+                for dimension, counts in folds.items():
+                    payload = payloads.get(_cache_key(url_id, dimension))
+                    if payload is None:
+                        continue
+                    sketch = SpaceSaving.from_cache(capacity, payload)
+                    for value, weight in counts.items():
+                        sketch.add(value, weight)
+                    updated[_cache_key(url_id, dimension)] = sketch.to_cache()
+                if updated:
+                    cache.set_many(updated, timeout=None)
+            finally:
+                if cache.get(_lock_key(url_id)) == token:
+                    cache.delete(_lock_key(url_id))
+
+    def clear(self):
+        self._take()
+
+
+buffer = SketchBuffer()
+counters.register(buffer.flush)
+
+
+def record(url_id, values, weight=1):
+    """
+    Buffer one click for the per-URL sketches. ``values`` maps dimension -> value.
+    """
+    buffer.add(url_id, values, weight)
+
+
+def reconcile(url, dimension):
+    """
+    Rebuild a sketch from the exact counts stored in the database, including archived clicks.
+    """
+    capacity = settings.ANALYTICS_SKETCH_CAPACITY
+    counts = archived_counts(url, ARCHIVE_FIELDS[dimension])
+    field = dimensions.dimension_field(dimension)
+    rows = list(url.clicks_data.exclude(**{f"{field}__isnull": True}).values(field).annotate(count=Sum("weight")).order_by("-count")[:capacity])
+    values = dimensions.lookup(row[field] for row in rows)
+    counts.update({values[row[field]]: row["count"] for row in rows})
+    sketch = SpaceSaving(capacity, reconciled_at=time.time())
+    for value, count in counts.most_common(capacity):
+        sketch.counters[value] = [count, 0]
+    cache.set(_cache_key(url.pk, dimension), sketch.to_cache(), timeout=None)
+    return sketch
+
+
+def top(url, dimension, k=None):
+    """
+    Return the top ``k`` values of a dimension as ``[{dimension: value, "count": n}]``.
+    """
+    k = k or settings.ANALYTICS_TOP_K
+    payload = cache.get(_cache_key(url.pk, dimension))
+    if payload is None or time.time() - payload["r"] > settings.ANALYTICS_SKETCH_RECONCILE_SECONDS:
+        sketch = reconcile(url, dimension)
+    else:
+        sketch = SpaceSaving.from_cache(settings.ANALYTICS_SKETCH_CAPACITY, payload)
+    return [{dimension: value, "count": count} for value, count in sketch.top(k)]
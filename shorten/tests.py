@@ -1,10 +1,42 @@
 from django.test import TestCase
 from users.models import CustomUser as User
-from .models import URL, ClickEvent, generate_short_code
+from .models import URL, AccountClicks, AccountDailyClicks, ClickDimension, ClickEvent, generate_short_code
+from . import bots, counters, live, resolver, singleflight, sketches
+from .archive import ArchivePart, archive_clicks
+from .bots import classify as classify_bot, in_bot_network
+from .checks import check_shared_cache
+from .dedup import TimeWheel
+from .edge import export_redirect_map, export_requested, ingest_click_log, parse_line
+from .sampling import Sampler
+from .sharedtable import SharedTable
+from .partitions import month_ranges
+from .purge import purge_deleted
+from .sketches import SpaceSaving
+from .useragents import parse_user_agent
 from rest_framework.test import APITestCase
+from url_shortener.throttling import RedirectThrottle, SlidingWindowThrottle
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from unittest.mock import patch
+from datetime import date, timedelta
+import asyncio
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
 
 
 class URLModelTest(TestCase):
@@ -106,6 +138,18 @@ class ClickEventModelTest(TestCase):
         self.assertEqual(click_event.referrer, "https://google.com")
         self.assertIsNotNone(click_event.clicked_at)
 
+    def test_click_attributes_are_interned(self):
+        """
+        Test that repeated click attributes share one dimension row.
+        """
+        first = ClickEvent.objects.create(url=self.url, country="US", user_agent="Mozilla/5.0")
+        second = ClickEvent.objects.create(url=self.url, country="US", user_agent="Mozilla/5.0")
+
+        self.assertEqual(first.country_dim_id, second.country_dim_id)
+        self.assertEqual(first.user_agent_dim_id, second.user_agent_dim_id)
+        self.assertEqual(ClickDimension.objects.filter(kind=ClickDimension.Kind.COUNTRY, value="US").count(), 1)
+        self.assertEqual(ClickEvent.objects.get(pk=second.pk).user_agent, "Mozilla/5.0")
+
 
 class URLAPITest(APITestCase):
     def setUp(self):
@@ -147,3 +191,1030 @@ class URLAPITest(APITestCase):
         self.assertEqual(response.data["status"], "success")
         self.assertIn("data", response.data)
         self.assertEqual(len(response.data["data"]), 2)  # Should have 2 URLs
+
+    def test_redirect_records_click(self):
+        """
+        Test that a redirect records a click event and bumps the click counter.
+        """
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": "US", "city": "New York", "region": "NY"}):
+            response = self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_REFERER="https://google.com", HTTP_USER_AGENT=BROWSER_USER_AGENT)
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response["Location"], self.url.long_url)
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.clicks, 1)
+        self.assertEqual(ClickEvent.objects.filter(url=self.url).count(), 1)
+
+
+class SketchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.client.force_authenticate(user=self.user)
+
+    def test_space_saving_keeps_heavy_hitters(self):
+        """
+        Test that the Space-Saving summary keeps frequent items within its capacity.
+        """
+        sketch = SpaceSaving(capacity=3)
+        for item in ["a"] * 50 + ["b"] * 30 + [f"noise-{i}" for i in range(100)] + ["a"] * 5:
+            sketch.add(item)
+
+        self.assertEqual(len(sketch.counters), 3)
+        self.assertEqual(sketch.top(1)[0][0], "a")
+        self.assertGreaterEqual(sketch.top(1)[0][1], 55)
+
+    def test_analytics_top_k_follows_new_clicks(self):
+        """
+        Test that the top-K sections are built from the database and then updated by new clicks.
+        """
+        ClickEvent.objects.create(url=self.url, country="US", referrer="https://google.com")
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        self.assertEqual(response.data["data"]["location_analytics"]["countries"], [{"country": "US", "count": 1}])
+
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": "RW", "city": "Kigali", "region": None}):
+            for i in range(2):
+                self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR=f"10.0.0.{i}")
+        counters.flush_all()
+
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        self.assertEqual(
+            response.data["data"]["location_analytics"]["countries"],
+            [{"country": "RW", "count": 2}, {"country": "US", "count": 1}],
+        )
+
+    def test_fold_waits_for_sketch_lock(self):
+        """
+        Test that buffered clicks are folded in one update, and kept buffered while another process holds the sketch.
+        """
+        self.assertEqual(sketches.top(self.url, "country"), [])
+        for country in ("RW", "RW", "US"):
+            sketches.record(self.url.pk, {"country": country})
+
+        cache.add(f"sketch:{self.url.pk}:lock", "other", 5)
+        sketches.buffer.flush()
+        self.assertEqual(sketches.top(self.url, "country"), [])
+
+        cache.delete(f"sketch:{self.url.pk}:lock")
+        sketches.buffer.flush()
+        self.assertEqual(sketches.top(self.url, "country"), [{"country": "RW", "count": 2}, {"country": "US", "count": 1}])
+
+
+class ClickExportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        other = URL.objects.create(user=self.user, long_url="https://www.another-example.com", name="other")
+        ClickEvent.objects.create(url=self.url, ip_address="10.0.0.1", country="US", referrer="https://google.com")
+        ClickEvent.objects.create(url=other, ip_address="10.0.0.2", country="RW")
+        self.client.force_authenticate(user=self.user)
+
+    def test_export_url_as_csv(self):
+        """
+        Test streaming the clicks of a single URL as CSV.
+        """
+        response = self.client.get(reverse("export_clicks"), {"short_code": self.url.short_code})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "short_code,clicked_at,ip_address,country,city,region,user_agent,referrer,browser,operating_system,device_type,weight")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("10.0.0.1,US", lines[1])
+
+    def test_export_account_as_gzipped_ndjson(self):
+        """
+        Test streaming every click of the account as gzip-compressed NDJSON.
+        """
+        response = self.client.get(reverse("export_clicks"), {"export_format": "ndjson", "gzip": "1"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()]
+        self.assertEqual(sorted(row["country"] for row in rows), ["RW", "US"])
+
+    def test_export_account_skips_deleted_urls(self):
+        """
+        Test that the account export leaves out the clicks of deleted URLs waiting to be purged.
+        """
+        self.url.mark_deleted()
+        response = self.client.get(reverse("export_clicks"), {"export_format": "ndjson"})
+
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["country"] for row in rows], ["RW"])
+
+    def test_export_rejects_invalid_dates(self):
+        """
+        Test that malformed date boundaries are rejected.
+        """
+        response = self.client.get(reverse("export_clicks"), {"start": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClickArchiveTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.archive_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_root.cleanup)
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.client.force_authenticate(user=self.user)
+
+        self.old_day = timezone.now() - timedelta(days=400)
+        old = [ClickEvent.objects.create(url=self.url, country="US", user_agent="Mozilla/5.0") for _ in range(3)]
+        ClickEvent.objects.filter(pk__in=[event.pk for event in old]).update(clicked_at=self.old_day)
+        ClickEvent.objects.create(url=self.url, country="RW")
+
+    def test_archive_moves_old_clicks_to_columnar_parts(self):
+        """
+        Test that old clicks are deleted from the table and written to a readable part file.
+        """
+        with override_settings(CLICK_ARCHIVE_ROOT=self.archive_root.name):
+            archived = archive_clicks(retention_days=90, chunk_size=2)
+
+        self.assertEqual(archived, 3)
+        self.assertEqual(ClickEvent.objects.filter(url=self.url).count(), 1)
+
+        month_dir = os.path.join(self.archive_root.name, self.old_day.strftime("%Y-%m"))
+        rows = []
+        for name in sorted(os.listdir(month_dir)):
+            part = ArchivePart(os.path.join(month_dir, name))
+            rows.extend(part.rows())
+            part.close()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row["country"] for row in rows}, {"US"})
+        self.assertEqual({row["url_id"] for row in rows}, {self.url.pk})
+        self.assertIsNone(rows[0]["referrer"])
+
+    def test_analytics_merges_archived_aggregates(self):
+        """
+        Test that analytics still report archived clicks.
+        """
+        with override_settings(CLICK_ARCHIVE_ROOT=self.archive_root.name):
+            archive_clicks(retention_days=90)
+
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        data = response.data["data"]
+        self.assertEqual(data["click_distribution"]["daily"][self.old_day.strftime("%Y-%m-%d")], 3)
+        self.assertEqual(data["click_distribution"]["monthly"][self.old_day.strftime("%Y-%m")], 3)
+        self.assertEqual(data["location_analytics"]["countries"], [{"country": "US", "count": 3}, {"country": "RW", "count": 1}])
+
+
+class ClickPartitionTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.client.force_authenticate(user=self.user)
+
+    def test_month_ranges_cross_year_boundaries(self):
+        """
+        Test that monthly partition bounds are contiguous across a year change.
+        """
+        ranges = month_ranges(date(2025, 11, 17), 3)
+        self.assertEqual(
+            ranges,
+            [
+                ("tb_url_analytics_2025_11", date(2025, 11, 1), date(2025, 12, 1)),
+                ("tb_url_analytics_2025_12", date(2025, 12, 1), date(2026, 1, 1)),
+                ("tb_url_analytics_2026_01", date(2026, 1, 1), date(2026, 2, 1)),
+            ],
+        )
+
+    def test_analytics_time_range(self):
+        """
+        Test that analytics can be restricted to a time range.
+        """
+        old = ClickEvent.objects.create(url=self.url, country="RW", referrer="https://google.com")
+        ClickEvent.objects.filter(pk=old.pk).update(clicked_at=timezone.now() - timedelta(days=40))
+        ClickEvent.objects.create(url=self.url, country="US")
+        start = (timezone.now() - timedelta(days=7)).date().isoformat()
+
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]), {"start": start})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(response.data["data"]["click_distribution"]["daily"].values()), 1)
+        self.assertEqual(len(response.data["data"]["recent_clicks"]), 1)
+        self.assertEqual(response.data["data"]["location_analytics"]["countries"], [{"country": "US", "count": 1}])
+        self.assertEqual(response.data["data"]["referrer_analytics"], [])
+
+
+class UserAgentParsingTest(APITestCase):
+    IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1"
+    EDGE = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.80"
+
+    def test_parse_user_agent(self):
+        """
+        Test that browsers embedding other engines are classified by their own family.
+        """
+        self.assertEqual(tuple(parse_user_agent(self.IPHONE)), ("Safari", "iOS", "mobile"))
+        self.assertEqual(tuple(parse_user_agent(self.EDGE)), ("Edge", "Windows", "desktop"))
+        self.assertEqual(tuple(parse_user_agent(None)), ("Other", "Other", "Other"))
+
+    def test_device_analytics(self):
+        """
+        Test that redirects are classified at ingest and reported in the analytics.
+        """
+        user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        url = URL.objects.create(user=user, long_url="https://www.example.com", name="test")
+        self.client.force_authenticate(user=user)
+
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": None, "city": None, "region": None}):
+            for i, agent in enumerate((self.IPHONE, self.IPHONE, self.EDGE)):
+                self.client.get(reverse("redirect_url", args=[url.short_code]), HTTP_USER_AGENT=agent, REMOTE_ADDR=f"10.0.0.{i}")
+
+        response = self.client.get(reverse("analytics", args=[url.short_code]))
+        devices = response.data["data"]["device_analytics"]
+        self.assertEqual(devices["browsers"], [{"browser": "Safari", "count": 2}, {"browser": "Edge", "count": 1}])
+        self.assertEqual(devices["devices"], [{"device_type": "mobile", "count": 2}, {"device_type": "desktop", "count": 1}])
+
+
+class BotFilteringTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+
+    def test_classify_bot(self):
+        """
+        Test that link previews, HEAD probes and hits without a user agent are detected.
+        """
+        slackbot = "Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)"
+        self.assertEqual(classify_bot(slackbot, "GET", "1.2.3.4"), "signature")
+        self.assertEqual(classify_bot(None, "GET", "1.2.3.4"), "missing-user-agent")
+        self.assertEqual(classify_bot(BROWSER_USER_AGENT, "HEAD", "1.2.3.4"), "head-request")
+        self.assertIsNone(classify_bot(BROWSER_USER_AGENT, "GET", "1.2.3.4"))
+
+    def test_bot_networks(self):
+        """
+        Test that addresses inside the configured network ranges are matched.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as handle:
+            handle.write("# crawler ranges\n66.249.64.0/19\n2001:db8::/32\n")
+        self.addCleanup(os.remove, handle.name)
+        bots.bot_networks.cache_clear()
+        self.addCleanup(bots.bot_networks.cache_clear)
+
+        with override_settings(BOT_NETWORKS_FILE=handle.name):
+            self.assertTrue(in_bot_network("66.249.66.1"))
+            self.assertTrue(in_bot_network("2001:db8::1"))
+            self.assertFalse(in_bot_network("66.249.96.1"))
+            self.assertFalse(in_bot_network("unknown"))
+
+    def test_bot_redirect_is_not_recorded(self):
+        """
+        Test that a bot is redirected without creating a click, and is counted separately.
+        """
+        response = self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_USER_AGENT="Twitterbot/1.0")
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertFalse(ClickEvent.objects.filter(url=self.url).exists())
+        counters.flush()
+        self.url.refresh_from_db()
+        self.assertEqual((self.url.clicks, self.url.bot_clicks), (0, 1))
+
+
+class CounterFlushTest(TestCase):
+    def test_flusher_flushes_registered_buffers(self):
+        """
+        Test that the flusher thread flushes every registered buffer without waiting for another increment.
+        """
+        flushed = threading.Event()
+        with patch.object(counters, "_flushes", [flushed.set]):
+            counters.start_flusher(interval=0.01)
+            try:
+                self.assertTrue(flushed.wait(timeout=5))
+            finally:
+                counters.stop_flusher()
+
+    def test_failed_rows_are_requeued(self):
+        """
+        Test that increments of a row whose write fails are kept for the next flush, while the other rows are written.
+        """
+        user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        failing, working = (URL.objects.create(user=user, long_url=f"https://www.example.com/{i}") for i in range(2))
+        counters.add(URL, failing.pk, "bot_clicks", 2)
+        counters.add(URL, working.pk, "bot_clicks", 3)
+
+        write = counters.CounterBuffer._write
+
+        def flaky_write(buffer, model, pk, fields):
+            if pk == failing.pk:
+                raise OperationalError("deadlock detected")
+            write(buffer, model, pk, fields)
+
+        with patch.object(counters.CounterBuffer, "_write", flaky_write), self.assertLogs("shorten.counters", "ERROR"):
+            counters.flush()
+        self.assertEqual(list(URL.objects.filter(pk__in=[failing.pk, working.pk]).order_by("pk").values_list("bot_clicks", flat=True)), [0, 3])
+
+        counters.flush()
+        self.assertEqual(list(URL.objects.filter(pk__in=[failing.pk, working.pk]).order_by("pk").values_list("bot_clicks", flat=True)), [2, 3])
+
+
+class ClickDedupTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+
+    def test_time_wheel_expires_keys(self):
+        """
+        Test that the time wheel remembers keys for the window only and stays within its bound.
+        """
+        wheel = TimeWheel(window=2, resolution=1, max_entries=3)
+        self.assertFalse(wheel.seen("a", now=100.0))
+        self.assertTrue(wheel.seen("a", now=101.5))
+        self.assertFalse(wheel.seen("a", now=104.0))
+
+        for key in ("b", "c", "d", "e"):
+            wheel.seen(key, now=104.0)
+        self.assertLessEqual(wheel._size, 3)
+
+    def redirect(self, **extra):
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": None, "city": None, "region": None}):
+            return self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT, **extra)
+
+    def test_repeat_clicks_are_suppressed(self):
+        """
+        Test that a repeat click within the window is redirected but not recorded, and still counted as a raw hit.
+        """
+        for _ in range(3):
+            self.assertEqual(self.redirect(REMOTE_ADDR="10.0.0.1").status_code, status.HTTP_302_FOUND)
+        self.redirect(REMOTE_ADDR="10.0.0.2")
+
+        counters.flush()
+        self.url.refresh_from_db()
+        self.assertEqual(ClickEvent.objects.filter(url=self.url).count(), 2)
+        self.assertEqual((self.url.clicks, self.url.raw_hits), (2, 4))
+
+    @override_settings(CLICK_DEDUP_SHARED=True)
+    def test_shared_window(self):
+        """
+        Test that the window can be kept in the cache backend instead of process memory.
+        """
+        self.redirect(REMOTE_ADDR="10.0.0.1")
+        self.redirect(REMOTE_ADDR="10.0.0.1")
+
+        self.assertEqual(ClickEvent.objects.filter(url=self.url).count(), 1)
+
+
+class ClickSamplingTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test", sample_rate=4)
+        self.client.force_authenticate(user=self.user)
+
+    def test_adaptive_rate(self):
+        """
+        Test that a link above the target rate is sampled and the weights add up to its clicks.
+        """
+        sampler = Sampler()
+        with override_settings(CLICK_SAMPLING_TARGET_PER_SECOND=10):
+            weights = [sampler.sample(1, now=i / 100) for i in range(300)]
+
+        self.assertEqual(weights[:100], [1] * 100)  # No rate observed during the first second
+        self.assertLess(sum(1 for weight in weights if weight), 150)
+        self.assertEqual(sum(weights) + sampler._states[1].skipped, 300)
+
+    def test_sampled_clicks_are_weighted(self):
+        """
+        Test that only 1 in N clicks is persisted while clicks and analytics stay exact.
+        """
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": "RW", "city": "Kigali", "region": None}):
+            for i in range(8):
+                self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR=f"10.0.0.{i}")
+
+        self.assertEqual(list(ClickEvent.objects.filter(url=self.url).values_list("weight", flat=True)), [4, 4])
+        counters.flush()
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.clicks, 8)
+
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        data = response.data["data"]
+        self.assertEqual(sum(data["click_distribution"]["daily"].values()), 8)
+        self.assertEqual(data["location_analytics"]["countries"], [{"country": "RW", "count": 8}])
+
+
+class RecentClicksTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.client.force_authenticate(user=self.user)
+
+    def redirect(self, ip):
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": "RW", "city": "Kigali", "region": None}):
+            self.client.get(reverse("redirect_url", args=[self.url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR=ip)
+
+    def test_live_clicks_from_ring_buffer(self):
+        """
+        Test that once warmed, the latest clicks are served from the ring buffer without querying click events.
+        """
+        ClickEvent.objects.create(url=self.url, ip_address="10.0.0.1", country="US")
+        response = self.client.get(reverse("live_clicks", args=[self.url.short_code]))
+        self.assertEqual([click["ip_address"] for click in response.data["data"]["recent_clicks"]], ["10.0.0.1"])
+
+        self.redirect("10.0.0.2")
+        self.redirect("10.0.0.3")
+
+        with self.assertNumQueries(1):  # The URL lookup only
+            response = self.client.get(reverse("live_clicks", args=[self.url.short_code]), {"limit": 2})
+        clicks = response.data["data"]["recent_clicks"]
+        self.assertEqual([click["ip_address"] for click in clicks], ["10.0.0.3", "10.0.0.2"])
+        self.assertEqual(clicks[0]["country"], "RW")
+
+    @override_settings(RECENT_CLICKS_SIZE=3)
+    def test_ring_buffer_wraps_and_falls_back(self):
+        """
+        Test that the buffer keeps only the latest clicks and is rebuilt from the database once evicted.
+        """
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        self.assertEqual(response.data["data"]["recent_clicks"], [])
+
+        for i in range(5):
+            self.redirect(f"10.0.0.{i}")
+        response = self.client.get(reverse("analytics", args=[self.url.short_code]))
+        self.assertEqual([click["ip_address"] for click in response.data["data"]["recent_clicks"]], ["10.0.0.4", "10.0.0.3", "10.0.0.2"])
+
+        cache.clear()
+        response = self.client.get(reverse("live_clicks", args=[self.url.short_code]))
+        self.assertEqual(len(response.data["data"]["recent_clicks"]), 3)
+
+
+class LiveStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.token = str(AccessToken.for_user(self.user))
+
+    async def ticket(self):
+        response = await self.async_client.post(reverse("stream_ticket"), headers={"authorization": f"Bearer {self.token}"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["data"]["ticket"]
+
+    def test_stream_refused_under_wsgi(self):
+        """
+        Test that a WSGI worker answers at once instead of buffering the endless stream.
+        """
+        response = self.client.get(reverse("live_stream"), HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    async def test_stream_requires_credentials(self):
+        """
+        Test that the stream rejects requests without a valid ticket or access token, and tokens in the URL.
+        """
+        response = await self.async_client.get(reverse("live_stream"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(reverse("live_stream"), {"ticket": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(reverse("live_stream"), {"token": self.token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(reverse("live_stream"), headers={"authorization": "Bearer invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_ticket_is_single_use(self):
+        """
+        Test that a stream ticket opens exactly one stream.
+        """
+        ticket = await self.ticket()
+        response = await self.async_client.get(reverse("live_stream"), {"ticket": ticket})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await aiter(response.streaming_content).aclose()
+        response = await self.async_client.get(reverse("live_stream"), {"ticket": ticket})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_publish_skipped_without_listeners(self):
+        """
+        Test that the click pipeline does not touch the feed while no stream is open.
+        """
+        event = ClickEvent.objects.create(url=self.url, country="RW")
+        live.publish(event, self.url)
+        self.assertIsNone(cache.get(live.HEAD_KEY))
+
+    @override_settings(LIVE_POLL_INTERVAL=0.01)
+    async def test_stream_resyncs_after_feed_reset(self):
+        """
+        Test that a stream keeps receiving clicks after the shared feed is flushed.
+        """
+        response = await self.async_client.get(reverse("live_stream"), {"ticket": await self.ticket(), "short_code": self.url.short_code})
+        stream = aiter(response.streaming_content)
+        self.assertIn(b"event: ready", await anext(stream))
+
+        def click(country):
+            event = ClickEvent.objects.create(url=self.url, country=country)
+            live.publish(event, self.url)
+
+        await sync_to_async(click)("RW")
+        await sync_to_async(click)("KE")
+        received = b""
+        while b"KE" not in received:
+            received += await asyncio.wait_for(anext(stream), timeout=5)
+        await cache.adelete(live.HEAD_KEY)
+        await sync_to_async(click)("UG")
+        while b"UG" not in received:
+            received += await asyncio.wait_for(anext(stream), timeout=5)
+        await stream.aclose()
+
+    @override_settings(LIVE_POLL_INTERVAL=0.01)
+    async def test_stream_pushes_clicks_and_counters(self):
+        """
+        Test that clicks published by the pipeline reach a subscribed stream, followed by per-second counters.
+        """
+        response = await self.async_client.get(reverse("live_stream"), {"ticket": await self.ticket(), "short_code": self.url.short_code})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertIn(b"event: ready", await anext(stream))
+
+        def click():
+            event = ClickEvent.objects.create(url=self.url, country="RW", weight=2)
+            live.publish(event, self.url)
+
+        await sync_to_async(click)()
+        received = b""
+        while b"event: counters" not in received:
+            received += await asyncio.wait_for(anext(stream), timeout=5)
+        await stream.aclose()
+
+        clicks = json.loads(received.split(b"event: clicks\ndata: ")[1].split(b"\n")[0])["clicks"]
+        self.assertEqual([(click["short_code"], click["country"]) for click in clicks], [(self.url.short_code, "RW")])
+        self.assertIn(f'"{self.url.short_code}": 2'.encode(), received)
+
+
+class AccountAnalyticsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.urls = [URL.objects.create(user=self.user, long_url=f"https://www.example.com/{i}", name=f"test {i}") for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+
+    def test_counters_maintained_at_ingest(self):
+        """
+        Test that redirects feed the account total and daily counters.
+        """
+        with patch("shorten.clicks.get_ip_geolocation", return_value={"country": None, "city": None, "region": None}):
+            for i, url in enumerate([self.urls[0], self.urls[0], self.urls[1]]):
+                self.client.get(reverse("redirect_url", args=[url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR=f"10.0.0.{i}")
+        counters.flush()
+
+        self.assertEqual(AccountClicks.objects.get(user=self.user).clicks, 3)
+        self.assertEqual(AccountDailyClicks.objects.get(user=self.user, day=timezone.now().date()).clicks, 3)
+
+    def test_account_dashboard(self):
+        """
+        Test that the dashboard is built from the account counters and the top links index.
+        """
+        today = timezone.now().date()
+        AccountClicks.objects.create(user=self.user, clicks=42)
+        AccountDailyClicks.objects.create(user=self.user, day=today, clicks=30)
+        AccountDailyClicks.objects.create(user=self.user, day=today - timedelta(days=60), clicks=12)
+        URL.objects.filter(pk=self.urls[2].pk).update(clicks=40)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("account_analytics"))
+
+        data = response.data["data"]
+        self.assertEqual((data["total_clicks"], data["total_links"]), (42, 3))
+        self.assertEqual(data["top_links"][0]["short_code"], self.urls[2].short_code)
+        self.assertEqual(data["click_distribution"]["daily"], {today.strftime("%Y-%m-%d"): 30})
+
+        response = self.client.get(reverse("account_analytics"), {"start": (today - timedelta(days=90)).isoformat()})
+        self.assertEqual(sum(response.data["data"]["click_distribution"]["daily"].values()), 42)
+
+
+class BatchAnalyticsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.other = User.objects.create_user(username="otheruser", email="otheruser@example.com", password="password123")
+        self.urls = [URL.objects.create(user=self.user, long_url=f"https://www.example.com/{i}", name=f"test {i}") for i in range(3)]
+        self.foreign = URL.objects.create(user=self.other, long_url="https://www.example.org", name="foreign")
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_matches_single_url_analytics(self):
+        """
+        Test that each URL in a batch gets the same distributions as the single-URL endpoint.
+        """
+        for i, url in enumerate(self.urls):
+            for country in ["RW"] * (i + 2) + ["US"]:
+                ClickEvent.objects.create(url=url, country=country, referrer="https://google.com", browser="Firefox")
+        ClickEvent.objects.create(url=self.urls[0], country="KE", weight=5)
+
+        response = self.client.post(reverse("batch_analytics"), {"short_codes": [url.short_code for url in self.urls]}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        batch = response.data["data"]["urls"]
+        for url in self.urls:
+            single = self.client.get(reverse("analytics", args=[url.short_code])).data["data"]
+            for section in ("click_distribution", "location_analytics", "referrer_analytics"):
+                self.assertEqual(batch[url.short_code][section], single[section])
+            self.assertEqual(batch[url.short_code]["device_analytics"]["browsers"], single["device_analytics"]["browsers"])
+        self.assertEqual(batch[self.urls[0].short_code]["location_analytics"]["countries"][0], {"country": "KE", "count": 5})
+
+    def test_batch_query_count_and_authorization(self):
+        """
+        Test that the query count does not grow with the batch size and foreign codes are not returned.
+        """
+        codes = [url.short_code for url in self.urls] + [self.foreign.short_code, "missing"]
+        with self.assertNumQueries(9):  # URLs, distribution, archives and six dimensions
+            response = self.client.post(reverse("batch_analytics"), {"short_codes": codes}, format="json")
+
+        self.assertEqual(set(response.data["data"]["urls"]), {url.short_code for url in self.urls})
+        self.assertEqual(response.data["data"]["not_found"], [self.foreign.short_code, "missing"])
+
+        response = self.client.post(reverse("batch_analytics"), {"short_codes": "abc"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DeletionTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+        self.other = URL.objects.create(user=self.user, long_url="https://www.example.org", name="other")
+        for url in (self.url, self.other):
+            for _ in range(3):
+                ClickEvent.objects.create(url=url, country="US")
+        self.client.force_authenticate(user=self.user)
+
+    def assertRedirectStatus(self, url, expected):
+        response = self.client.get(reverse("redirect_url", args=[url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        self.assertEqual(response.status_code, expected)
+
+    @override_settings(PURGE_DELAY_SECONDS=0)
+    def test_url_deleted_then_purged(self):
+        """
+        Test that deleting a URL hides it at once and the purge removes its clicks in chunks.
+        """
+        self.assertIsNotNone(resolver.resolve(self.url.short_code))  # Cached before the deletion
+        response = self.client.delete(reverse("delete_url", args=[self.url.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRedirectStatus(self.url, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(URL.objects.filter(pk=self.url.pk).exists())
+        self.assertEqual(ClickEvent.objects.filter(url_id=self.url.pk).count(), 3)
+
+        call_command("purge_deleted", "--chunk-size", "2", stdout=io.StringIO())
+
+        self.assertFalse(URL.all_objects.filter(pk=self.url.pk).exists())
+        self.assertFalse(ClickEvent.objects.filter(url_id=self.url.pk).exists())
+        self.assertEqual(ClickEvent.objects.filter(url=self.other).count(), 3)
+
+    def test_purge_waits_for_delay(self):
+        """
+        Test that recently deleted URLs are kept until the purge delay has passed.
+        """
+        self.url.mark_deleted()
+        with override_settings(PURGE_DELAY_SECONDS=600):
+            self.assertEqual(purge_deleted(), (0, 0, 0))
+        with override_settings(PURGE_DELAY_SECONDS=0):
+            self.assertEqual(purge_deleted(), (1, 3, 0))
+
+    @override_settings(PURGE_DELAY_SECONDS=0)
+    def test_user_deleted_then_purged(self):
+        """
+        Test that deleting an account stops its redirects and the purge removes it after its URLs.
+        """
+        self.assertIsNotNone(resolver.resolve(self.other.short_code))
+        response = self.client.delete(reverse("user-details", args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertRedirectStatus(self.url, status.HTTP_404_NOT_FOUND)
+        self.assertRedirectStatus(self.other, status.HTTP_404_NOT_FOUND)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        self.assertEqual(purge_deleted(chunk_size=2), (2, 6, 1))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(ClickEvent.objects.exists())
+
+
+class ExpiryTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.client.force_authenticate(user=self.user)
+
+    def redirect(self, url, user_agent=BROWSER_USER_AGENT, ip="127.0.0.1"):
+        return self.client.get(reverse("redirect_url", args=[url.short_code]), HTTP_USER_AGENT=user_agent, REMOTE_ADDR=ip)
+
+    def test_expired_link_refused_without_query(self):
+        """
+        Test that an expired link answers 410 from its cached resolution and is left out of batch resolution.
+        """
+        url = URL.objects.create(user=self.user, long_url="https://www.example.com", expires_at=timezone.now() - timedelta(minutes=1))
+        resolver.resolve(url.short_code)
+        with self.assertNumQueries(0):
+            response = self.redirect(url)
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+        response = self.client.post(reverse("resolve"), {"short_codes": [url.short_code]}, format="json")
+        self.assertEqual(response.data["data"]["not_found"], [url.short_code])
+
+    def test_max_clicks_expires_link(self):
+        """
+        Test that a capped link serves exactly its allowed human clicks, then expires; bots and duplicates are not counted.
+        """
+        url = URL.objects.create(user=self.user, long_url="https://www.example.com", max_clicks=2)
+        self.assertEqual(self.redirect(url).status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.redirect(url).status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.redirect(url, user_agent="curl/8.5.0").status_code, status.HTTP_302_FOUND)
+        self.assertIsNone(URL.objects.get(pk=url.pk).expires_at)
+        self.assertEqual(self.redirect(url, ip="10.0.0.2").status_code, status.HTTP_302_FOUND)
+        self.assertIsNotNone(URL.objects.get(pk=url.pk).expires_at)
+        self.assertEqual(self.redirect(url, ip="10.0.0.3").status_code, status.HTTP_410_GONE)
+
+    def test_click_cap_counts_from_stored_clicks(self):
+        """
+        Test that the cap counts from the stored clicks rather than a stale resolution, and expires a link already past it.
+        """
+        url = URL.objects.create(user=self.user, long_url="https://www.example.com", max_clicks=3)
+        resolver.resolve(url.short_code)  # Cached with no clicks
+        URL.objects.filter(pk=url.pk).update(clicks=5)
+        self.assertEqual(self.redirect(url).status_code, status.HTTP_302_FOUND)
+        self.assertIsNotNone(URL.objects.get(pk=url.pk).expires_at)
+        self.assertEqual(self.redirect(url, ip="10.0.0.2").status_code, status.HTTP_410_GONE)
+
+    def test_sweep_deactivates_expired_links(self):
+        """
+        Test that the sweeper deactivates expired links in batches, keeping their rows and clicks and leaving live links alone.
+        """
+        expired = [URL.objects.create(user=self.user, long_url="https://www.example.com", expires_at=timezone.now() - timedelta(days=1)) for _ in range(3)]
+        later = URL.objects.create(user=self.user, long_url="https://www.example.org", expires_at=timezone.now() + timedelta(days=1))
+        forever = URL.objects.create(user=self.user, long_url="https://www.example.net")
+        ClickEvent.objects.create(url=expired[0], ip_address="127.0.0.1")
+        resolver.resolve(expired[0].short_code)
+
+        call_command("sweep_expired", "--batch-size", "2", stdout=io.StringIO())
+
+        self.assertEqual(set(URL.objects.filter(is_active=False)), set(expired))
+        self.assertEqual(set(URL.objects.filter(is_active=True)), {later, forever})
+        self.assertEqual(self.redirect(expired[0]).status_code, status.HTTP_404_NOT_FOUND)
+        with override_settings(PURGE_DELAY_SECONDS=0):
+            self.assertEqual(purge_deleted()[0], 0)
+        self.assertEqual(ClickEvent.objects.filter(url=expired[0]).count(), 1)
+
+    def test_expiry_must_be_in_future(self):
+        """
+        Test that a link cannot be created already expired.
+        """
+        response = self.client.post(reverse("shorten"), {"long_url": "https://www.example.com", "expires_at": "2000-01-01T00:00:00Z"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expires_at", response.data["errors"])
+
+
+class ResolverTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.urls = [URL.objects.create(user=self.user, long_url=f"https://www.example.com/{i}", name=f"test {i}") for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_resolve_is_cache_first(self):
+        """
+        Test that codes are resolved in one query, then from the cache, without recording clicks.
+        """
+        codes = [url.short_code for url in self.urls] + ["missing"]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse("resolve"), {"short_codes": codes}, format="json")
+        with self.assertNumQueries(0):
+            self.client.post(reverse("resolve"), {"short_codes": codes}, format="json")
+
+        self.assertEqual(response.data["data"]["resolved"], {url.short_code: url.long_url for url in self.urls})
+        self.assertEqual(response.data["data"]["not_found"], ["missing"])
+        self.assertFalse(ClickEvent.objects.exists())
+
+    def test_cache_invalidated_on_change(self):
+        """
+        Test that updating or deleting a URL drops its cached resolution.
+        """
+        url = self.urls[0]
+        self.assertEqual(resolver.resolve(url.short_code).long_url, url.long_url)
+
+        url.long_url = "https://www.example.org"
+        url.save()
+        self.assertEqual(resolver.resolve(url.short_code).long_url, "https://www.example.org")
+
+        self.client.delete(reverse("delete_url", args=[url.pk]))
+        response = self.client.get(reverse("redirect_url", args=[url.short_code]), HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RESOLVER_WARM_BATCH=1)
+    def test_warm_preloads_hottest_links(self):
+        """
+        Test that the warm-up loads the most clicked and most recently clicked links within its count, once per cache.
+        """
+        hot, recent, cold = self.urls
+        URL.objects.filter(pk=hot.pk).update(clicks=50)
+        URL.objects.filter(pk=recent.pk).update(clicked_date=timezone.now())
+        cache.clear()
+
+        self.assertEqual(resolver.warm(count=2), 2)
+        self.assertEqual(resolver.warm(count=2), 0)
+        self.assertIsNotNone(cache.get(f"resolve:{hot.short_code}"))
+        self.assertIsNotNone(cache.get(f"resolve:{recent.short_code}"))
+        self.assertIsNone(cache.get(f"resolve:{cold.short_code}"))
+        with self.assertNumQueries(0):
+            resolver.resolve(recent.short_code)
+
+
+class SingleFlightTest(TestCase):
+    def test_concurrent_loads_coalesce(self):
+        """
+        Test that threads asking for a key that is being loaded wait for that load instead of running their own.
+        """
+        started, release, calls, results = threading.Event(), threading.Event(), [], []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "value"
+
+        threads = [threading.Thread(target=lambda: results.append(singleflight.do("key", load))) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 5)
+
+    @override_settings(SINGLEFLIGHT_POLL_INTERVAL=0.01)
+    def test_waits_for_other_process(self):
+        """
+        Test that a load held by another process is awaited, and redone here when it ends without a result.
+        """
+        cache.add("singleflight:key:lock", "other process")
+        threading.Timer(0.05, cache.set, ["singleflight:key:result", ("shared",)]).start()
+        self.assertEqual(singleflight.do("key", lambda: "local"), "shared")
+
+        cache.clear()
+        cache.add("singleflight:key:lock", "other process")
+        threading.Timer(0.05, cache.delete, ["singleflight:key:lock"]).start()
+        self.assertEqual(singleflight.do("key", lambda: "local"), "local")
+
+
+class ThrottlingTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.url = URL.objects.create(user=self.user, long_url="https://www.example.com", name="test")
+
+    def test_deploy_check_requires_shared_cache(self):
+        """
+        Test that the deploy checks fail while throttles would be counted per process.
+        """
+        self.assertEqual([error.id for error in check_shared_cache(None)], ["shorten.E001"])
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_redirects_use_their_own_scope(self):
+        """
+        Test that redirects are limited per client IP by the redirect scope and not by the anonymous API limit.
+        """
+        redirect = reverse("redirect_url", args=[self.url.short_code])
+        with patch.object(SlidingWindowThrottle, "THROTTLE_RATES", {"redirect": "3/min", "anon": "1/day", "user": "1/day"}):
+            statuses = [self.client.get(redirect, HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR="10.0.0.1").status_code for _ in range(4)]
+            response = self.client.get(redirect, HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR="10.0.0.2")
+
+        self.assertEqual(statuses, [status.HTTP_302_FOUND] * 3 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_sliding_window(self):
+        """
+        Test that the previous window's count weighs in proportionally to its overlap with the sliding window.
+        """
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+
+        def allowed(now):
+            with patch.object(RedirectThrottle, "timer", lambda self: now):
+                return RedirectThrottle().allow_request(request, None)
+
+        with patch.object(SlidingWindowThrottle, "THROTTLE_RATES", {"redirect": "2/min"}):
+            self.assertEqual([allowed(630), allowed(630), allowed(630)], [True, True, False])
+            self.assertFalse(allowed(670))  # 3 * 50/60 of the previous window + 1
+            self.assertTrue(allowed(790))  # The previous window had a single request
+
+
+class SharedLinkTableTest(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.table = SharedTable(os.path.join(self.directory, "links"), slots=8, slot_size=128)
+
+    def test_put_get_delete(self):
+        """
+        Test that entries survive colliding probes, deletes leave later entries reachable and oversized values are skipped.
+        """
+        entries = {f"code{i}": f"value {i}".encode() for i in range(6)}
+        self.table.put_many(entries)
+        self.table.put_many({"large": b"x" * 128})
+        for key, value in entries.items():
+            self.assertEqual(self.table.get(key), value)
+        self.assertIsNone(self.table.get("large"))
+
+        self.table.delete_many(["code0", "code1"])
+        self.assertIsNone(self.table.get("code0"))
+        self.assertEqual(self.table.get("code5"), b"value 5")
+
+    def test_shared_between_mappings(self):
+        """
+        Test that a second mapping of the file, as opened by another worker, sees the same entries until they expire.
+        """
+        self.table.put_many({"code": b"value"})
+        other = SharedTable(self.table.path, slots=8, slot_size=128)
+        self.assertEqual(other.get("code"), b"value")
+        with override_settings(SHARED_LINK_TABLE_TTL=-1):
+            self.assertIsNone(other.get("code"))
+
+    def test_resolve_from_shared_table(self):
+        """
+        Test that resolved codes are answered from the shared table without the cache or the database.
+        """
+        user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        url = URL.objects.create(user=user, long_url="https://www.example.com", name="test")
+        resolver.resolve(url.short_code)
+        cache.clear()
+
+        with self.assertNumQueries(0), patch.object(cache, "get_many") as get_many:
+            resolved = resolver.resolve(url.short_code)
+        get_many.assert_not_called()
+        self.assertEqual((resolved.id, resolved.user_id, resolved.long_url), (url.pk, user.pk, url.long_url))
+
+        url.delete()
+        self.assertIsNone(resolver.resolve(url.short_code))
+
+
+class NginxEdgeTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.hot = URL.objects.create(user=self.user, long_url="https://www.example.com/hot", name="hot", clicks=100)
+        self.warm = URL.objects.create(user=self.user, long_url="https://www.example.com/warm", name="warm", clicks=10)
+        self.cold = URL.objects.create(user=self.user, long_url="https://www.example.com/cold", name="cold")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def log_line(self, url, msec, ip="10.0.0.1", user_agent=BROWSER_USER_AGENT):
+        return "\t".join([f"{msec:.3f}", "GET", "172.18.0.1", ip, f"/api/redirect_url/{url.short_code}", user_agent.replace('"', "\\x22"), "-"]) + "\n"
+
+    def test_export_redirect_map(self):
+        """
+        Test that the hottest links are written to the nginx map file.
+        """
+        path = os.path.join(self.directory, "hot_redirects.map")
+        self.assertEqual(export_redirect_map(path, limit=2), 2)
+
+        with open(path) as handle:
+            content = handle.read()
+        self.assertIn(f'/api/redirect_url/{self.hot.short_code} "https://www.example.com/hot";', content)
+        self.assertIn(self.warm.short_code, content)
+        self.assertNotIn(self.cold.short_code, content)
+
+    def test_edits_and_deletes_request_export(self):
+        """
+        Test that editing or deleting a link has the nginx map rewritten, while creating one does not.
+        """
+        export_requested()
+        URL.objects.create(user=self.user, long_url="https://www.example.com/new")
+        self.assertFalse(export_requested())
+
+        self.hot.long_url = "https://www.example.com/moved"
+        self.hot.save()
+        self.assertTrue(export_requested())
+        self.assertFalse(export_requested())
+
+        self.warm.mark_deleted()
+        self.assertTrue(export_requested())
+        path = os.path.join(self.directory, "hot_redirects.map")
+        export_redirect_map(path, limit=2)
+        with open(path) as handle:
+            self.assertNotIn(self.warm.short_code, handle.read())
+
+    def test_parse_line(self):
+        """
+        Test that nginx escapes are undone and the first forwarded hop is the client.
+        """
+        entry = parse_line(self.log_line(self.hot, 1700000000.5, ip="203.0.113.9, 10.0.0.1", user_agent='Mozilla/5.0 "quoted"'))
+
+        self.assertEqual(entry["short_code"], self.hot.short_code)
+        self.assertEqual(entry["ip"], "203.0.113.9")
+        self.assertEqual(entry["user_agent"], 'Mozilla/5.0 "quoted"')
+        self.assertIsNone(entry["referrer"])
+        self.assertIsNone(parse_line("garbage\n"))
+
+    @override_settings(NGINX_INGEST_GEOLOCATE=False)
+    def test_ingest_click_log(self):
+        """
+        Test that served redirects are recorded at their log time, incrementally, without bots and duplicates.
+        """
+        log = os.path.join(self.directory, "hot_clicks.log")
+        state = f"{log}.offset"
+        served_at = (timezone.now() - timedelta(hours=2)).timestamp()
+        with open(log, "w") as handle:
+            handle.write(self.log_line(self.hot, served_at))
+            handle.write(self.log_line(self.hot, served_at + 0.5))  # Double click
+            handle.write(self.log_line(self.hot, served_at + 1, user_agent="Slackbot 1.0"))
+            handle.write(self.log_line(self.warm, served_at + 2, ip="10.0.0.2"))
+
+        self.assertEqual(ingest_click_log(os.path.join(self.directory, "missing.log"), state, batch_size=3), (0, 0))
+        self.assertEqual(ingest_click_log(log, state, batch_size=3), (4, 2))
+        self.assertEqual(ingest_click_log(log, state, batch_size=3), (0, 0))
+
+        event = ClickEvent.objects.get(url=self.hot)
+        self.assertAlmostEqual(event.clicked_at.timestamp(), served_at, places=3)
+        counters.flush()
+        self.hot.refresh_from_db()
+        self.assertEqual((self.hot.clicks, self.hot.raw_hits, self.hot.bot_clicks), (101, 2, 1))
@@ -1,10 +1,30 @@
 from django.urls import path
-from .views import shorten_url, get_user_urls, delete_url, get_url_analytics, redirect_url
+from .views import (
+    shorten_url,
+    get_user_urls,
+    delete_url,
+    get_url_analytics,
+    batch_analytics,
+    account_analytics,
+    live_clicks,
+    stream_ticket,
+    live_stream,
+    export_clicks,
+    resolve_urls,
+    redirect_url,
+)
 
 urlpatterns = [
     path("shorten", shorten_url, name="shorten"),
     path("urls", get_user_urls, name="urls"),
     path("delete_url/<slug:url_id>", delete_url, name="delete_url"),
     path("analytics/<slug:shortUrl>", get_url_analytics, name="analytics"),
+    path("batch_analytics", batch_analytics, name="batch_analytics"),
+    path("account_analytics", account_analytics, name="account_analytics"),
+    path("live_clicks/<slug:shortUrl>", live_clicks, name="live_clicks"),
+    path("stream_ticket", stream_ticket, name="stream_ticket"),
+    path("live_stream", live_stream, name="live_stream"),
+    path("export_clicks", export_clicks, name="export_clicks"),
+    path("resolve", resolve_urls, name="resolve"),
     path("redirect_url/<slug:shortUrl>", redirect_url, name="redirect_url"),
 ]
@@ -0,0 +1,82 @@
+"""
+User-agent classification for the click pipeline.
+
+Raw user-agent strings are mapped to a browser family, an operating system and
+a device class using ordered, precompiled pattern tables; the first matching
+pattern wins, so more specific products (Edge, Opera, Samsung Internet) are
+listed before the engines they embed (Chrome, Safari). There are very few
+distinct user agents compared to clicks, so results are memoised in an LRU
+cache keyed by the raw string.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+UNKNOWN = "Other"
+
+UserAgentInfo = namedtuple("UserAgentInfo", ["browser", "operating_system", "device_type"])
+
+BROWSER_PATTERNS = [
+    (re.compile(pattern), family)
+    for pattern, family in (
+        (r"Edg(?:e|A|iOS)?/", "Edge"),
+        (r"OPR/|Opera", "Opera"),
+        (r"SamsungBrowser/", "Samsung Internet"),
+        (r"YaBrowser/", "Yandex Browser"),
+        (r"UCBrowser/", "UC Browser"),
+        (r"FBAN|FBAV", "Facebook App"),
+        (r"Instagram", "Instagram App"),
+        (r"Firefox/|FxiOS/", "Firefox"),
+        (r"CriOS/|Chrome/|Chromium/", "Chrome"),
+        (r"MSIE |Trident/", "Internet Explorer"),
+        (r"Version/[\d.]+.*Safari/|Mobile/\w+ Safari", "Safari"),
+        (r"curl/|Wget/|python-requests|okhttp|Go-http-client", "HTTP Library"),
+    )
+]
+
+OS_PATTERNS = [
+    (re.compile(pattern), family)
+    for pattern, family in (
+        (r"Windows Phone", "Windows Phone"),
+        (r"Windows", "Windows"),
+        (r"iPhone|iPad|iPod", "iOS"),
+        (r"Android", "Android"),
+        (r"CrOS", "Chrome OS"),
+        (r"Mac OS X|Macintosh", "macOS"),
+        (r"Linux|X11", "Linux"),
+    )
+]
+
+DEVICE_PATTERNS = [
+    (re.compile(pattern), device)
+    for pattern, device in (
+        (r"iPad|Tablet|Kindle|Silk/|Android(?!.*Mobile)", "tablet"),
+        (r"Mobi|iPhone|iPod|Android.*Mobile|Windows Phone", "mobile"),
+        (r"SmartTV|SMART-TV|AppleTV|CrKey|Roku", "tv"),
+        (r"Windows|Macintosh|X11|CrOS", "desktop"),
+    )
+]
+
+
+def _first_match(patterns, user_agent):
+    for pattern, name in patterns:
+        if pattern.search(user_agent):
+            return name
+    return UNKNOWN
+
+
+@lru_cache(maxsize=settings.USER_AGENT_CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """
+    Classify a user-agent string. Missing user agents classify as ``Other`` everywhere.
+    """
+    if not user_agent:
+        return UserAgentInfo(UNKNOWN, UNKNOWN, UNKNOWN)
+    return UserAgentInfo(
+        _first_match(BROWSER_PATTERNS, user_agent),
+        _first_match(OS_PATTERNS, user_agent),
+        _first_match(DEVICE_PATTERNS, user_agent),
+    )
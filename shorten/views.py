@@ -1,17 +1,29 @@
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import URL, ClickEvent
+from .models import URL
 from .serializers import URLSerializer
-from django.http import HttpResponseRedirect
+from . import expiry, live, recent, resolver, singleflight
+from .analytics import build_account_analytics, build_batch_analytics, build_url_analytics
+from .clicks import record_click
+from .exports import EXPORT_FORMATS, export_queryset, parse_boundary, stream_export
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from url_shortener import settings
-from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
-from django.db.models import Count
-import requests
+from asgiref.sync import sync_to_async
+from functools import partial
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from users.authentication import SnapshotJWTAuthentication, get_user
+from url_shortener.throttling import RedirectThrottle, ShortenThrottle, UserThrottle
+import asyncio
+import json
+import time
 
 
 @swagger_auto_schema(
@@ -57,6 +69,7 @@ import requests
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([UserThrottle, ShortenThrottle])
 def shorten_url(request):
     """
     Shorten a given URL for the authenticated user.
@@ -211,11 +224,11 @@ def get_user_urls(request):
 @api_view(["DELETE"])
 def delete_url(request, url_id):
     """
-    Fetch all shortened URLs for the authenticated user.
+    Delete a shortened URL. It stops redirecting at once; its clicks are removed in the background.
     """
     try:
         url = URL.objects.get(user=request.user, pk=url_id)
-        url.delete()
+        url.mark_deleted()
         return Response(
             {
                 "status": "success",
@@ -243,7 +256,21 @@ def delete_url(request, url_id):
             type=openapi.TYPE_STRING,
             required=True,
             example="abcd1234",
-        )
+        ),
+        openapi.Parameter(
+            "start",
+            openapi.IN_QUERY,
+            description="Only include clicks from this time on (ISO date or datetime)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-01",
+        ),
+        openapi.Parameter(
+            "end",
+            openapi.IN_QUERY,
+            description="Only include clicks up to this time (ISO date or datetime)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-31",
+        ),
     ],
     responses={
         200: openapi.Response(
@@ -317,64 +344,306 @@ def get_url_analytics(request, shortUrl):
     """
     Fetch analytics for a specific shortened URL, including click distribution over time.
     """
+    try:
+        start = parse_boundary(request.query_params.get("start"))
+        end = parse_boundary(request.query_params.get("end"), end=True)
+    except ValueError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         url = URL.objects.get(short_code=shortUrl, user=request.user)
+        # Concurrent requests for the same analytics share one computation
+        data = singleflight.do(f"analytics:{url.pk}:{start.isoformat() if start else ''}:{end.isoformat() if end else ''}", partial(build_url_analytics, url, start=start, end=end))
 
-        # Get all click events for this URL
-        click_events = ClickEvent.objects.filter(url=url).order_by("-clicked_at")
+        return Response(
+            {"status": "success", "data": data, "created_at": url.created_at},
+            status=status.HTTP_200_OK,
+        )
 
-        # Aggregate clicks grouped by different time periods
-        daily_clicks = click_events.annotate(day=TruncDay("clicked_at")).values("day").annotate(count=Count("id"))
+    except URL.DoesNotExist:
+        return Response(
+            {
+                "status": "error",
+                "message": "URL not found or not accessible by this user",
+            },
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    except Exception as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-        weekly_clicks = click_events.annotate(week=TruncWeek("clicked_at")).values("week").annotate(count=Count("id"))
 
-        monthly_clicks = click_events.annotate(month=TruncMonth("clicked_at")).values("month").annotate(count=Count("id"))
+@swagger_auto_schema(
+    method="post",
+    operation_description="Fetch analytics for many shortened URLs of the authenticated user in one request.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "short_codes": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_STRING),
+                description="Short codes to fetch analytics for (at most BATCH_ANALYTICS_MAX_CODES)",
+                example=["abcd1234", "efgh5678"],
+            ),
+            "start": openapi.Schema(type=openapi.TYPE_STRING, description="Only include clicks from this time on (ISO date or datetime)", example="2025-03-01"),
+            "end": openapi.Schema(type=openapi.TYPE_STRING, description="Only include clicks up to this time (ISO date or datetime)", example="2025-03-31"),
+        },
+        required=["short_codes"],
+    ),
+    responses={
+        200: openapi.Response(
+            description="Analytics for the shortened URLs were successfully retrieved.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="success"),
+                    "data": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            "urls": openapi.Schema(type=openapi.TYPE_OBJECT, description="Analytics keyed by short code"),
+                            "not_found": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                        },
+                    ),
+                },
+            ),
+        ),
+        400: openapi.Response(
+            description="Invalid short codes or date range.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="short_codes must be a non-empty list of strings"),
+                },
+            ),
+        ),
+        500: openapi.Response(
+            description="An internal error occurred.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        example="An unexpected error occurred.",
+                    ),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def batch_analytics(request):
+    """
+    Fetch analytics for a list of short codes. Codes that do not exist or belong to
+    another user are reported in ``not_found``.
+    """
+    short_codes = request.data.get("short_codes")
+    if not isinstance(short_codes, list) or not short_codes or not all(isinstance(code, str) for code in short_codes):
+        return Response({"status": "error", "message": "short_codes must be a non-empty list of strings"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(short_codes) > settings.BATCH_ANALYTICS_MAX_CODES:
+        return Response(
+            {"status": "error", "message": f"At most {settings.BATCH_ANALYTICS_MAX_CODES} short codes can be requested at once"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        start = parse_boundary(request.data.get("start"))
+        end = parse_boundary(request.data.get("end"), end=True)
+    except ValueError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get location-based analytics
-        country_stats = click_events.exclude(country__isnull=True).values("country").annotate(count=Count("id")).order_by("-count")
+    try:
+        # Authorization for every code in one query: only the user's own URLs are returned
+        urls = list(URL.objects.filter(user=request.user, short_code__in=set(short_codes)))
+        data = build_batch_analytics(urls, start=start, end=end)
+        not_found = [code for code in dict.fromkeys(short_codes) if code not in data]
+        return Response({"status": "success", "data": {"urls": data, "not_found": not_found}}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-        city_stats = click_events.exclude(city__isnull=True).values("city").annotate(count=Count("id")).order_by("-count")
 
-        # Get referrer statistics
-        referrer_stats = click_events.exclude(referrer__isnull=True).values("referrer").annotate(count=Count("id")).order_by("-count")
+@swagger_auto_schema(
+    methods=["GET"],
+    operation_description="Fetch account-wide analytics across all URLs of the authenticated user.",
+    manual_parameters=[
+        openapi.Parameter(
+            "start",
+            openapi.IN_QUERY,
+            description="First day of the click time series (ISO date, defaults to 30 days ago)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-01",
+        ),
+        openapi.Parameter(
+            "end",
+            openapi.IN_QUERY,
+            description="Last day of the click time series (ISO date, defaults to today)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-31",
+        ),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Account analytics were successfully retrieved.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="success"),
+                    "data": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            "total_clicks": openapi.Schema(type=openapi.TYPE_INTEGER, example=15000),
+                            "total_links": openapi.Schema(type=openapi.TYPE_INTEGER, example=120),
+                            "top_links": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                            "click_distribution": openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "daily": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                    "weekly": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                    "monthly": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                },
+                            ),
+                        },
+                    ),
+                },
+            ),
+        ),
+        400: openapi.Response(
+            description="Invalid date range.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="Invalid date: 2025-13-01"),
+                },
+            ),
+        ),
+        500: openapi.Response(
+            description="An internal error occurred.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        example="An unexpected error occurred.",
+                    ),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def account_analytics(request):
+    """
+    Fetch totals, top links and the click time series across all URLs of the user.
+    """
+    try:
+        start = parse_boundary(request.query_params.get("start"))
+        end = parse_boundary(request.query_params.get("end"), end=True)
+    except ValueError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get recent clicks with detailed information
-        recent_clicks = click_events[:10].values(
-            "clicked_at",
-            "ip_address",
-            "country",
-            "city",
-            "region",
-            "user_agent",
-            "referrer",
+    try:
+        data = build_account_analytics(request.user, start=start, end=end)
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
-        # Convert queryset results to dictionary format
-        click_distribution = {
-            "daily": {entry["day"].strftime("%Y-%m-%d"): entry["count"] for entry in daily_clicks},
-            "weekly": {entry["week"].strftime("%Y-%U"): entry["count"] for entry in weekly_clicks},
-            "monthly": {entry["month"].strftime("%Y-%m"): entry["count"] for entry in monthly_clicks},
-        }
 
-        # Serialize and return the data
+@swagger_auto_schema(
+    methods=["GET"],
+    operation_description="Fetch the latest clicks of a shortened URL. Meant for live views that poll frequently.",
+    manual_parameters=[
+        openapi.Parameter(
+            "shortUrl",
+            openapi.IN_PATH,
+            description="The shortened URL code to fetch the latest clicks for",
+            type=openapi.TYPE_STRING,
+            required=True,
+            example="abcd1234",
+        ),
+        openapi.Parameter(
+            "limit",
+            openapi.IN_QUERY,
+            description="Number of clicks to return (at most RECENT_CLICKS_SIZE)",
+            type=openapi.TYPE_INTEGER,
+            example=10,
+        ),
+    ],
+    responses={
+        200: openapi.Response(
+            description="The latest clicks were successfully retrieved.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="success"),
+                    "data": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            "short_code": openapi.Schema(type=openapi.TYPE_STRING, example="abcd1234"),
+                            "total_clicks": openapi.Schema(type=openapi.TYPE_INTEGER, example=150),
+                            "recent_clicks": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        },
+                    ),
+                },
+            ),
+        ),
+        400: openapi.Response(
+            description="Invalid limit.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="limit must be a positive integer"),
+                },
+            ),
+        ),
+        404: openapi.Response(
+            description="URL not found or not accessible by this user.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        example="URL not found or not accessible by this user",
+                    ),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def live_clicks(request, shortUrl):
+    """
+    Return the latest clicks of a URL from the recent-clicks ring buffer.
+    """
+    try:
+        limit = int(request.query_params.get("limit", 10))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({"status": "error", "message": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        url = URL.objects.only("id", "short_code", "clicks").get(short_code=shortUrl, user=request.user)
         data = {
             "short_code": url.short_code,
-            "long_url": url.long_url,
-            "created_at": url.created_at,
             "total_clicks": url.clicks,
-            "click_distribution": click_distribution,
-            "location_analytics": {
-                "countries": list(country_stats),
-                "cities": list(city_stats),
-            },
-            "referrer_analytics": list(referrer_stats),
-            "recent_clicks": list(recent_clicks),
+            "recent_clicks": recent.latest(url.pk, limit),
         }
-
-        return Response(
-            {"status": "success", "data": data, "created_at": url.created_at},
-            status=status.HTTP_200_OK,
-        )
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
 
     except URL.DoesNotExist:
         return Response(
@@ -391,6 +660,308 @@ def get_url_analytics(request, shortUrl):
         )
 
 
+@swagger_auto_schema(
+    method="post",
+    operation_description="Issue a single-use ticket that authenticates one live click stream (``/api/live_stream?ticket=``).",
+    responses={
+        201: openapi.Response(
+            description="Ticket issued.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="success"),
+                    "data": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            "ticket": openapi.Schema(type=openapi.TYPE_STRING, example="2S0J1vQm7d0d3b5Jm0bYQ1tXk3zZf5Q6n8y1u9w4e2A"),
+                            "expires_in": openapi.Schema(type=openapi.TYPE_INTEGER, example=30),
+                        },
+                    ),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """
+    Issue a single-use, short-lived ticket for the live stream, so the access token never appears in a URL.
+    """
+    try:
+        data = {"ticket": live.issue_ticket(request.user.pk), "expires_in": settings.LIVE_TICKET_TIMEOUT}
+        return Response({"status": "success", "data": data}, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+async def live_stream(request):
+    """
+    Server-Sent Events stream of the clicks on one URL (``?short_code=``) or on all
+    URLs of the authenticated user. Emits ``clicks`` events with the new clicks and
+    ``counters`` events with the clicks per short code every second.
+
+    Served by the ASGI application only (the ``stream`` service, see nginx.conf):
+    WSGI workers read a streaming response to its end before sending it, which
+    for an endless stream never happens. EventSource cannot send headers, so
+    browsers authenticate with a ticket from ``stream_ticket`` (``?ticket=``);
+    other clients may send their access token in the Authorization header.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"status": "error", "message": "The live stream is served by the ASGI application"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    authentication = SnapshotJWTAuthentication()
+    try:
+        header = authentication.get_header(request)
+        if header:
+            raw_token = authentication.get_raw_token(header)
+            if raw_token is None:
+                raise AuthenticationFailed("Authentication credentials were not provided.")
+            user = await sync_to_async(authentication.get_user)(authentication.get_validated_token(raw_token))
+        else:
+            user_id = await live.redeem_ticket(request.GET.get("ticket", ""))
+            user = await sync_to_async(get_user)(user_id) if user_id is not None else None
+            if user is None or not user.is_active:
+                raise AuthenticationFailed("Invalid or expired stream ticket.")
+    except (AuthenticationFailed, InvalidToken) as e:
+        return JsonResponse({"status": "error", "message": str(e.detail if hasattr(e, "detail") else e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    url_ids = None
+    short_code = request.GET.get("short_code")
+    if short_code:
+        url_id = await URL.objects.filter(short_code=short_code, user=user).values_list("id", flat=True).afirst()
+        if url_id is None:
+            return JsonResponse({"status": "error", "message": "URL not found or not accessible by this user"}, status=status.HTTP_404_NOT_FOUND)
+        url_ids = {url_id}
+
+    def message(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+    async def events():
+        subscription = await live.broker.subscribe(user.pk, url_ids)
+        try:
+            yield message("ready", {"short_code": short_code})
+            last_tick = last_write = time.monotonic()
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), max(0, 1 - (time.monotonic() - last_tick)))
+                except asyncio.TimeoutError:
+                    pass
+                chunk = []
+                clicks, dropped = subscription.drain()
+                if clicks:
+                    chunk.append(message("clicks", {"clicks": [{key: value for key, value in click.items() if key not in ("url_id", "user_id")} for click in clicks], "dropped": dropped}))
+                if time.monotonic() - last_tick >= 1:
+                    last_tick = time.monotonic()
+                    counts = subscription.take_counts()
+                    if counts:
+                        chunk.append(message("counters", {"at": timezone.now(), "clicks": counts}))
+                if chunk:
+                    last_write = time.monotonic()
+                    yield "".join(chunk)
+                elif time.monotonic() - last_write >= settings.LIVE_KEEPALIVE_SECONDS:
+                    last_write = time.monotonic()
+                    yield ": keepalive\n\n"
+        finally:
+            live.broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@swagger_auto_schema(
+    methods=["GET"],
+    operation_description="Stream raw click events for one URL, or for every URL of the authenticated user, as CSV or NDJSON.",
+    manual_parameters=[
+        openapi.Parameter(
+            "short_code",
+            openapi.IN_QUERY,
+            description="Limit the export to this short code (defaults to the whole account)",
+            type=openapi.TYPE_STRING,
+        ),
+        openapi.Parameter(
+            "start",
+            openapi.IN_QUERY,
+            description="Earliest click time (ISO date or datetime)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-01",
+        ),
+        openapi.Parameter(
+            "end",
+            openapi.IN_QUERY,
+            description="Latest click time (ISO date or datetime)",
+            type=openapi.TYPE_STRING,
+            example="2025-03-31",
+        ),
+        openapi.Parameter(
+            "export_format",
+            openapi.IN_QUERY,
+            description="Output format",
+            type=openapi.TYPE_STRING,
+            enum=list(EXPORT_FORMATS),
+            default="csv",
+        ),
+        openapi.Parameter(
+            "gzip",
+            openapi.IN_QUERY,
+            description="Compress the stream with gzip",
+            type=openapi.TYPE_BOOLEAN,
+            default=False,
+        ),
+    ],
+    responses={
+        200: openapi.Response(description="Streamed click events."),
+        400: openapi.Response(
+            description="Invalid export parameters.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="Unsupported export format"),
+                },
+            ),
+        ),
+        404: openapi.Response(
+            description="URL not found or not accessible by this user.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        example="URL not found or not accessible by this user",
+                    ),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_clicks(request):
+    """
+    Stream raw click events as CSV or NDJSON, optionally gzip-compressed.
+    """
+    export_format = request.query_params.get("export_format", "csv")
+    compress = request.query_params.get("gzip", "").lower() in ("1", "true", "yes")
+    short_code = request.query_params.get("short_code")
+
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {"status": "error", "message": "Unsupported export format"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        start = parse_boundary(request.query_params.get("start"))
+        end = parse_boundary(request.query_params.get("end"), end=True)
+    except ValueError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    url = None
+    if short_code:
+        try:
+            url = URL.objects.get(short_code=short_code, user=request.user)
+        except URL.DoesNotExist:
+            return Response(
+                {
+                    "status": "error",
+                    "message": "URL not found or not accessible by this user",
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+    queryset = export_queryset(user=request.user, url=url, start=start, end=end)
+    filename = f"clicks-{short_code or 'account'}.{export_format}{'.gz' if compress else ''}"
+    response = StreamingHttpResponse(
+        stream_export(queryset, export_format, compress),
+        content_type="application/gzip" if compress else EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_description="Resolve many short codes to their long URLs without recording clicks.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "short_codes": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_STRING),
+                description="Short codes to resolve (at most RESOLVE_MAX_CODES)",
+                example=["abcd1234", "efgh5678"],
+            )
+        },
+        required=["short_codes"],
+    ),
+    responses={
+        200: openapi.Response(
+            description="The short codes were resolved.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="success"),
+                    "data": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            "resolved": openapi.Schema(type=openapi.TYPE_OBJECT, description="Long URL keyed by short code", example={"abcd1234": "https://www.example.com"}),
+                            "not_found": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                        },
+                    ),
+                },
+            ),
+        ),
+        400: openapi.Response(
+            description="Invalid short codes.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="short_codes must be a non-empty list of strings"),
+                },
+            ),
+        ),
+    },
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def resolve_urls(request):
+    """
+    Resolve a list of short codes for link checkers and scanners. Unlike
+    redirect_url this records no clicks.
+    """
+    short_codes = request.data.get("short_codes")
+    if not isinstance(short_codes, list) or not short_codes or not all(isinstance(code, str) for code in short_codes):
+        return Response({"status": "error", "message": "short_codes must be a non-empty list of strings"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(short_codes) > settings.RESOLVE_MAX_CODES:
+        return Response(
+            {"status": "error", "message": f"At most {settings.RESOLVE_MAX_CODES} short codes can be resolved at once"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        short_codes = list(dict.fromkeys(short_codes))
+        now = timezone.now()
+        resolved = {code: entry for code, entry in resolver.resolve_many(short_codes).items() if not expiry.is_expired(entry, now)}
+        data = {
+            "resolved": {code: entry.long_url for code, entry in resolved.items()},
+            "not_found": [code for code in short_codes if code not in resolved],
+        }
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response(
+            {"status": "error", "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
 @swagger_auto_schema(
     methods=["GET"],  # Explicitly specify the method to apply the decorator to
     operation_description="Redirect to the original long URL based on the short code.",
@@ -425,6 +996,16 @@ def get_url_analytics(request, shortUrl):
                 },
             ),
         ),
+        410: openapi.Response(
+            description="The link has expired or reached its click limit.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="This link has expired"),
+                },
+            ),
+        ),
         500: openapi.Response(
             description="An internal error occurred.",
             schema=openapi.Schema(
@@ -441,59 +1022,22 @@ def get_url_analytics(request, shortUrl):
     },
 )
 @api_view(["GET"])
+@throttle_classes([RedirectThrottle])
 def redirect_url(request, shortUrl):
     """
     Redirect to the original long URL based on the short code.
     """
-    try:
-        url = URL.objects.get(short_code=shortUrl)
-
-        # Get IP address
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(",")[0]
-        else:
-            ip = request.META.get("REMOTE_ADDR")
-
-        # Get geolocation data
-        geo_data = get_ip_geolocation(ip)
-
-        # Create click event with all the information
-        ClickEvent.objects.create(
-            url=url,
-            ip_address=ip,
-            country=geo_data["country"],
-            city=geo_data["city"],
-            region=geo_data["region"],
-            user_agent=request.META.get("HTTP_USER_AGENT"),
-            referrer=request.META.get("HTTP_REFERER"),
-        )
-
-        url.clicks += 1  # Increment click count on access
-        url.clicked_date = timezone.now()
-        url.save()
-
-        return HttpResponseRedirect(url.long_url)
-    except URL.DoesNotExist:
+    resolved = resolver.resolve(shortUrl)
+    if resolved is None:
         return Response(
             {"status": "error", "message": "Shortened URL not found"},
             status=status.HTTP_404_NOT_FOUND,
         )
+    if not expiry.admit(resolved):
+        return Response(
+            {"status": "error", "message": "This link has expired"},
+            status=status.HTTP_410_GONE,
+        )
 
-
-def get_ip_geolocation(ip):
-    """
-    Get geolocation data for an IP address using ipapi.co
-    """
-    try:
-        response = requests.get(f"{settings.GEOLOCATION_BASE_URL}/{ip}/json/")
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "country": data.get("country_name"),
-                "city": data.get("city"),
-                "region": data.get("region"),
-            }
-    except Exception:
-        pass
-    return {"country": None, "city": None, "region": None}
+    record_click(resolved.to_instance(), request)
+    return HttpResponseRedirect(resolved.long_url)
@@ -14,6 +14,7 @@ import dj_database_url
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import tempfile
 from datetime import timedelta
 
 # Load environment variables from a .env file (if used)
@@ -119,7 +120,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Password hashing
 PASSWORD_HASHERS = [
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "users.hashing.CalibratedArgon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
@@ -131,7 +132,7 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
-    "UPDATE_LAST_LOGIN": True,
+    "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "VERIFYING_KEY": None,
@@ -141,25 +142,30 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "user_id",
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
 }
 
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.SnapshotJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "url_shortener.throttling.AnonThrottle",
+        "url_shortener.throttling.UserThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "100/day",  # Limit anonymous users to 100 requests per day
-        "user": "1000/day",  # Limit authenticated users to 1000 requests per day
+        "anon": os.getenv("THROTTLE_ANON_RATE", "100/day"),  # Limit anonymous users to 100 requests per day
+        "user": os.getenv("THROTTLE_USER_RATE", "1000/day"),  # Limit authenticated users to 1000 requests per day
+        "redirect": os.getenv("THROTTLE_REDIRECT_RATE", "600/min"),  # Redirects per client IP
+        "shorten": os.getenv("THROTTLE_SHORTEN_RATE", "60/min"),  # Links created per user
+        "auth": os.getenv("THROTTLE_AUTH_RATE", "20/min"),  # Logins, registrations and token refreshes per client IP
     },
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "1")),  # Proxies (nginx) in front of the app, to find the client IP in X-Forwarded-For
 }
 
 # CORS settings
@@ -278,3 +284,129 @@ LOGOUT_REDIRECT_URL = "/"
 
 # Geolocation API
 GEOLOCATION_BASE_URL = "https://ipapi.co"
+
+# Cache
+# A shared backend (Redis) is used when REDIS_URL is set, so every gunicorn worker sees the same
+# counters and sketches; local memory is only suitable for development and tests, and
+# `manage.py check --deploy` (run before gunicorn starts) fails without it.
+if os.getenv("REDIS_URL"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.getenv("REDIS_URL")}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Analytics
+ANALYTICS_TOP_K = int(os.getenv("ANALYTICS_TOP_K", "20"))  # Entries returned per top-K section
+ANALYTICS_SKETCH_CAPACITY = int(os.getenv("ANALYTICS_SKETCH_CAPACITY", "200"))  # Counters kept per URL and dimension
+ANALYTICS_SKETCH_RECONCILE_SECONDS = int(os.getenv("ANALYTICS_SKETCH_RECONCILE_SECONDS", "3600"))  # Exact rebuild interval
+
+# Click export
+CLICK_EXPORT_CHUNK_SIZE = int(os.getenv("CLICK_EXPORT_CHUNK_SIZE", "2000"))  # Rows fetched per server-side cursor round trip
+CLICK_EXPORT_BUFFER_SIZE = int(os.getenv("CLICK_EXPORT_BUFFER_SIZE", "65536"))  # Characters per streamed chunk
+
+# Click archival
+CLICK_RETENTION_DAYS = int(os.getenv("CLICK_RETENTION_DAYS", "90"))  # Events older than this move to cold storage
+CLICK_ARCHIVE_CHUNK_SIZE = int(os.getenv("CLICK_ARCHIVE_CHUNK_SIZE", "50000"))  # Events archived and deleted per transaction
+CLICK_ARCHIVE_ROOT = os.getenv("CLICK_ARCHIVE_ROOT", os.path.join(BASE_DIR, "archive"))
+
+# Click table partitioning (PostgreSQL only)
+CLICK_PARTITION_MONTHS_AHEAD = int(os.getenv("CLICK_PARTITION_MONTHS_AHEAD", "3"))  # Monthly partitions created in advance
+
+# Interned click dimensions
+CLICK_DIMENSION_CACHE_SIZE = int(os.getenv("CLICK_DIMENSION_CACHE_SIZE", "50000"))  # Values cached per process and direction
+
+# User-agent classification
+USER_AGENT_CACHE_SIZE = int(os.getenv("USER_AGENT_CACHE_SIZE", "10000"))  # Parsed user agents memoised per process
+
+# Bot filtering
+BOT_FILTERING_ENABLED = os.getenv("BOT_FILTERING_ENABLED", "True") == "True"
+BOT_SIGNATURES_FILE = os.getenv("BOT_SIGNATURES_FILE")  # Extra user-agent signatures, one per line
+BOT_NETWORKS_FILE = os.getenv("BOT_NETWORKS_FILE")  # CIDR ranges of crawler/hosting networks, one per line
+
+# Buffered counters
+CLICK_COUNTER_FLUSH_SECONDS = float(os.getenv("CLICK_COUNTER_FLUSH_SECONDS", "5"))  # Max age of unflushed counter increments
+
+# Duplicate-click suppression
+CLICK_DEDUP_WINDOW_SECONDS = float(os.getenv("CLICK_DEDUP_WINDOW_SECONDS", "2"))  # Repeat clicks from one client are dropped within this window, 0 disables
+CLICK_DEDUP_RESOLUTION_SECONDS = float(os.getenv("CLICK_DEDUP_RESOLUTION_SECONDS", "0.25"))  # Time wheel tick
+CLICK_DEDUP_MAX_ENTRIES = int(os.getenv("CLICK_DEDUP_MAX_ENTRIES", "100000"))  # Keys remembered per process
+CLICK_DEDUP_SHARED = os.getenv("CLICK_DEDUP_SHARED", str(bool(os.getenv("REDIS_URL")))) == "True"  # Keep the window in the cache backend
+
+# Click sampling
+CLICK_SAMPLING_TARGET_PER_SECOND = float(os.getenv("CLICK_SAMPLING_TARGET_PER_SECOND", "20"))  # Events written per second per hot link, 0 disables adaptive sampling
+CLICK_SAMPLING_MAX_LINKS = int(os.getenv("CLICK_SAMPLING_MAX_LINKS", "10000"))  # Links whose click rate is tracked per process
+
+# Recent clicks ring buffer
+RECENT_CLICKS_SIZE = int(os.getenv("RECENT_CLICKS_SIZE", "50"))  # Latest clicks kept per URL
+RECENT_CLICKS_TIMEOUT = int(os.getenv("RECENT_CLICKS_TIMEOUT", "86400"))  # Idle buffers expire after this many seconds
+
+# Live click stream
+LIVE_FEED_SIZE = int(os.getenv("LIVE_FEED_SIZE", "1000"))  # Clicks kept in the shared feed
+LIVE_FEED_TIMEOUT = int(os.getenv("LIVE_FEED_TIMEOUT", "300"))  # Feed entries expire after this many seconds
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "0.5"))  # Seconds between feed reads per process
+LIVE_MAX_PENDING = int(os.getenv("LIVE_MAX_PENDING", "100"))  # Clicks queued per stream before older ones are dropped
+LIVE_KEEPALIVE_SECONDS = int(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))  # Comment sent on idle streams
+LIVE_LISTENER_TIMEOUT = int(os.getenv("LIVE_LISTENER_TIMEOUT", "10"))  # Clicks are published until this many seconds after the last poll
+LIVE_TICKET_TIMEOUT = int(os.getenv("LIVE_TICKET_TIMEOUT", "30"))  # Seconds a stream ticket can be redeemed
+
+# Account dashboard
+ACCOUNT_ANALYTICS_DAYS = int(os.getenv("ACCOUNT_ANALYTICS_DAYS", "30"))  # Default length of the account click time series
+ACCOUNT_TOP_LINKS = int(os.getenv("ACCOUNT_TOP_LINKS", "10"))  # Links returned in the account top list
+
+# Batch analytics
+BATCH_ANALYTICS_MAX_CODES = int(os.getenv("BATCH_ANALYTICS_MAX_CODES", "500"))  # Short codes accepted per batch request
+
+# Short code resolution
+RESOLVER_CACHE_TIMEOUT = int(os.getenv("RESOLVER_CACHE_TIMEOUT", "3600"))  # Seconds a resolved short code stays cached
+RESOLVER_NEGATIVE_TIMEOUT = int(os.getenv("RESOLVER_NEGATIVE_TIMEOUT", "60"))  # Seconds an unknown short code stays cached
+RESOLVE_MAX_CODES = int(os.getenv("RESOLVE_MAX_CODES", "5000"))  # Short codes accepted per batch resolve request
+RESOLVER_WARM_COUNT = int(os.getenv("RESOLVER_WARM_COUNT", "10000"))  # Hottest links preloaded when a worker starts, 0 to disable
+RESOLVER_WARM_SECONDS = float(os.getenv("RESOLVER_WARM_SECONDS", "5"))  # Time budget of the warm-up
+RESOLVER_WARM_BATCH = int(os.getenv("RESOLVER_WARM_BATCH", "1000"))  # Links read per warm-up query
+
+# nginx-served hot links
+NGINX_REDIRECT_MAP_PATH = os.getenv("NGINX_REDIRECT_MAP_PATH", os.path.join(BASE_DIR, "redirects", "hot_redirects.map"))
+NGINX_REDIRECT_MAP_SIZE = int(os.getenv("NGINX_REDIRECT_MAP_SIZE", "10000"))  # Most clicked links served by nginx
+NGINX_RELOAD_COMMAND = os.getenv("NGINX_RELOAD_COMMAND", "")  # e.g. "kill -HUP 1" from a container sharing nginx's PID namespace, empty to skip
+NGINX_REDIRECT_MAP_CHECK_SECONDS = int(os.getenv("NGINX_REDIRECT_MAP_CHECK_SECONDS", "5"))  # How often a scheduled exporter looks for edited or deleted links
+NGINX_CLICK_LOG = os.getenv("NGINX_CLICK_LOG", "")  # Access log of the redirects served by nginx
+NGINX_INGEST_BATCH_SIZE = int(os.getenv("NGINX_INGEST_BATCH_SIZE", "5000"))  # Log lines stored per bulk insert
+NGINX_INGEST_GEOLOCATE = os.getenv("NGINX_INGEST_GEOLOCATE", "True") == "True"  # Look up each distinct client IP
+
+# Host-wide shared hot-link table
+SHARED_LINK_TABLE_PATH = os.getenv("SHARED_LINK_TABLE_PATH", "/dev/shm/url_shortener_links" if os.path.isdir("/dev/shm") else "")  # Empty to disable
+SHARED_LINK_TABLE_SLOTS = int(os.getenv("SHARED_LINK_TABLE_SLOTS", "32768"))  # Links the table can hold
+SHARED_LINK_TABLE_SLOT_SIZE = int(os.getenv("SHARED_LINK_TABLE_SLOT_SIZE", "512"))  # Bytes per slot, longer URLs are not shared
+SHARED_LINK_TABLE_TTL = int(os.getenv("SHARED_LINK_TABLE_TTL", "60"))  # Seconds an entry is trusted, bounds staleness across hosts
+
+# Request coalescing
+SINGLEFLIGHT_LOCK_TIMEOUT = float(os.getenv("SINGLEFLIGHT_LOCK_TIMEOUT", "10"))  # Longest a load holds the cross-process lock, and a waiter waits
+SINGLEFLIGHT_RESULT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_RESULT_TIMEOUT", "5"))  # Seconds a result stays readable for waiting processes
+SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.05"))  # Seconds between result checks while waiting
+
+# Authentication
+USER_SNAPSHOT_TIMEOUT = int(os.getenv("USER_SNAPSHOT_TIMEOUT", "300"))  # Seconds a cached user row authenticates requests
+TOKEN_REUSE_MIN_SECONDS = int(os.getenv("TOKEN_REUSE_MIN_SECONDS", "300"))  # Issued tokens are handed out again while valid this long
+OUTSTANDING_TOKEN_BATCH_SIZE = int(os.getenv("OUTSTANDING_TOKEN_BATCH_SIZE", "100"))  # Outstanding token rows written per bulk insert
+OUTSTANDING_TOKEN_FLUSH_SECONDS = float(os.getenv("OUTSTANDING_TOKEN_FLUSH_SECONDS", "5"))  # Longest an outstanding token row waits to be written
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))  # Blacklisted tokens the revocation filter is sized for, at least
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))  # Share of valid tokens that still need a blacklist query
+REVOCATION_LOG_SIZE = int(os.getenv("REVOCATION_LOG_SIZE", "10000"))  # Revocations kept in the shared log
+REVOCATION_LOG_TIMEOUT = int(os.getenv("REVOCATION_LOG_TIMEOUT", "86400"))  # Seconds a shared log entry is kept
+REVOCATION_REBUILD_SECONDS = int(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))  # Seconds between full rebuilds of the revocation filter
+TOKEN_PRUNE_CHUNK_SIZE = int(os.getenv("TOKEN_PRUNE_CHUNK_SIZE", "5000"))  # Expired tokens deleted per transaction
+
+# Password hashing
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))  # Measure with manage.py calibrate_argon2
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))  # KiB per hash
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))  # Lanes per hash
+ARGON2_TARGET_MS = float(os.getenv("ARGON2_TARGET_MS", "250"))  # Default target of calibrate_argon2
+PASSWORD_HASHING_SLOTS = int(os.getenv("PASSWORD_HASHING_SLOTS", str(max(1, (os.cpu_count() or 2) // 2))))  # Hashes running at once on this host
+PASSWORD_HASHING_TIMEOUT = float(os.getenv("PASSWORD_HASHING_TIMEOUT", "2"))  # Seconds to wait for a slot before answering 503
+PASSWORD_HASHING_LOCK_PATH = os.getenv("PASSWORD_HASHING_LOCK_PATH", os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "url_shortener_hashing"))
+
+# Deletion
+PURGE_CHUNK_SIZE = int(os.getenv("PURGE_CHUNK_SIZE", "5000"))  # Click events of deleted URLs removed per transaction
+PURGE_DELAY_SECONDS = int(os.getenv("PURGE_DELAY_SECONDS", "600"))  # Deleted rows are kept this long before the purge removes them
+
+# Link expiry
+EXPIRY_SWEEP_BATCH_SIZE = int(os.getenv("EXPIRY_SWEEP_BATCH_SIZE", "1000"))  # Expired links deactivated per query
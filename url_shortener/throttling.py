@@ -0,0 +1,86 @@
+"""
+Sliding-window rate limiting shared by all workers.
+
+Each client gets one counter per fixed window in the default cache (Redis in
+production, so every worker and host sees the same counts), incremented
+atomically with ``cache.incr``. A request is allowed while
+
+    previous window count * (share of the previous window still in range) + current window count
+
+stays within the rate, which approximates a true sliding window with two
+integers per client instead of DRF's list of request timestamps, and costs two
+cache round trips and no database query.
+
+Scopes and their rates (DEFAULT_THROTTLE_RATES):
+
+- ``anon`` / ``user``: the defaults for the API, per IP or per user.
+- ``redirect``: short-link redirects, per client IP only. Redirects are public
+  and high-volume, so they are not subject to the ``anon`` limit.
+- ``shorten``: link creation, per user.
+- ``auth``: login, registration and token refresh, per client IP.
+"""
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    def _window_key(self, index):
+        return f"{self.key}:{index}"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        index, offset = divmod(self.now, self.duration)
+        current_key = self._window_key(int(index))
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # First request of the window; counters live for two windows
+            self.cache.add(current_key, 0, self.duration * 2)
+            current = self.cache.incr(current_key)
+        previous = self.cache.get(self._window_key(int(index) - 1), 0)
+        self.estimate = previous * (1 - offset / self.duration) + current
+        return self.estimate <= self.num_requests
+
+    def wait(self):
+        # The count of the current window only expires with it
+        return self.duration - self.now % self.duration
+
+
+class AnonThrottle(SlidingWindowThrottle):
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f"throttle:{self.scope}:{self.get_ident(request)}"
+
+
+class UserThrottle(SlidingWindowThrottle):
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"throttle:{self.scope}:{request.user.pk}"
+        return f"throttle:{self.scope}:{self.get_ident(request)}"
+
+
+class RedirectThrottle(SlidingWindowThrottle):
+    scope = "redirect"
+
+    def get_cache_key(self, request, view):
+        # Keyed by address only: resolving request.user would authenticate every redirect
+        return f"throttle:{self.scope}:{self.get_ident(request)}"
+
+
+class ShortenThrottle(UserThrottle):
+    scope = "shorten"
+
+
+class AuthThrottle(RedirectThrottle):
+    scope = "auth"
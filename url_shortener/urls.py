@@ -21,6 +21,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework.authentication import TokenAuthentication
 from rest_framework_simplejwt.views import TokenRefreshView
+from url_shortener.throttling import AuthThrottle
 
 # Define schema view
 schema_view = get_schema_view(
@@ -39,7 +40,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("admin/", admin.site.urls),
     # JWT refresh token
-    path("auth/token_refresh", TokenRefreshView.as_view(), name="token_refresh"),
+    path("auth/token_refresh", TokenRefreshView.as_view(throttle_classes=[AuthThrottle]), name="token_refresh"),
     path("social/", include("social_django.urls", namespace="social")),
     path("auth/", include("users.urls")),
     path("api/", include("shorten.urls")),
@@ -0,0 +1,68 @@
+"""
+JWT authentication that does not read the user row on every request.
+
+The access token is verified as usual, then the user is rebuilt from a snapshot
+of its row cached under ``user:{id}`` for USER_SNAPSHOT_TIMEOUT seconds. Only a
+request that finds no snapshot queries the database. Snapshots are dropped when
+a user is saved or deleted (see users.signals), so updates, deletions and
+deactivations take effect on the next request.
+
+The password hash is left out of the snapshot (reading ``user.password`` loads it)
+unless SIMPLE_JWT["CHECK_REVOKE_TOKEN"] needs it to validate tokens.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import CustomUser as User
+
+
+def _cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def _snapshot_fields():
+    return tuple(field.attname for field in User._meta.concrete_fields if field.attname != "password" or api_settings.CHECK_REVOKE_TOKEN)
+
+
+def get_user(user_id):
+    """
+    The user with primary key ``user_id`` built from its cached snapshot, or None.
+    """
+    fields = _snapshot_fields()
+    values = cache.get(_cache_key(user_id))
+    if values is None or len(values) != len(fields):
+        values = User.objects.filter(pk=user_id).values_list(*fields).first()
+        if values is None:
+            return None
+        cache.set(_cache_key(user_id), values, settings.USER_SNAPSHOT_TIMEOUT)
+    return User.from_db("default", fields, values)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+class SnapshotJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,109 @@
+"""
+Password hashing that cannot starve the rest of the host.
+
+Argon2 is deliberately expensive, so every hash or verification first takes
+one of PASSWORD_HASHING_SLOTS host-wide slots: ``flock`` locks on files next to
+PASSWORD_HASHING_LOCK_PATH, shared by all worker processes and released by the
+kernel if a process dies. A request that gets no slot within
+PASSWORD_HASHING_TIMEOUT seconds fails with HashingBusy, which the views turn
+into a 503, so a login burst runs at most that many hashes at once and leaves
+the remaining CPU to redirects.
+
+The Argon2 parameters come from ARGON2_TIME_COST, ARGON2_MEMORY_COST and
+ARGON2_PARALLELISM; ``manage.py calibrate_argon2`` measures values for a
+target latency. Stored hashes made with other parameters are upgraded on the
+next successful login.
+"""
+
+import fcntl
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+POLL_INTERVAL = 0.01
+
+
+class HashingBusy(Exception):
+    pass
+
+
+@contextmanager
+def slot():
+    """
+    Hold one of the host-wide hashing slots, waiting up to PASSWORD_HASHING_TIMEOUT seconds.
+    """
+    slots = settings.PASSWORD_HASHING_SLOTS
+    deadline = time.monotonic() + settings.PASSWORD_HASHING_TIMEOUT
+    first = random.randrange(slots)  # Spread processes over the lock files
+    while True:
+        for offset in range(slots):
+            handle = open(f"{settings.PASSWORD_HASHING_LOCK_PATH}.{(first + offset) % slots}", "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            return
+        if time.monotonic() >= deadline:
+            raise HashingBusy("Too many password operations in progress, please retry shortly.")
+        time.sleep(POLL_INTERVAL)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 with parameters from the settings, run in a hashing slot.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        with slot():
+            return super().encode(password, salt)
+
+    def verify(self, password, encoded):
+        with slot():
+            return super().verify(password, encoded)
+
+
+def measure(time_cost, memory_cost, parallelism, rounds=3):
+    """
+    Median seconds of an Argon2 hash with the given parameters, outside any slot.
+    """
+    import argon2
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism).hash("calibration")
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(target, memory_cost, parallelism, max_time_cost=64):
+    """
+    The smallest time cost whose hash takes at least ``target`` seconds with the given
+    memory cost and parallelism, and its measured duration.
+    """
+    for time_cost in range(1, max_time_cost + 1):
+        duration = measure(time_cost, memory_cost, parallelism)
+        if duration >= target:
+            break
+    return time_cost, duration
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.hashing import calibrate
+
+
+class Command(BaseCommand):
+    help = "Measure the Argon2 time cost that makes one password hash take the target latency on this host."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=settings.ARGON2_TARGET_MS, help="Target duration of one hash in milliseconds.")
+        parser.add_argument("--memory-cost", type=int, default=settings.ARGON2_MEMORY_COST, help="Memory per hash in KiB.")
+        parser.add_argument("--parallelism", type=int, default=settings.ARGON2_PARALLELISM, help="Lanes per hash.")
+
+    def handle(self, *args, **options):
+        time_cost, duration = calibrate(options["target_ms"] / 1000, options["memory_cost"], options["parallelism"])
+        self.stdout.write(f"One hash takes {duration * 1000:.0f} ms with these settings:")
+        self.stdout.write(f"ARGON2_TIME_COST={time_cost}")
+        self.stdout.write(f"ARGON2_MEMORY_COST={options['memory_cost']}")
+        self.stdout.write(f"ARGON2_PARALLELISM={options['parallelism']}")
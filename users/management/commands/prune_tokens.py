@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.tokens import prune_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding JWT refresh tokens and their blacklist entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.TOKEN_PRUNE_CHUNK_SIZE, help="Tokens deleted per transaction.")
+        parser.add_argument("--every", type=int, help="Keep running and prune every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            pruned = prune_expired(chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} expired tokens"))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from .user_manager.custom_manager import CustomUserManager
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 import uuid
 
@@ -21,6 +22,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         ("FEMALE", "FEMALE"),
     ]
     gender = models.CharField(max_length=30, choices=genders, null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)  # Set on deletion, the row is purged once its URLs are gone
 
     USERNAME_FIELD = "username"
     REQUIRED_FIELDS = ["email", "first_name", "last_name"]
@@ -36,5 +38,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
             raise ValidationError(f"Invalid gender: {self.gender}. Must be one of: {dict(self.genders)}.")
         super().clean()  # Call the parent class's clean method
 
+    def mark_deleted(self):
+        self.deleted_at = timezone.now()
+        self.is_active = False
+        self.save(update_fields=["deleted_at", "is_active"])
+
     def __str__(self):
         return self.email
@@ -0,0 +1,142 @@
+"""
+Fast revocation checks for refresh tokens.
+
+Every process keeps a Bloom filter of the JTIs of blacklisted, unexpired tokens.
+A JTI the filter has never seen is not blacklisted, which answers the common
+case (refresh and logout with a valid token) without touching the blacklist
+table; a possible hit is confirmed with an exact query.
+
+Newly blacklisted JTIs are appended to a log in the shared cache, a sequence
+counter (``revoked:head``) and REVOCATION_LOG_SIZE slots like the live click
+feed, which each process replays into its filter before checking. A process
+that fell behind the log, finds a slot it cannot read, or built its filter more
+than REVOCATION_REBUILD_SECONDS ago rebuilds it from the database, which also
+drops expired tokens. The log must live in a cache shared by all processes
+(Redis); with the per-process LocMemCache, other processes only learn about a
+revocation on their next rebuild.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+HEAD_KEY = "revoked:head"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _slot_key(position):
+    return f"revoked:{position % settings.REVOCATION_LOG_SIZE}"
+
+
+def publish(jti):
+    """
+    Append a blacklisted JTI to the shared log.
+    """
+    cache.add(HEAD_KEY, 0, timeout=None)
+    position = cache.incr(HEAD_KEY)
+    cache.set(_slot_key(position), (position, jti), settings.REVOCATION_LOG_TIMEOUT)
+
+
+class RevocationSet:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._seen = 0
+        self._built_at = 0
+
+    def _rebuild(self):
+        # Read the head first: JTIs logged while the query runs are replayed on the next check
+        seen = cache.get(HEAD_KEY, 0)
+        jtis = list(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list("token__jti", flat=True))
+        bloom = BloomFilter(max(len(jtis) * 2, settings.REVOCATION_BLOOM_CAPACITY), settings.REVOCATION_BLOOM_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter, self._seen, self._built_at = bloom, seen, time.monotonic()
+
+    def _catch_up(self):
+        head = cache.get(HEAD_KEY, 0)
+        if head == self._seen:
+            return
+        if head < self._seen or head - self._seen > settings.REVOCATION_LOG_SIZE:
+            self._rebuild()  # Cache was reset, or entries were overwritten before we read them
+            return
+        positions = range(self._seen + 1, head + 1)
+        entries = cache.get_many([_slot_key(position) for position in positions])
+        for position in positions:
+            entry = entries.get(_slot_key(position))
+            if entry is None or entry[0] != position:
+                self._rebuild()
+                return
+            self._filter.add(entry[1])
+        self._seen = head
+
+    def might_contain(self, jti):
+        with self._lock:
+            if self._filter is None or time.monotonic() - self._built_at >= settings.REVOCATION_REBUILD_SECONDS:
+                self._rebuild()
+            else:
+                self._catch_up()
+            return jti in self._filter
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def clear(self):
+        with self._lock:
+            self._filter = None
+
+
+revoked = RevocationSet()
+
+
+def is_revoked(jti):
+    return revoked.might_contain(jti) and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def revoke(token):
+    """
+    Blacklist ``token`` with three statements and without loading its user. The
+    outstanding row may still be queued (see users.tokens), so it is inserted if missing.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    outstanding = OutstandingToken(
+        user_id=token.payload.get(api_settings.USER_ID_CLAIM),
+        jti=jti,
+        token=str(token),
+        created_at=token.current_time,
+        expires_at=datetime_from_epoch(token["exp"]),
+    )
+    OutstandingToken.objects.bulk_create([outstanding], ignore_conflicts=True)
+    token_id = OutstandingToken.objects.filter(jti=jti).values_list("pk", flat=True).get()
+    BlacklistedToken.objects.bulk_create([BlacklistedToken(token_id=token_id)], ignore_conflicts=True)
+    revoked.add(jti)
+    transaction.on_commit(lambda: publish(jti))
@@ -1,37 +1,70 @@
-from rest_framework import serializers
-from .models import CustomUser as User
-
-
-class UserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = [
-            "id",
-            "username",
-            "email",
-            "first_name",
-            "last_name",
-            "address",
-            "gender",
-            "is_active",
-            "date_joined",
-            "password",
-        ]
-        extra_kwargs = {
-            "password": {"write_only": True, "required": True},
-        }
-
-    def create(self, validated_data):
-        """Create user with hashed password"""
-        password = validated_data.pop("password", None)
-        user = User.objects.create_user(**validated_data)  # Ensures password is hashed
-        if password:
-            user.set_password(password)
-            user.save()
-        return user
-
-    def to_representation(self, instance):
-        """Customize response to exclude sensitive fields"""
-        data = super().to_representation(instance)
-        data.pop("password", None)  # Ensure password is never exposed
-        return data
+from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from . import authentication
+from .models import CustomUser as User
+from .tokens import BufferedRefreshToken
+
+
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "username",
+            "email",
+            "first_name",
+            "last_name",
+            "address",
+            "gender",
+            "is_active",
+            "date_joined",
+            "password",
+        ]
+        extra_kwargs = {
+            "password": {"write_only": True, "required": True},
+        }
+
+    def create(self, validated_data):
+        """Create user with hashed password"""
+        return User.objects.create_user(**validated_data)  # Hashes the password once and inserts the row once
+
+    def to_representation(self, instance):
+        """Customize response to exclude sensitive fields"""
+        data = super().to_representation(instance)
+        data.pop("password", None)  # Ensure password is never exposed
+        return data
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Refresh (and rotate) tokens without loading the user row or writing the
+    outstanding token on the spot: the user comes from its cached snapshot,
+    revocation checks from users.revocation and the new refresh token's row is
+    queued with the other outstanding tokens.
+    """
+
+    token_class = BufferedRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user = authentication.get_user(refresh.payload.get(api_settings.USER_ID_CLAIM))
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data["refresh"] = str(refresh)
+
+        return data
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import authentication
+from .models import CustomUser as User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """
+    Drop the cached snapshot of a user whenever it changes, is deactivated or goes away.
+    """
+    authentication.invalidate(instance.pk)
@@ -6,6 +6,21 @@ from django.core.exceptions import ValidationError
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.hashers import identify_hasher
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from url_shortener.throttling import SlidingWindowThrottle
+from users import hashing, revocation, tokens
+from shorten import counters
 
 
 class CustomUserModelTest(TestCase):
@@ -171,3 +186,211 @@ class UserLoginTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["status"], "error")
         self.assertEqual(response.data["message"], "Invalid username or inactive account.")
+
+
+class SnapshotAuthenticationTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", password="password123", email="testuser@example.com", first_name="Test", last_name="User")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("user-details", args=[self.user.pk])
+
+    def test_user_served_from_snapshot(self):
+        """
+        Test that only the first authenticated request reads the user row.
+        """
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "testuser")
+
+    def test_snapshot_invalidated(self):
+        """
+        Test that updates and deactivation take effect on the next request.
+        """
+        self.client.get(self.url)
+        self.client.patch(self.url, {"first_name": "Changed"}, format="json")
+        response = self.client.get(reverse("get_user_data"))
+        self.assertEqual(response.data["data"]["first_name"], "Changed")
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenIssuanceTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", password="password123", email="testuser@example.com", first_name="Test", last_name="User")
+
+    def test_login_reads_user_once(self):
+        """
+        Test that login costs a single query and defers the outstanding token row to a batch.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(OutstandingToken.objects.exists())
+        tokens.buffer.flush()
+        self.assertEqual(OutstandingToken.objects.get().user, self.user)
+
+    def test_outstanding_rows_flushed_periodically(self):
+        """
+        Test that queued outstanding token rows are written by the periodic flush, without waiting for another login.
+        """
+        tokens.issue(self.user)
+        counters.flush_all()
+        self.assertEqual(OutstandingToken.objects.get().user, self.user)
+
+    def test_get_user_data_reuses_tokens(self):
+        """
+        Test that repeated data fetches hand out the same tokens until the refresh token is blacklisted.
+        """
+        data = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json").data["data"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['token']}")
+        for _ in range(3):
+            response = self.client.get(reverse("get_user_data"))
+            self.assertEqual((response.data["data"]["token"], response.data["data"]["token_refresh"]), (data["token"], data["token_refresh"]))
+
+        self.client.post(reverse("auth-logout"), {"refresh_token": data["token_refresh"]}, format="json")
+        response = self.client.get(reverse("get_user_data"))
+        self.assertNotEqual(response.data["data"]["token_refresh"], data["token_refresh"])
+        tokens.buffer.flush()
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+    def test_sessions_keep_their_own_tokens(self):
+        """
+        Test that a data fetch hands out the caller's own pair, so another session's rotation does not revoke it.
+        """
+        first = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json").data["data"]
+        second = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json").data["data"]
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {first['token']}")
+        response = self.client.get(reverse("get_user_data"))
+        self.assertEqual(response.data["data"]["token_refresh"], first["token_refresh"])
+
+        self.client.credentials()
+        response = self.client.post(reverse("token_refresh"), {"refresh": second["token_refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse("token_refresh"), {"refresh": first["token_refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_user_data_under_session_login(self):
+        """
+        Test that a session-authenticated data fetch, which presents no access token, still gets a pair.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("get_user_data"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["data"]["token"])
+        self.assertTrue(response.data["data"]["token_refresh"])
+
+
+class TokenRevocationTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", password="password123", email="testuser@example.com", first_name="Test", last_name="User")
+        self.refresh = tokens.BufferedRefreshToken.for_user(self.user)
+
+    def test_refresh_rotation(self):
+        """
+        Test that rotating a valid refresh token skips the blacklist table and the rotated token is then rejected.
+        """
+        revocation.revoked.might_contain("warm")  # Build the filter
+        first = self.client.post(reverse("token_refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(3):  # Blacklisting the rotated token
+            response = self.client.post(reverse("token_refresh"), {"refresh": first.data["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data["refresh"], first.data["refresh"])
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocations_shared_through_log(self):
+        """
+        Test that a revocation by another process reaches this process's filter through the shared log.
+        """
+        tokens.buffer.flush()
+        jti = self.refresh["jti"]
+        self.assertFalse(revocation.is_revoked(jti))
+
+        # Another process blacklists the token: the filter only learns about it from the log
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        self.assertFalse(revocation.revoked.might_contain(jti))
+        revocation.publish(jti)
+        self.assertTrue(revocation.is_revoked(jti))
+
+    def test_prune_tokens(self):
+        """
+        Test that expired outstanding tokens and their blacklist entries are deleted in chunks.
+        """
+        tokens.buffer.flush()
+        revocation.revoke(self.refresh)
+        expired = [OutstandingToken(user=self.user, jti=f"expired-{i}", token="", expires_at=timezone.now() - timedelta(days=1)) for i in range(5)]
+        OutstandingToken.objects.bulk_create(expired)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti="expired-0"))
+
+        out = StringIO()
+        call_command("prune_tokens", "--chunk-size", "2", stdout=out)
+
+        self.assertIn("Pruned 5 expired tokens", out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), [self.refresh["jti"]])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class PasswordHashingTest(APITestCase):
+    def test_registration_hashes_once(self):
+        """
+        Test that registration stores the password with a single insert and the configured Argon2 parameters.
+        """
+        data = {"username": "newuser", "email": "newuser@example.com", "first_name": "New", "last_name": "User", "password": "password123"}
+        with override_settings(ARGON2_TIME_COST=1), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("user-register"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries if query["sql"].startswith("UPDATE")])
+        user = get_user_model().objects.get(username="newuser")
+        self.assertEqual(identify_hasher(user.password).decode(user.password)["time_cost"], 1)
+        self.assertTrue(identify_hasher(user.password).must_update(user.password))
+        self.assertTrue(user.check_password("password123"))  # Upgrades the hash to the current parameters
+        self.assertEqual(identify_hasher(user.password).decode(user.password)["time_cost"], 2)
+
+    @override_settings(PASSWORD_HASHING_SLOTS=1, PASSWORD_HASHING_TIMEOUT=0.05)
+    def test_busy_hashing_answers_503(self):
+        """
+        Test that logins waiting too long for a hashing slot are turned away instead of queueing.
+        """
+        get_user_model().objects.create_user(username="testuser", password="password123", email="testuser@example.com")
+        with hashing.slot():
+            response = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        response = self.client.post("/auth/login", {"username": "testuser", "password": "password123"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_calibrate_argon2(self):
+        """
+        Test that the calibration command reports settings for the target latency.
+        """
+        out = StringIO()
+        call_command("calibrate_argon2", "--target-ms", "1", "--memory-cost", "64", "--parallelism", "1", stdout=out)
+        self.assertIn("ARGON2_MEMORY_COST=64", out.getvalue())
+        self.assertRegex(out.getvalue(), r"ARGON2_TIME_COST=\d+")
+
+
+class AuthThrottleTest(APITestCase):
+    def test_login_attempts_limited_per_ip(self):
+        """
+        Test that repeated login attempts from one address are throttled by the auth scope.
+        """
+        data = {"username": "testuser", "password": "wrongpassword"}
+        with patch.object(SlidingWindowThrottle, "THROTTLE_RATES", {"auth": "2/min", "anon": "100/day", "user": "100/day"}):
+            statuses = [self.client.post("/auth/login", data, format="json", REMOTE_ADDR="10.0.0.1").status_code for _ in range(3)]
+            response = self.client.post("/auth/login", data, format="json", REMOTE_ADDR="10.0.0.2")
+
+        self.assertEqual(statuses, [status.HTTP_400_BAD_REQUEST] * 2 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,170 @@
+"""
+JWT issuance for login and user data fetches.
+
+``issue`` mints a refresh/access pair without reading the user row again, and
+queues the refresh token's ``OutstandingToken`` row instead of inserting it on
+the spot: rows are written with one bulk insert once OUTSTANDING_TOKEN_BATCH_SIZE
+are queued or OUTSTANDING_TOKEN_FLUSH_SECONDS have passed, by the periodic
+flusher of server processes (see shorten.counters) and on interpreter exit. Blacklisting a token whose row is still queued creates the row itself;
+the queued copy is then skipped. Blacklist checks and inserts go through
+users.revocation, and TokenRefreshView rotates tokens the same way (see
+users.serializers.TokenRefreshSerializer).
+
+``reuse_or_issue`` hands a session the pair it already holds: pairs are cached
+under the JTI of their access token (``tokens:{jti}``), so a client presenting
+that access token gets its own pair back while it stays valid for at least
+TOKEN_REUSE_MIN_SECONDS, and repeated ``get_user_data`` calls do not mint
+tokens at all. Other sessions of the same user never see it. A pair whose
+refresh token has been blacklisted is not reused, and callers authenticated
+without an access token (session login) get a new pair each time.
+
+``prune_expired`` deletes expired outstanding tokens (and with them their
+blacklist entries), run periodically by ``manage.py prune_tokens``.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from . import revocation
+from .models import CustomUser as User
+from shorten import counters
+
+
+class OutstandingBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+        self._last_flush = time.monotonic()
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            due = len(self._rows) >= settings.OUTSTANDING_TOKEN_BATCH_SIZE or time.monotonic() - self._last_flush >= settings.OUTSTANDING_TOKEN_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def _take(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._last_flush = time.monotonic()
+        return rows
+
+    def flush(self):
+        rows = self._take()
+        if not rows:
+            return
+        # Users deleted since their token was issued keep the row, like on_delete=SET_NULL would
+        existing = set(User.objects.filter(pk__in={row.user_id for row in rows}).values_list("pk", flat=True))
+        for row in rows:
+            if row.user_id not in existing:
+                row.user_id = None
+        OutstandingToken.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def clear(self):
+        self._take()
+
+
+buffer = OutstandingBuffer()
+counters.register(buffer.flush)
+
+
+class BufferedRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which inserts the outstanding row right away
+        token = super(BlacklistMixin, cls).for_user(user)
+        token.outstand()
+        return token
+
+    def outstand(self):
+        buffer.add(
+            OutstandingToken(
+                user_id=User._meta.pk.to_python(self.payload.get(api_settings.USER_ID_CLAIM)),
+                jti=self[api_settings.JTI_CLAIM],
+                token=str(self),
+                created_at=self.current_time,
+                expires_at=datetime_from_epoch(self["exp"]),
+            )
+        )
+
+    def check_blacklist(self):
+        if revocation.is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        revocation.revoke(self)
+
+
+def _cache_key(access_jti):
+    return f"tokens:{access_jti}"
+
+
+def _seconds_left(token):
+    return (datetime_from_epoch(token["exp"]) - timezone.now()).total_seconds()
+
+
+def _mint(user):
+    refresh = BufferedRefreshToken.for_user(user)
+    access = refresh.access_token
+    entry = (refresh[api_settings.JTI_CLAIM], str(refresh), str(access))
+    timeout = _seconds_left(access) - settings.TOKEN_REUSE_MIN_SECONDS
+    if timeout > 0:
+        cache.set(_cache_key(access[api_settings.JTI_CLAIM]), entry, timeout)
+    return entry, access
+
+
+def issue(user):
+    """
+    A new ``(refresh, access)`` token pair for ``user``.
+    """
+    entry, _ = _mint(user)
+    return entry[1:]
+
+
+def reuse_or_issue(user, access_token):
+    """
+    The pair of the session that presented ``access_token`` while it is fresh enough
+    and not revoked, otherwise a new one, which that access token then gets back
+    until it expires. Without an access token there is no pair to reuse.
+    """
+    if access_token is None:
+        return issue(user)
+    presented = _cache_key(access_token[api_settings.JTI_CLAIM])
+    cached = cache.get(presented)
+    if cached is not None and not revocation.is_revoked(cached[0]):
+        return cached[1:]
+    entry, access = _mint(user)
+    timeout = min(_seconds_left(access_token), _seconds_left(access) - settings.TOKEN_REUSE_MIN_SECONDS)
+    if timeout > 0:
+        cache.set(presented, entry, timeout)
+    return entry[1:]
+
+
+def prune_expired(chunk_size=None):
+    """
+    Delete expired outstanding tokens and their blacklist entries, one chunk per
+    transaction. Returns the number of deleted tokens.
+    """
+    chunk_size = chunk_size or settings.TOKEN_PRUNE_CHUNK_SIZE
+    now = timezone.now()
+    total = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(expires_at__lte=now).order_by().values_list("pk", flat=True)[:chunk_size])
+        if ids:
+            with transaction.atomic():
+                # Blacklist rows go with a single cascading DELETE, without being loaded
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+        if len(ids) < chunk_size:
+            return total
@@ -9,17 +9,19 @@ from rest_framework.mixins import (
 )
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.contrib.auth import authenticate
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from . import tokens
+from .hashing import HashingBusy
 from .serializers import UserSerializer
 from .models import CustomUser as User
+from url_shortener.throttling import AuthThrottle
 
 
 class UserRegisterViewset(GenericAPIView, CreateModelMixin):
     serializer_class = UserSerializer
     queryset = User.objects.all()
+    throttle_classes = [AuthThrottle]
 
     @swagger_auto_schema(
         operation_description="Register a new user.",
@@ -43,6 +45,16 @@ class UserRegisterViewset(GenericAPIView, CreateModelMixin):
                     },
                 ),
             ),
+            503: openapi.Response(
+                description="Too many password operations in progress.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                        "message": openapi.Schema(type=openapi.TYPE_STRING, example="Too many password operations in progress, please retry shortly."),
+                    },
+                ),
+            ),
         },
     )
     def post(self, request, *args, **kwargs):
@@ -62,7 +74,10 @@ class UserRegisterViewset(GenericAPIView, CreateModelMixin):
             )
 
         serializer.validated_data["is_active"] = True
-        self.perform_create(serializer)
+        try:
+            self.perform_create(serializer)
+        except HashingBusy as e:
+            return Response({"status": "error", "message": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response(
             {
                 "status": "success",
@@ -117,7 +132,7 @@ class UserDetailViewset(GenericAPIView, RetrieveModelMixin, UpdateModelMixin, De
     )
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
-        instance.delete()
+        instance.mark_deleted()  # The account and its URLs are purged in the background
         return Response({"detail": "User deleted successfully."}, status=204)
 
 
@@ -173,9 +188,20 @@ class UserDetailViewset(GenericAPIView, RetrieveModelMixin, UpdateModelMixin, De
                 },
             ),
         ),
+        503: openapi.Response(
+            description="Too many password operations in progress.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "status": openapi.Schema(type=openapi.TYPE_STRING, example="error"),
+                    "message": openapi.Schema(type=openapi.TYPE_STRING, example="Too many password operations in progress, please retry shortly."),
+                },
+            ),
+        ),
     },
 )
 @api_view(["POST"])
+@throttle_classes([AuthThrottle])
 def login(request):
     """
     Authenticate a user with username and password.
@@ -183,8 +209,6 @@ def login(request):
     username = request.data.get("username")
     password = request.data.get("password")
 
-    print(username, password)
-
     if not username or not password:
         return Response(
             {"status": "error", "message": "Username and password are required."},
@@ -192,6 +216,7 @@ def login(request):
         )
 
     try:
+        # One query: the password is checked on the loaded row instead of authenticate() fetching it again
         user = User.objects.filter(username=username, is_active=True).first()
         if not user:
             return Response(
@@ -199,23 +224,22 @@ def login(request):
                 status=400,
             )
 
-        user = authenticate(username=username, password=password, request=request)
-        if not user:
+        if not user.check_password(password):
             return Response({"status": "error", "message": "Invalid credentials."}, status=400)
 
         # Serialize user data
         data = UserSerializer(user).data
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        data["token"] = str(refresh.access_token)
-        data["token_refresh"] = str(refresh)
+        data["token_refresh"], data["token"] = tokens.issue(user)
 
         return Response(
             {"status": "success", "message": "Login successful.", "data": data},
             status=200,
         )
 
+    except HashingBusy as e:
+        return Response({"status": "error", "message": str(e)}, status=503)
     except Exception as e:
         return Response({"status": "error", "message": "An error occurred: " + str(e)}, status=500)
 
@@ -244,7 +268,7 @@ def logout(request):
         if not refresh_token:
             return Response({"detail": "Refresh token is required"}, status=400)
 
-        token = RefreshToken(refresh_token)
+        token = tokens.BufferedRefreshToken(refresh_token)
         token.blacklist()
 
         return Response({"detail": "Successfully logged out"}, status=200)
@@ -275,10 +299,8 @@ def get_user_data(request):
         user = request.user
         user_data = UserSerializer(user).data
 
-        # regenerate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        user_data["token"] = str(refresh.access_token)
-        user_data["token_refresh"] = str(refresh)
+        # Hand this session its current JWT tokens, regenerated once they get close to expiry
+        user_data["token_refresh"], user_data["token"] = tokens.reuse_or_issue(user, request.auth)
 
         return Response(
             {